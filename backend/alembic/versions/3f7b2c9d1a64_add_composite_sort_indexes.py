@@ -0,0 +1,67 @@
+"""Add composite indexes for character list sort orders
+
+Revision ID: 3f7b2c9d1a64
+Revises: remove_cthulhu_from_systemenum
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f7b2c9d1a64'
+down_revision: Union[str, Sequence[str], None] = 'remove_cthulhu_from_systemenum'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, columns) — 一覧APIの各並び順（_SORT_KEYS）に対応する
+# 前方/後方スキャンのどちらかで ORDER BY と一致するよう向きを揃えている
+SORT_INDEXES = [
+    # name_asc
+    ('ix_characters_user_name', ['user_id', 'name', sa.text('updated_at DESC'), 'id']),
+    # name_desc
+    ('ix_characters_user_name_desc', ['user_id', sa.text('name DESC'), sa.text('updated_at DESC'), 'id']),
+    # created_asc / created_desc
+    ('ix_characters_user_created_at', ['user_id', 'created_at', 'id']),
+    # updated_asc / updated_desc
+    ('ix_characters_user_updated_at', ['user_id', 'updated_at', 'id']),
+    # system_asc
+    ('ix_characters_user_system_text', ['user_id', 'system_text', 'name', sa.text('updated_at DESC'), 'id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # enum → text のキャストはIMMUTABLEではないため、並び替え用に文字列列を追加する
+    op.add_column('characters', sa.Column('system_text', sa.String(), nullable=True))
+    op.execute("UPDATE characters SET system_text = system::text WHERE system_text IS NULL")
+    op.alter_column('characters', 'system_text', nullable=False)
+
+    # CREATE INDEX CONCURRENTLY はトランザクション内で実行できない
+    with op.get_context().autocommit_block():
+        for name, columns in SORT_INDEXES:
+            op.create_index(
+                name,
+                'characters',
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(SORT_INDEXES):
+            op.drop_index(
+                name,
+                table_name='characters',
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+    op.drop_column('characters', 'system_text')
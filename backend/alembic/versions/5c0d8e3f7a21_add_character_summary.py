@@ -0,0 +1,63 @@
+"""Add denormalized summary column to characters
+
+Revision ID: 5c0d8e3f7a21
+Revises: b41e6d2a9c57
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c0d8e3f7a21'
+down_revision: Union[str, Sequence[str], None] = 'b41e6d2a9c57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    from app.models import SystemEnum
+    from app.summary import build_character_summary
+
+    op.add_column(
+        'characters',
+        sa.Column('summary', postgresql.JSONB(astext_type=sa.Text()), nullable=False, server_default='{}'),
+    )
+
+    # 既存行の概要をアプリと同じ関数で埋める
+    connection = op.get_bind()
+    characters = sa.table(
+        'characters',
+        sa.column('id', sa.UUID()),
+        sa.column('system', sa.String()),
+        sa.column('sheet_data', postgresql.JSONB()),
+        sa.column('summary', postgresql.JSONB()),
+    )
+    last_id = None
+    while True:
+        q = sa.select(characters.c.id, sa.cast(characters.c.system, sa.String), characters.c.sheet_data)
+        if last_id is not None:
+            q = q.where(characters.c.id > last_id)
+        rows = connection.execute(q.order_by(characters.c.id).limit(BACKFILL_BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+        for character_id, system, sheet_data in rows:
+            connection.execute(
+                characters.update()
+                .where(characters.c.id == character_id)
+                .values(summary=build_character_summary(SystemEnum(system), sheet_data or {}))
+            )
+        last_id = rows[-1][0]
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('characters', 'summary')
@@ -0,0 +1,40 @@
+"""Add sub (IdP user id) to users
+
+Revision ID: 7e2a9f4c1b38
+Revises: 5c0d8e3f7a21
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2a9f4c1b38'
+down_revision: Union[str, Sequence[str], None] = '5c0d8e3f7a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 既存ユーザーは次回ログイン時に sub が埋まる
+    op.add_column('users', sa.Column('sub', sa.String(), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix_users_sub'),
+            'users',
+            ['sub'],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_users_sub'), table_name='users', postgresql_concurrently=True, if_exists=True)
+    op.drop_column('users', 'sub')
@@ -0,0 +1,73 @@
+"""Partition audit_logs by month and add lookup indexes
+
+Revision ID: 9a4d1e6b2f80
+Revises: 7e2a9f4c1b38
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4d1e6b2f80'
+down_revision: Union[str, Sequence[str], None] = '7e2a9f4c1b38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    from app.services.audit_partitions import ensure_audit_log_partitions
+
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_unpartitioned")
+    op.execute("ALTER TABLE audit_logs_unpartitioned RENAME CONSTRAINT audit_logs_pkey TO audit_logs_unpartitioned_pkey")
+
+    # パーティションキーは主キーに含める必要がある
+    op.execute("""
+        CREATE TABLE audit_logs (
+            id UUID NOT NULL,
+            user_id UUID REFERENCES users (id) ON DELETE SET NULL,
+            character_id UUID REFERENCES characters (id) ON DELETE SET NULL,
+            action actionenum NOT NULL,
+            meta_data JSONB,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    # 月次パーティションの作成が遅れても INSERT が失敗しないように
+    # （入った行は ensure_audit_log_partitions がその月のパーティションを作るときに移す）
+    op.execute("CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT")
+
+    connection = op.get_bind()
+    oldest = connection.execute(sa.text("SELECT min(created_at) FROM audit_logs_unpartitioned")).scalar()
+    ensure_audit_log_partitions(connection, start=oldest.date() if oldest else None)
+
+    op.execute("INSERT INTO audit_logs SELECT id, user_id, character_id, action, meta_data, created_at FROM audit_logs_unpartitioned")
+    op.execute("DROP TABLE audit_logs_unpartitioned")
+
+    # 親テーブルに作成すると各パーティションにも作成される
+    op.create_index('ix_audit_logs_character_id_created_at', 'audit_logs', ['character_id', 'created_at', 'id'])
+    op.create_index('ix_audit_logs_user_id_created_at', 'audit_logs', ['user_id', 'created_at'])
+    op.create_index('ix_audit_logs_created_at', 'audit_logs', ['created_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_partitioned")
+    op.create_table('audit_logs',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=True),
+    sa.Column('character_id', sa.UUID(), nullable=True),
+    sa.Column('action', sa.Enum('create', 'update', 'publish', 'unpublish', 'delete', name='actionenum', create_type=False), nullable=False),
+    sa.Column('meta_data', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['character_id'], ['characters.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO audit_logs SELECT id, user_id, character_id, action, meta_data, created_at FROM audit_logs_partitioned")
+    op.execute("DROP TABLE audit_logs_partitioned")
@@ -0,0 +1,80 @@
+"""Add character_change_events outbox written by triggers
+
+Revision ID: a7d9c3e5f2b4
+Revises: f1c3e5a7b9d2
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d9c3e5f2b4'
+down_revision: Union[str, Sequence[str], None] = 'f1c3e5a7b9d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'character_change_events',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('character_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('op', sa.String(length=16), nullable=False),
+        sa.Column('is_public', sa.Boolean(), nullable=True),
+        sa.Column('share_token', sa.String(), nullable=True),
+        sa.Column('previous_share_token', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text("(now() AT TIME ZONE 'utc')"), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+    # 書き込みと同じトランザクションでイベントを追加し、コミット時に通知する
+    # （通知のペイロードは空。同じトランザクション内の通知は1つにまとまり、受け手は id で読み直す）
+    op.execute("""
+        CREATE OR REPLACE FUNCTION record_character_change() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_TABLE_NAME = 'character_live_state' THEN
+                IF TG_OP = 'DELETE' THEN
+                    INSERT INTO character_change_events (character_id, op) VALUES (OLD.character_id, 'live');
+                ELSE
+                    INSERT INTO character_change_events (character_id, op) VALUES (NEW.character_id, 'live');
+                END IF;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO character_change_events (character_id, op, is_public, previous_share_token)
+                VALUES (OLD.id, 'delete', false, OLD.share_token);
+            ELSIF TG_OP = 'UPDATE' THEN
+                INSERT INTO character_change_events (character_id, op, is_public, share_token, previous_share_token)
+                VALUES (NEW.id, 'update', NEW.is_public, NEW.share_token, OLD.share_token);
+            ELSE
+                INSERT INTO character_change_events (character_id, op, is_public, share_token)
+                VALUES (NEW.id, 'insert', NEW.is_public, NEW.share_token);
+            END IF;
+            PERFORM pg_notify('character_changes', '');
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER characters_change_events
+        AFTER INSERT OR UPDATE OR DELETE ON characters
+        FOR EACH ROW EXECUTE FUNCTION record_character_change()
+    """)
+    op.execute("""
+        CREATE TRIGGER character_live_state_change_events
+        AFTER INSERT OR UPDATE OR DELETE ON character_live_state
+        FOR EACH ROW EXECUTE FUNCTION record_character_change()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS character_live_state_change_events ON character_live_state")
+    op.execute("DROP TRIGGER IF EXISTS characters_change_events ON characters")
+    op.execute("DROP FUNCTION IF EXISTS record_character_change()")
+    op.drop_table('character_change_events')
@@ -0,0 +1,80 @@
+"""Add trigram name index and full-text search vector
+
+Revision ID: b41e6d2a9c57
+Revises: 3f7b2c9d1a64
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41e6d2a9c57'
+down_revision: Union[str, Sequence[str], None] = '3f7b2c9d1a64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 名前の部分一致（ILIKE '%q%'）用のトライグラム
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # 日本語は空白で単語が区切られないため、2文字ずつのN-gramに分解してから tsvector にする
+    # （生成列の式に使うため IMMUTABLE）
+    op.execute(r"""
+        CREATE OR REPLACE FUNCTION character_search_ngrams(t text) RETURNS text
+        LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+            SELECT coalesce(string_agg(substr(n.s, i, 2), ' ' ORDER BY i), '')
+            FROM (SELECT regexp_replace(lower(t), '\s+', '', 'g') AS s) AS n,
+                 generate_series(1, greatest(char_length(n.s) - 1, 1)) AS i
+            WHERE n.s <> ''
+        $$
+    """)
+
+    # app.models.Character.search_vector と同じ式
+    op.execute("""
+        ALTER TABLE characters ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            to_tsvector('simple'::regconfig, character_search_ngrams(
+                coalesce(sheet_data->>'occupation', '') || ' ' ||
+                coalesce(sheet_data->>'backstory', '') || ' ' ||
+                coalesce(sheet_data->>'background', '') || ' ' ||
+                coalesce(sheet_data->>'notes', '') || ' ' ||
+                coalesce(sheet_data->>'memo', '')
+            ))
+        ) STORED
+    """)
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_characters_name_trgm',
+            'characters',
+            ['name'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_characters_search_vector',
+            'characters',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_characters_search_vector', table_name='characters', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_characters_name_trgm', table_name='characters', postgresql_concurrently=True, if_exists=True)
+    op.drop_column('characters', 'search_vector')
+    op.execute("DROP FUNCTION IF EXISTS character_search_ngrams(text)")
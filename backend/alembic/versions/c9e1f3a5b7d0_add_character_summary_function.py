@@ -0,0 +1,111 @@
+"""Add character_summary() to compute characters.summary in SQL
+
+Revision ID: c9e1f3a5b7d0
+Revises: a7d9c3e5f2b4
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9e1f3a5b7d0'
+down_revision: Union[str, Sequence[str], None] = 'a7d9c3e5f2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # app.summary._to_optional_int と同じ変換（変換できなければ NULL）
+    op.execute(r"""
+        CREATE OR REPLACE FUNCTION summary_optional_int(v jsonb) RETURNS bigint
+        LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS $$
+        DECLARE
+            s text;
+        BEGIN
+            CASE jsonb_typeof(v)
+                WHEN 'number' THEN
+                    RETURN trunc((v #>> '{}')::numeric)::bigint;
+                WHEN 'boolean' THEN
+                    RETURN CASE WHEN (v #>> '{}')::boolean THEN 1 ELSE 0 END;
+                WHEN 'string' THEN
+                    s := btrim(v #>> '{}', E' \t\n\r\f\v');
+                    IF s ~ '^[+-]?[0-9]+$' THEN
+                        RETURN s::bigint;
+                    END IF;
+                    RETURN NULL;
+                ELSE
+                    RETURN NULL;
+            END CASE;
+        EXCEPTION WHEN numeric_value_out_of_range THEN
+            RETURN NULL;
+        END
+        $$
+    """)
+
+    # app.summary._to_optional_str と同じ変換（オブジェクト・配列は JSON の文字列表現になる）
+    op.execute(r"""
+        CREATE OR REPLACE FUNCTION summary_optional_text(v jsonb) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT CASE jsonb_typeof(v)
+                WHEN 'null' THEN NULL
+                WHEN 'boolean' THEN CASE WHEN (v #>> '{}')::boolean THEN 'True' ELSE 'False' END
+                ELSE NULLIF(btrim(v #>> '{}', E' \t\n\r\f\v'), '')
+            END
+        $$
+    """)
+
+    # app.summary.build_character_summary の SQL 版（PATCH で sheet_data と同じ UPDATE 文で summary を更新する）
+    op.execute(r"""
+        CREATE OR REPLACE FUNCTION character_summary(system text, sheet jsonb) RETURNS jsonb
+        LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS $$
+        DECLARE
+            nested jsonb;
+        BEGIN
+            IF sheet IS NULL OR jsonb_typeof(sheet) <> 'object' THEN
+                RETURN jsonb_build_object('occupation', NULL, 'hp_max', NULL, 'san_max', NULL, 'mp_max', NULL);
+            END IF;
+            IF system IN ('cthulhu6', 'cthulhu7') THEN
+                nested := sheet -> 'derived';
+                IF nested IS NULL OR jsonb_typeof(nested) <> 'object' THEN
+                    nested := '{}'::jsonb;
+                END IF;
+                RETURN jsonb_build_object(
+                    'occupation', summary_optional_text(sheet -> 'occupation'),
+                    'hp_max', summary_optional_int(nested -> 'HP_max'),
+                    'san_max', summary_optional_int(nested -> 'SAN_max'),
+                    'mp_max', summary_optional_int(nested -> 'MP_max')
+                );
+            ELSIF system = 'shinobigami' THEN
+                RETURN jsonb_build_object(
+                    'occupation', summary_optional_text(sheet -> 'school'),
+                    'hp_max', summary_optional_int(sheet -> 'hp'),
+                    'san_max', NULL,
+                    'mp_max', NULL
+                );
+            ELSIF system = 'sw25' THEN
+                nested := sheet -> 'attributes';
+                IF nested IS NULL OR jsonb_typeof(nested) <> 'object' THEN
+                    nested := '{}'::jsonb;
+                END IF;
+                RETURN jsonb_build_object(
+                    'occupation', summary_optional_text(sheet -> 'race'),
+                    'hp_max', summary_optional_int(nested -> 'HP'),
+                    'san_max', NULL,
+                    'mp_max', summary_optional_int(nested -> 'MP')
+                );
+            END IF;
+            RETURN jsonb_build_object('occupation', NULL, 'hp_max', NULL, 'san_max', NULL, 'mp_max', NULL);
+        END
+        $$
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP FUNCTION IF EXISTS character_summary(text, jsonb)")
+    op.execute("DROP FUNCTION IF EXISTS summary_optional_text(jsonb)")
+    op.execute("DROP FUNCTION IF EXISTS summary_optional_int(jsonb)")
@@ -0,0 +1,45 @@
+"""Add partial index on share_token for public characters
+
+Revision ID: d4a6c8e0f2b5
+Revises: c9e1f3a5b7d0
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a6c8e0f2b5'
+down_revision: Union[str, Sequence[str], None] = 'c9e1f3a5b7d0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 共有トークンのフィルタの再構築（公開中の share_token の全件読み込み）を
+    # 公開中の行だけの index-only scan にする
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_characters_public_share_token',
+            'characters',
+            ['share_token'],
+            unique=False,
+            postgresql_where=sa.text('is_public AND share_token IS NOT NULL'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_characters_public_share_token',
+            table_name='characters',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,142 @@
+"""Add JSON Merge Patch / JSON Patch functions for sheet_data
+
+Revision ID: d5f3a7c9e1b2
+Revises: 9a4d1e6b2f80
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f3a7c9e1b2'
+down_revision: Union[str, Sequence[str], None] = '9a4d1e6b2f80'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # RFC 7396 JSON Merge Patch（null はキー削除、オブジェクトは再帰的にマージ）
+    op.execute("""
+        CREATE OR REPLACE FUNCTION jsonb_merge_patch(target jsonb, patch jsonb) RETURNS jsonb
+        LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS $$
+        DECLARE
+            result jsonb;
+            k text;
+            v jsonb;
+        BEGIN
+            IF patch IS NULL OR jsonb_typeof(patch) <> 'object' THEN
+                RETURN patch;
+            END IF;
+            IF target IS NULL OR jsonb_typeof(target) <> 'object' THEN
+                result := '{}'::jsonb;
+            ELSE
+                result := target;
+            END IF;
+            FOR k, v IN SELECT key, value FROM jsonb_each(patch) LOOP
+                IF jsonb_typeof(v) = 'null' THEN
+                    result := result - k;
+                ELSE
+                    result := jsonb_set(result, ARRAY[k], jsonb_merge_patch(result -> k, v), true);
+                END IF;
+            END LOOP;
+            RETURN result;
+        END
+        $$
+    """)
+
+    # RFC 6902 JSON Patch。パスはアプリ側で JSON Pointer から text[] に変換済み
+    # ({"op": ..., "path": [...], "from": [...], "value": ...} の配列)
+    # - 不正なパス: SQLSTATE 22023 / test の不一致: SQLSTATE P0004
+    op.execute("""
+        CREATE OR REPLACE FUNCTION jsonb_apply_patch(doc jsonb, ops jsonb) RETURNS jsonb
+        LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS $$
+        DECLARE
+            op jsonb;
+            kind text;
+            path text[];
+            parent_path text[];
+            from_path text[];
+            parent jsonb;
+            last text;
+            value jsonb;
+            n int;
+        BEGIN
+            FOR op IN SELECT * FROM jsonb_array_elements(ops) LOOP
+                kind := op->>'op';
+                path := ARRAY(SELECT jsonb_array_elements_text(op->'path'));
+                n := cardinality(path);
+
+                IF kind IN ('move', 'copy') THEN
+                    from_path := ARRAY(SELECT jsonb_array_elements_text(op->'from'));
+                    value := doc #> from_path;
+                    IF value IS NULL THEN
+                        RAISE EXCEPTION 'path not found: %', op->'from' USING ERRCODE = '22023';
+                    END IF;
+                    IF kind = 'move' THEN
+                        doc := doc #- from_path;
+                    END IF;
+                    kind := 'add';
+                ELSE
+                    value := op->'value';
+                END IF;
+
+                IF kind = 'test' THEN
+                    IF (doc #> path) IS DISTINCT FROM value THEN
+                        RAISE EXCEPTION 'test failed: %', op->'path' USING ERRCODE = 'P0004';
+                    END IF;
+                    CONTINUE;
+                END IF;
+
+                IF n = 0 THEN
+                    IF kind = 'remove' THEN
+                        RAISE EXCEPTION 'cannot remove the whole document' USING ERRCODE = '22023';
+                    END IF;
+                    doc := value;
+                    CONTINUE;
+                END IF;
+
+                parent_path := path[1:n - 1];
+                parent := doc #> parent_path;
+                last := path[n];
+                IF parent IS NULL OR jsonb_typeof(parent) NOT IN ('object', 'array') THEN
+                    RAISE EXCEPTION 'path not found: %', op->'path' USING ERRCODE = '22023';
+                END IF;
+                IF kind IN ('remove', 'replace') AND (doc #> path) IS NULL THEN
+                    RAISE EXCEPTION 'path not found: %', op->'path' USING ERRCODE = '22023';
+                END IF;
+
+                IF kind = 'remove' THEN
+                    doc := doc #- path;
+                ELSIF kind = 'replace' THEN
+                    doc := jsonb_set(doc, path, value, false);
+                ELSIF kind = 'add' THEN
+                    IF jsonb_typeof(parent) = 'array' THEN
+                        IF last = '-' OR last = jsonb_array_length(parent)::text THEN
+                            parent := parent || jsonb_build_array(value);
+                            doc := CASE WHEN n = 1 THEN parent ELSE jsonb_set(doc, parent_path, parent, false) END;
+                        ELSIF last ~ '^(0|[1-9][0-9]*)$' AND last::int < jsonb_array_length(parent) THEN
+                            doc := jsonb_insert(doc, path, value);
+                        ELSE
+                            RAISE EXCEPTION 'invalid array index: %', op->'path' USING ERRCODE = '22023';
+                        END IF;
+                    ELSE
+                        doc := jsonb_set(doc, path, value, true);
+                    END IF;
+                ELSE
+                    RAISE EXCEPTION 'unsupported op: %', kind USING ERRCODE = '22023';
+                END IF;
+            END LOOP;
+            RETURN doc;
+        END
+        $$
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP FUNCTION IF EXISTS jsonb_apply_patch(jsonb, jsonb)")
+    op.execute("DROP FUNCTION IF EXISTS jsonb_merge_patch(jsonb, jsonb)")
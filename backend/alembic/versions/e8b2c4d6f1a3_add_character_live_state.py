@@ -0,0 +1,40 @@
+"""Add character_live_state for session-time HP/SAN/MP
+
+Revision ID: e8b2c4d6f1a3
+Revises: d5f3a7c9e1b2
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b2c4d6f1a3'
+down_revision: Union[str, Sequence[str], None] = 'd5f3a7c9e1b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 頻繁に更新される小さな行。HOT更新が効くよう fillfactor に余裕を持たせる
+    op.create_table(
+        'character_live_state',
+        sa.Column('character_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('hp_current', sa.Integer(), nullable=True),
+        sa.Column('san_current', sa.Integer(), nullable=True),
+        sa.Column('mp_current', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['character_id'], ['characters.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('character_id'),
+        postgresql_with={'fillfactor': 70},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('character_live_state')
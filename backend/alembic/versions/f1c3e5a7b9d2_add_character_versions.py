@@ -0,0 +1,41 @@
+"""Add character_versions (delta-compressed history)
+
+Revision ID: f1c3e5a7b9d2
+Revises: e8b2c4d6f1a3
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c3e5a7b9d2'
+down_revision: Union[str, Sequence[str], None] = 'e8b2c4d6f1a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 既存キャラクターは次の更新時にキーフレームから履歴が始まる
+    op.create_table(
+        'character_versions',
+        sa.Column('character_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('keyframe_version', sa.Integer(), nullable=False),
+        sa.Column('data', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['character_id'], ['characters.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('character_id', 'version'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('character_versions')
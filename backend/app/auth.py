@@ -1,15 +1,28 @@
 import os
+import asyncio
+import logging
+import time
+import hashlib
+import json
 import httpx
 import uuid
-from functools import lru_cache
+from typing import Optional
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
 from jose.constants import ALGORITHMS
-from sqlalchemy.orm import Session
+from datetime import datetime
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models import User
+from app.services import metrics
+from app.services.cache import TTLCache
+from app.services.cache_tier import TwoLevelCache, cache_tier
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
@@ -22,28 +35,113 @@ AUTH0_ALGORITHM = "RS256"
 JWKS_URL = f"https://{AUTH0_DOMAIN}/.well-known/jwks.json" if AUTH0_DOMAIN else ""
 
 
-@lru_cache(maxsize=1)
-def get_jwks():
-    """JWKSを取得してキャッシュ"""
-    if not JWKS_URL:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Auth0 configuration is missing"
-        )
-    
-    try:
-        response = httpx.get(JWKS_URL, timeout=10.0)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=f"Failed to fetch JWKS: {str(e)}"
-        )
+# JWKSの再取得間隔（鍵ローテーションに追従するため）
+JWKS_CACHE_TTL_SECONDS = int(os.getenv("JWKS_CACHE_TTL_SECONDS", "3600"))
+# 未知のkidで再取得する最短間隔（不正なkidでJWKSエンドポイントを叩かせないため）
+JWKS_MIN_REFETCH_SECONDS = int(os.getenv("JWKS_MIN_REFETCH_SECONDS", "60"))
+
+
+def _parse_jwk(key: dict):
+    """JWKの n/e から RSA公開鍵オブジェクトを構築"""
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.hazmat.backends import default_backend
+    from jose.utils import base64url_decode
+
+    exponent = base64url_decode(key["e"].encode("utf-8"))
+    modulus = base64url_decode(key["n"].encode("utf-8"))
+
+    public_numbers = rsa.RSAPublicNumbers(
+        int.from_bytes(exponent, byteorder="big"),
+        int.from_bytes(modulus, byteorder="big")
+    )
+    return public_numbers.public_key(default_backend())
+
+
+class JWKSKeyStore:
+    """
+    JWKSの公開鍵キャッシュ（kidごとに構築済みの鍵オブジェクトを保持）
+
+    - TTL経過後は古い鍵を返しつつバックグラウンドで再取得する
+    - 未知のkidの場合のみ、その場で再取得する（最短間隔あり）
+    - 同時リクエストでも取得は1本にまとめる（single-flight）
+    """
+
+    def __init__(self, jwks_url: str, ttl_seconds: int, min_refetch_seconds: int):
+        self.jwks_url = jwks_url
+        self.ttl_seconds = ttl_seconds
+        self.min_refetch_seconds = min_refetch_seconds
+        self._keys: dict = {}
+        self._fetched_at: float = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def _fetch(self) -> None:
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.get(self.jwks_url)
+            response.raise_for_status()
+            jwks = response.json()
+
+        keys = {}
+        for key in jwks.get("keys", []):
+            if key.get("kty") != "RSA" or not key.get("kid") or key.get("use", "sig") != "sig":
+                continue
+            try:
+                keys[key["kid"]] = _parse_jwk(key)
+            except Exception as e:
+                logger.warning(f"Skipping unparsable JWK {key.get('kid')}: {e}")
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+
+    def _refresh(self) -> asyncio.Task:
+        """実行中の取得があればそれを、無ければ新しく開始したタスクを返す"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._fetch())
+            self._refresh_task.add_done_callback(self._log_refresh_error)
+        return self._refresh_task
+
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Failed to refresh JWKS: {task.exception()}")
+
+    async def _refresh_now(self) -> None:
+        try:
+            await asyncio.shield(self._refresh())
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Failed to fetch JWKS: {str(e)}"
+            )
+
+    async def get_key(self, kid: Optional[str]):
+        if not self.jwks_url:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Auth0 configuration is missing"
+            )
+
+        if not self._keys:
+            await self._refresh_now()
+        elif time.monotonic() - self._fetched_at > self.ttl_seconds:
+            # 期限切れでも手元の鍵で検証を続け、裏で更新する
+            self._refresh()
 
+        key = self._keys.get(kid)
+        if key is None and time.monotonic() - self._fetched_at > self.min_refetch_seconds:
+            # 鍵ローテーション直後の可能性があるので取り直す
+            await self._refresh_now()
+            key = self._keys.get(kid)
+        return key
 
-def get_rsa_key(token: str):
-    """JWTトークンからRSA公開鍵を取得"""
+    def clear(self) -> None:
+        self._keys = {}
+        self._fetched_at = 0.0
+
+
+jwks_key_store = JWKSKeyStore(JWKS_URL, JWKS_CACHE_TTL_SECONDS, JWKS_MIN_REFETCH_SECONDS)
+
+
+async def get_rsa_key(token: str):
+    """JWTトークンのkidに対応するRSA公開鍵を取得"""
     try:
         unverified_header = jwt.get_unverified_header(token)
     except JWTError:
@@ -51,61 +149,42 @@ def get_rsa_key(token: str):
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token header"
         )
-    
-    jwks = get_jwks()
-    rsa_key = None
-    
-    for key in jwks.get("keys", []):
-        if key.get("kid") == unverified_header.get("kid"):
-            rsa_key = {
-                "kty": key["kty"],
-                "kid": key["kid"],
-                "use": key["use"],
-                "n": key["n"],
-                "e": key["e"]
-            }
-            break
-    
-    if not rsa_key:
+
+    public_key = await jwks_key_store.get_key(unverified_header.get("kid"))
+    if public_key is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Unable to find appropriate key"
         )
-    
-    try:
-        from cryptography.hazmat.primitives.asymmetric import rsa
-        from cryptography.hazmat.backends import default_backend
-        from jose.utils import base64url_decode
-        import base64
-        
-        # RSA鍵を構築
-        exponent = base64url_decode(rsa_key["e"].encode("utf-8"))
-        modulus = base64url_decode(rsa_key["n"].encode("utf-8"))
-        
-        public_numbers = rsa.RSAPublicNumbers(
-            int.from_bytes(exponent, byteorder="big"),
-            int.from_bytes(modulus, byteorder="big")
-        )
-        public_key = public_numbers.public_key(default_backend())
-        
-        return public_key
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f"Unable to parse key: {str(e)}"
-        )
+    return public_key
 
 
-def verify_token(token: str) -> dict:
-    """JWTトークンを検証してペイロードを返す"""
+# 検証済みトークンのキャッシュ（キー: トークンのSHA-256、expまで保持）
+verified_token_cache = TTLCache(int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096")))
+
+
+def _token_cache_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+async def verify_token(token: str) -> dict:
+    """JWTトークンを検証してペイロードを返す（検証済みのトークンはexpまでキャッシュ）"""
     if not AUTH0_DOMAIN or not AUTH0_AUDIENCE:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Auth0 configuration is missing"
         )
-    
+
+    cache_key = _token_cache_key(token)
+    cached = verified_token_cache.get(cache_key)
+    if cached is not None:
+        metrics.inc("auth.token_cache.hit")
+        return dict(cached)
+    metrics.inc("auth.token_cache.miss")
+
     try:
-        rsa_key = get_rsa_key(token)
+        started = time.perf_counter()
+        rsa_key = await get_rsa_key(token)
         payload = jwt.decode(
             token,
             rsa_key,
@@ -113,7 +192,13 @@ def verify_token(token: str) -> dict:
             audience=AUTH0_AUDIENCE,
             issuer=f"https://{AUTH0_DOMAIN}/"
         )
+        metrics.observe("auth.verify_token", time.perf_counter() - started)
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            verified_token_cache.set(cache_key, dict(payload), float(exp))
         return payload
+    except HTTPException:
+        raise
     except JWTError as e:
         import logging
         logger = logging.getLogger(__name__)
@@ -132,17 +217,120 @@ def verify_token(token: str) -> dict:
         )
 
 
+# ユーザー解決のキャッシュ（キー: sub、短いTTL。共有層があればインスタンス間で共有）
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+_USER_COLUMNS = ("id", "auth_provider", "sub", "email", "display_name", "created_at", "updated_at")
+
+
+def _encode_user_row(row: dict) -> bytes:
+    return json.dumps({c: row[c] for c in _USER_COLUMNS}, default=str).encode("utf-8")
+
+
+def _decode_user_row(data: bytes) -> dict:
+    row = json.loads(data)
+    row["id"] = uuid.UUID(row["id"])
+    row["created_at"] = datetime.fromisoformat(row["created_at"])
+    row["updated_at"] = datetime.fromisoformat(row["updated_at"])
+    return row
+
+
+user_cache = TwoLevelCache(
+    cache_tier,
+    "user",
+    TTLCache(int(os.getenv("USER_CACHE_SIZE", "4096"))),
+    encode=_encode_user_row,
+    decode=_decode_user_row,
+)
+
+
+def _user_from_row(row: dict) -> User:
+    """キャッシュ値からセッションに属さないUserを作る（リクエストごとに別インスタンス）"""
+    return User(**row)
+
+
+def _email_from_claims(payload: dict) -> str:
+    """トークンからemailを決定（無い場合はsubから一時的なemailを生成）"""
+    auth0_id = payload.get("sub")  # "auth0|xxxxx" 形式
+    email = payload.get("email")
+    if email:
+        return email
+
+    # emailが存在しない場合、subをベースにemailを生成
+    # ただし、これは一時的な対応で、Auth0の設定を確認する必要がある
+    if auth0_id and "|" in auth0_id:
+        # auth0_idが "auth0|xxxxx" または "google-oauth2|xxxxx" 形式の場合
+        email = f"{auth0_id.split('|', 1)[1]}@auth0.local"
+    elif auth0_id:
+        email = f"{auth0_id}@auth0.local"
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Email not found in token and unable to generate from sub"
+        )
+    logger.warning(f"Email not found in token (keys: {list(payload.keys())}). Using temporary email: {email}")
+    return email
+
+
+async def _resolve_user(db: AsyncSession, sub: Optional[str], email: str, display_name: str) -> dict:
+    """
+    DBからユーザーを解決し、キャッシュ用の値を返す
+
+    - sub（無ければemail）で検索し、表示名などが変わった場合のみ更新する
+    - 初回ログインは INSERT ... ON CONFLICT で作成し、同時リクエストでも競合しない
+    """
+    conditions = [User.email == email]
+    if sub:
+        conditions.append(User.sub == sub)
+    result = await db.execute(select(User).where(or_(*conditions)))
+    users = result.scalars().all()
+    # subが一致する行を優先（同じemailで別IDプロバイダのログインもあり得る）
+    user = next((u for u in users if sub and u.sub == sub), None) or next(iter(users), None)
+
+    if user is None:
+        now = datetime.utcnow()
+        insert_stmt = pg_insert(User).values(
+            id=uuid.uuid4(),
+            auth_provider="auth0",
+            sub=sub,
+            email=email,
+            display_name=display_name,
+            created_at=now,
+            updated_at=now,
+        )
+        stmt = insert_stmt.on_conflict_do_update(
+            index_elements=[User.email],
+            set_={
+                "sub": func.coalesce(User.sub, insert_stmt.excluded.sub),
+                "display_name": insert_stmt.excluded.display_name,
+                "updated_at": now,
+            },
+        ).returning(*[getattr(User, c) for c in _USER_COLUMNS])
+        row = (await db.execute(stmt)).mappings().one()
+        await db.commit()
+        return dict(row)
+
+    changes = {}
+    if user.display_name != display_name:
+        changes["display_name"] = display_name
+    if sub and user.sub is None:
+        changes["sub"] = sub
+    if changes:
+        for key, value in changes.items():
+            setattr(user, key, value)
+        await db.commit()
+        await db.refresh(user)
+    return {c: getattr(user, c) for c in _USER_COLUMNS}
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> User:
-    """現在の認証ユーザーを取得"""
-    import logging
-    logger = logging.getLogger(__name__)
-    
+    """現在の認証ユーザーを取得（短時間キャッシュ。クレームが変わらなければDBに触れない）"""
     try:
         token = credentials.credentials
-        payload = verify_token(token)
+        payload = await verify_token(token)
     except HTTPException:
         raise
     except Exception as e:
@@ -151,66 +339,22 @@ async def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Authentication failed: {str(e)}"
         )
-    
+
     # Auth0から取得した情報
-    auth0_id = payload.get("sub")  # "auth0|xxxxx" 形式
-    email = payload.get("email")
-    
-    # トークンのペイロードをログ出力（デバッグ用）
-    logger.info(f"Token payload keys: {list(payload.keys())}")
-    logger.info(f"Token payload email: {email}")
-    logger.info(f"Token payload sub: {auth0_id}")
-    
-    # emailが存在しない場合の処理
-    if not email:
-        # emailが存在しない場合、subをベースにemailを生成
-        # ただし、これは一時的な対応で、Auth0の設定を確認する必要がある
-        logger.warning(f"Email not found in token. Available keys: {list(payload.keys())}")
-        logger.warning(f"Full payload: {payload}")
-        
-        # subからemailを推測（実際の運用では推奨されない）
-        if auth0_id and "|" in auth0_id:
-            # auth0_idが "auth0|xxxxx" または "google-oauth2|xxxxx" 形式の場合
-            parts = auth0_id.split("|")
-            if len(parts) > 1:
-                # 一時的なemailとして使用（実際の運用ではAuth0の設定を確認）
-                email = f"{parts[1]}@auth0.local"
-                logger.warning(f"Using temporary email: {email}")
-            else:
-                email = f"{auth0_id}@auth0.local"
-                logger.warning(f"Using temporary email: {email}")
-        elif auth0_id:
-            email = f"{auth0_id}@auth0.local"
-            logger.warning(f"Using temporary email: {email}")
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Email not found in token and unable to generate from sub"
-            )
-    
+    sub = payload.get("sub")
+    email = _email_from_claims(payload)
+    logger.debug(f"Authenticated sub: {sub}")
+
     # display_nameの決定
     display_name = payload.get("name") or payload.get("nickname") or (email.split("@")[0] if email else "User")
-    
-    # データベースからユーザーを検索または作成
-    user = db.query(User).filter(User.email == email).first()
-    
-    if not user:
-        # 新規ユーザーの場合は作成
-        user = User(
-            id=uuid.uuid4(),
-            auth_provider="auth0",
-            email=email,
-            display_name=display_name
-        )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-    else:
-        # 既存ユーザーの表示名を更新（必要に応じて）
-        if user.display_name != display_name:
-            user.display_name = display_name
-            db.commit()
-            db.refresh(user)
-    
-    return user
 
+    cache_key = sub or email
+    cached = await user_cache.get(cache_key)
+    if cached is not None and cached["display_name"] == display_name:
+        metrics.inc("auth.user_cache.hit")
+        return _user_from_row(cached)
+    metrics.inc("auth.user_cache.miss")
+
+    row = await _resolve_user(db, sub, email, display_name)
+    await user_cache.put(cache_key, row, USER_CACHE_TTL_SECONDS)
+    return _user_from_row(row)
@@ -0,0 +1,106 @@
+"""ETag による条件付きリクエスト（If-None-Match / If-Match）のヘルパー
+
+ETag は `"<version>"` または `"<version>-<image>"` の形式。
+- version: キャラクターIDと updated_at（ライブ状態があればその updated_at も）から導出
+- image: 署名付き画像URLの短いハッシュ（署名URLが差し替わった時だけ変わる）
+
+If-Match（楽観ロック）は version 部分だけで比較し、署名URLの更新では 412 にしない。
+Last-Modified / If-Modified-Since は秒単位（HTTP-date）で扱う。
+"""
+import hashlib
+import uuid
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+
+def _short_hash(value: str) -> str:
+    return hashlib.blake2b(value.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def character_version(
+    character_id: uuid.UUID,
+    updated_at: datetime,
+    live_updated_at: Optional[datetime] = None,
+) -> str:
+    """キャラクターのバージョン文字列"""
+    source = f"{character_id}:{updated_at.isoformat()}"
+    if live_updated_at is not None:
+        source += f":{live_updated_at.isoformat()}"
+    return _short_hash(source)
+
+
+def character_etag(
+    character_id: uuid.UUID,
+    updated_at: datetime,
+    signed_image_url: Optional[str] = None,
+    live_updated_at: Optional[datetime] = None,
+) -> str:
+    """レスポンス用の強いETag（引用符付き）"""
+    version = character_version(character_id, updated_at, live_updated_at)
+    if signed_image_url:
+        return f'"{version}-{_short_hash(signed_image_url)}"'
+    return f'"{version}"'
+
+
+def _parse_etags(header: str) -> list[str]:
+    """If-None-Match / If-Match のリストを分解（W/ と引用符は除去）"""
+    tags = []
+    for part in header.split(","):
+        tag = part.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag:
+            tags.append(tag)
+    return tags
+
+
+def if_none_match(header: Optional[str], etag: str) -> bool:
+    """If-None-Match が一致すれば True（304 を返せる）。比較は弱い比較。"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag.strip('"') in _parse_etags(header)
+
+
+def http_date(value: datetime) -> str:
+    """UTC の datetime（naive は UTC とみなす）→ Last-Modified 用の HTTP-date"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def if_modified_since(header: Optional[str], last_modified: datetime) -> bool:
+    """If-Modified-Since 以降に変更が無ければ True（304 を返せる）。解釈できない値は無視する。"""
+    if not header:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def check_if_match(
+    header: Optional[str],
+    character_id: uuid.UUID,
+    updated_at: datetime,
+    live_updated_at: Optional[datetime] = None,
+) -> None:
+    """If-Match が現在のバージョンと一致しなければ 412"""
+    if not header or header.strip() == "*":
+        return
+    version = character_version(character_id, updated_at, live_updated_at)
+    if not any(tag.split("-", 1)[0] == version for tag in _parse_etags(header)):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Character has been modified",
+        )
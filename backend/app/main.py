@@ -1,9 +1,10 @@
 import os
 import logging
+import secrets
 import sys
 import traceback
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, status, Request
+from fastapi import Depends, FastAPI, HTTPException, status, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
@@ -11,6 +12,18 @@ from starlette.exceptions import HTTPException as StarletteHTTPException
 from alembic.config import Config
 from alembic import command
 
+from app.database import async_engine, engine
+from app.services import metrics
+from app.services.audit import AUDIT_LOG_MODE, audit_log_writer
+from app.services.autosave import autosave_coalescer
+from app.services.cache_tier import cache_tier
+from app.services.change_events import change_relay
+from app.services.share_cache import share_response_cache
+from app.services.share_token_filter import REBUILD_CHANNEL, share_token_filter
+from app.services.share_snapshots import share_snapshots
+from app.services.audit_partitions import ensure_audit_log_partitions
+from app.services.gcs_signer import get_local_signer
+
 # ロギング設定
 logging.basicConfig(
     level=logging.INFO,
@@ -33,14 +46,46 @@ def run_migrations():
         raise
 
 
+def ensure_partitions():
+    """audit_logs の月次パーティションを先の月まで用意する（失敗しても起動は続ける）"""
+    try:
+        with engine.begin() as connection:
+            ensure_audit_log_partitions(connection)
+    except Exception as e:
+        logger.error(f"Failed to ensure audit log partitions: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events."""
     global _startup_complete
     try:
         run_migrations()
+        ensure_partitions()
+        # 署名用のサービスアカウント鍵を起動時に一度だけ読み込む
+        get_local_signer()
+        if AUDIT_LOG_MODE == "batched":
+            audit_log_writer.start()
+        # 共有キャッシュの無効化の購読（CACHE_REDIS_URL が無ければ何もしない）
+        cache_tier.start()
+        # 共有トークンのフィルタ（構築が終わるまでは共有閲覧でDBを引く）
+        share_token_filter.start()
+        # 他インスタンスでのキャラクターの変更をプロセス内キャッシュに反映する
+        change_relay.subscribe(share_response_cache.apply_change, reset=share_response_cache.clear)
+        change_relay.subscribe(share_snapshots.apply_change, reset=share_snapshots.clear_verified)
+        change_relay.subscribe(share_token_filter.apply_change, reset=share_token_filter.request_rebuild)
+        change_relay.listen(REBUILD_CHANNEL, share_token_filter.request_rebuild)
+        change_relay.start()
         _startup_complete = True
         yield
+        # まとめ待ちの自動保存を書き切ってから監査ログを止める
+        await change_relay.stop()
+        await share_token_filter.stop()
+        await share_snapshots.stop()
+        await autosave_coalescer.stop()
+        await audit_log_writer.stop()
+        await cache_tier.stop()
+        await async_engine.dispose()
     except Exception as e:
         logger.error(f"Application startup failed: {e}")
         logger.error(traceback.format_exc())
@@ -64,24 +109,32 @@ allow_origins = [
     if origin.strip()
 ]
 
+# /metrics の Bearer トークン（未設定なら /metrics は 404。内部の監視からだけ読めるようにする）
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allow_origins,
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Authorization", "Content-Type", "Accept"],
-    expose_headers=[],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+    allow_headers=["Authorization", "Content-Type", "Accept", "If-Match", "If-None-Match", "If-Modified-Since"],
+    expose_headers=["ETag"],
 )
 
 # ルーターの登録
-from app.routers import auth, characters, share, images, dice, export
+from app.routers import auth, characters, bulk, share, images, dice, export, audit, live_state, versions
 
 app.include_router(auth.router)
+# export.ndjson / import.ndjson が /{character_id} に一致しないよう、characters より先に登録する
+app.include_router(export.router)
 app.include_router(characters.router)
+app.include_router(bulk.router)
 app.include_router(share.router)
 app.include_router(images.router)
 app.include_router(dice.router)
-app.include_router(export.router)
+app.include_router(audit.router)
+app.include_router(live_state.router)
+app.include_router(versions.router)
 
 
 @app.exception_handler(StarletteHTTPException)
@@ -90,7 +143,8 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     logger.error(f"HTTP Exception: {exc.status_code} - {exc.detail}")
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail}
+        content={"detail": exc.detail},
+        headers=getattr(exc, "headers", None),
     )
 
 
@@ -120,6 +174,44 @@ def read_root():
     return {"message": "Character Manager API", "version": "1.0.0"}
 
 
+def require_metrics_token(request: Request) -> None:
+    """METRICS_TOKEN が未設定なら 404、Authorization: Bearer <METRICS_TOKEN> でなければ 401"""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.strip().encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+@app.get("/metrics", dependencies=[Depends(require_metrics_token)])
+async def get_metrics():
+    """プロセス内メトリクス（キャッシュのヒット率・署名レイテンシ等。METRICS_TOKEN が必要）"""
+    snapshot = metrics.snapshot()
+    snapshot["ratios"] = {
+        "gcs.signed_url_cache.hit_rate": metrics.hit_rate("gcs.signed_url_cache.hit", "gcs.signed_url_cache.miss"),
+        "auth.token_cache.hit_rate": metrics.hit_rate("auth.token_cache.hit", "auth.token_cache.miss"),
+        "auth.user_cache.hit_rate": metrics.hit_rate("auth.user_cache.hit", "auth.user_cache.miss"),
+        "share.response_cache.hit_rate": metrics.hit_rate("share.response_cache.hit", "share.response_cache.miss"),
+        "share.snapshot.hit_rate": metrics.hit_rate("share.snapshot.hit", "share.snapshot.miss"),
+        # 存在しないトークンのうち、フィルタを通ってDBまで届いた割合
+        "share.token_filter.false_positive_rate": metrics.hit_rate(
+            "share.token_filter.false_positive", "share.token_filter.rejected"
+        ),
+    }
+    snapshot["gauges"] = {
+        "share.response_cache.entries": len(share_response_cache),
+        "share.response_cache.bytes": share_response_cache.total_bytes,
+    }
+    snapshot["share_token_filter"] = share_token_filter.stats()
+    snapshot["cache_tier"] = cache_tier.stats()
+    snapshot["change_relay"] = change_relay.stats()
+    return snapshot
+
+
 @app.get("/health")
 @app.get("/healthz")
 async def health_check():
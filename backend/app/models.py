@@ -1,8 +1,8 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Enum, Text, ARRAY
-from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Computed, String, Boolean, DateTime, ForeignKey, Enum, Integer, BigInteger, Text, ARRAY, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 import enum
 
 from app.database import Base
@@ -24,11 +24,27 @@ class ActionEnum(str, enum.Enum):
     delete = "delete"
 
 
+def _system_text_default(context) -> str:
+    """system の文字列表現（並び替え用インデックス列）"""
+    system = context.get_current_parameters().get("system")
+    return system.value if isinstance(system, SystemEnum) else system
+
+
+# 全文検索の対象にする sheet_data の長文フィールド（システムごとにキー名が異なる）
+SEARCHABLE_SHEET_FIELDS = ("occupation", "backstory", "background", "notes", "memo")
+
+_SEARCH_VECTOR_SQL = "to_tsvector('simple'::regconfig, character_search_ngrams({}))".format(
+    " || ' ' || ".join(f"coalesce(sheet_data->>'{key}', '')" for key in SEARCHABLE_SHEET_FIELDS)
+)
+
+
 class User(Base):
     __tablename__ = "users"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     auth_provider = Column(String, nullable=False, default="auth0")
+    # IDプロバイダのユーザーID（JWTの sub、例: "auth0|xxxxx"）
+    sub = Column(String, unique=True, nullable=True, index=True)
     email = Column(String, unique=True, nullable=False, index=True)
     display_name = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -45,31 +61,98 @@ class Character(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     system = Column(Enum(SystemEnum), nullable=False, index=True)
+    # enum → text のキャストはIMMUTABLEでなくインデックスに使えないため、文字列を別列で保持する
+    system_text = Column(String, nullable=False, default=_system_text_default)
     name = Column(String, nullable=False)
     profile_image_url = Column(String, nullable=True)
     tags = Column(ARRAY(Text), nullable=False, default=list)
     is_public = Column(Boolean, default=False, nullable=False)
     share_token = Column(String, unique=True, nullable=True, index=True)
     sheet_data = Column(JSONB, nullable=False, default=dict)
+    # 一覧表示用の概要（書き込み時に sheet_data から生成。app.summary 参照）
+    summary = Column(JSONB, nullable=False, default=dict)
+    # 全文検索用（DB側の生成列。通常の読み込みでは取得しない）
+    search_vector = deferred(Column(TSVECTOR, Computed(_SEARCH_VECTOR_SQL, persisted=True)))
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     # Relationships
     user = relationship("User", back_populates="characters")
-    audit_logs = relationship("AuditLog", back_populates="character")
+    # 削除時の character_id の NULL 化はDBの ON DELETE SET NULL に任せる（履歴を読み込まない）
+    audit_logs = relationship("AuditLog", back_populates="character", passive_deletes=True)
+    # 削除はDBの ON DELETE CASCADE に任せる（履歴を読み込まない）
+    versions = relationship("CharacterVersion", passive_deletes=True)
 
     # Indexes are defined in migration
 
 
+class CharacterLiveState(Base):
+    """セッション中に頻繁に変わる現在値（HP/SAN/MP）
+
+    sheet_data（JSONB）を書き換えずに済むよう別テーブルに保持し、読み出し時に
+    sheet_data.derived の *_current に重ねる（app.services.live_state 参照）。
+    NULL の項目は sheet_data の値をそのまま使う。
+    """
+    __tablename__ = "character_live_state"
+
+    character_id = Column(UUID(as_uuid=True), ForeignKey("characters.id", ondelete="CASCADE"), primary_key=True)
+    hp_current = Column(Integer, nullable=True)
+    san_current = Column(Integer, nullable=True)
+    mp_current = Column(Integer, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class CharacterVersion(Base):
+    """キャラクターの変更履歴（app.services.versions 参照）
+
+    keyframe_version == version の行はキーフレーム（name/tags/profile_image_url/sheet_data の全体）、
+    それ以外は直前のバージョンからの差分（操作のリスト）。
+    """
+    __tablename__ = "character_versions"
+
+    character_id = Column(UUID(as_uuid=True), ForeignKey("characters.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, primary_key=True)
+    # このバージョンを復元するときに起点にするキーフレーム
+    keyframe_version = Column(Integer, nullable=False)
+    data = Column(JSONB, nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    @property
+    def is_keyframe(self) -> bool:
+        return self.version == self.keyframe_version
+
+
+class CharacterChangeEvent(Base):
+    """キャラクターの変更イベント（アウトボックス。app.services.change_events 参照）
+
+    characters / character_live_state のトリガーが書き込みと同じトランザクションで追加し、
+    pg_notify でインスタンスに知らせる。キャラクター削除後も残すので外部キーは張らない。
+    """
+    __tablename__ = "character_change_events"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    character_id = Column(UUID(as_uuid=True), nullable=False)
+    # insert / update / delete / live（ライブ状態の変更）
+    op = Column(String(16), nullable=False)
+    is_public = Column(Boolean, nullable=True)
+    share_token = Column(String, nullable=True)
+    # 更新・削除前の share_token（公開停止で消えたトークンを知るため）
+    previous_share_token = Column(String, nullable=True)
+    created_at = Column(DateTime, server_default=text("(now() AT TIME ZONE 'utc')"), nullable=False)
+
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    # created_at で月次レンジパーティション（app.services.audit_partitions 参照）
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     character_id = Column(UUID(as_uuid=True), ForeignKey("characters.id", ondelete="SET NULL"), nullable=True)
     action = Column(Enum(ActionEnum), nullable=False)
     meta_data = Column(JSONB, nullable=True, default=dict)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, primary_key=True)
 
     # Relationships
     user = relationship("User", back_populates="audit_logs")
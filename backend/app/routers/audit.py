@@ -0,0 +1,77 @@
+import base64
+import uuid
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.auth import get_current_user
+from app.models import User, Character, AuditLog
+from app.schemas import AuditLogResponse, AuditLogListResponse
+
+router = APIRouter(prefix="/api/characters", tags=["audit"])
+
+
+def _encode_cursor(log: AuditLog) -> str:
+    raw = f"{log.created_at.isoformat()}|{log.id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, log_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(log_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+@router.get("/{character_id}/audit", response_model=AuditLogListResponse)
+async def list_audit_logs(
+    character_id: uuid.UUID,
+    limit: int = Query(50, ge=1, le=200, description="1ページあたりの件数"),
+    cursor: Optional[str] = Query(None, description="前回レスポンスの next_cursor"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """キャラクターの操作履歴（新しい順、所有者のみ）
+
+    (character_id, created_at, id) のインデックスを逆順に辿るキーセットページネーション。
+    """
+    # 所有者チェック（sheet_data は読み込まない）
+    owner_id = await db.scalar(select(Character.user_id).where(Character.id == character_id))
+
+    if owner_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Character not found",
+        )
+
+    if owner_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied",
+        )
+
+    q = select(AuditLog).where(AuditLog.character_id == character_id)
+    if cursor:
+        created_at, log_id = _decode_cursor(cursor)
+        q = q.where(tuple_(AuditLog.created_at, AuditLog.id) < tuple_(created_at, log_id))
+    q = q.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(limit + 1)
+
+    logs = (await db.execute(q)).scalars().all()
+    next_cursor = None
+    if len(logs) > limit:
+        logs = logs[:limit]
+        next_cursor = _encode_cursor(logs[-1])
+
+    return AuditLogListResponse(
+        items=[AuditLogResponse.model_validate(log) for log in logs],
+        limit=limit,
+        next_cursor=next_cursor,
+    )
@@ -0,0 +1,247 @@
+import secrets
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.auth import get_current_user
+from app.models import User, Character, CharacterLiveState, ActionEnum
+from app.schemas import (
+    BulkItemResult,
+    BulkRequest,
+    BulkResponse,
+    BulkUpdateOperation,
+)
+from app.summary import build_character_summary
+from app.validators import validate_cthulhu_skill_points
+from app.services.audit import create_audit_log
+from app.services.characters import CTHULHU_SYSTEMS, build_new_character
+from app.services.share_cache import share_response_cache
+from app.services.share_snapshots import share_snapshots
+from app.services.share_token_filter import share_token_filter
+from app.services.versions import VERSIONED_FIELDS, initial_version, load_latest_versions, record_version
+
+router = APIRouter(prefix="/api/characters", tags=["bulk"])
+
+
+def _merge_tags(current: List[str], add: List[str], remove: List[str]) -> List[str]:
+    """タグの追加・削除（順序を保ち重複は除く）"""
+    removed = set(remove)
+    merged: List[str] = []
+    for tag in [*current, *add]:
+        if tag not in removed and tag not in merged:
+            merged.append(tag)
+    return merged
+
+
+def _prepare_update(op: BulkUpdateOperation, row: Any, now: datetime) -> Optional[Dict[str, Any]]:
+    """更新操作 → ORM の主キー指定一括UPDATE用のパラメータ（変更が無ければ None）"""
+    data = op.data
+    params: Dict[str, Any] = {}
+    if data.name is not None:
+        params["name"] = data.name
+    if data.profile_image_url is not None:
+        params["profile_image_url"] = data.profile_image_url
+    if data.tags is not None or op.add_tags or op.remove_tags:
+        base_tags = data.tags if data.tags is not None else list(row.tags or [])
+        params["tags"] = _merge_tags(base_tags, op.add_tags, op.remove_tags)
+    if data.sheet_data is not None:
+        if row.system in CTHULHU_SYSTEMS:
+            validate_cthulhu_skill_points(data.sheet_data, row.system)
+        params["sheet_data"] = data.sheet_data
+        params["summary"] = build_character_summary(row.system, data.sheet_data)
+    if not params:
+        return None
+    return {"id": op.id, "updated_at": now, **params}
+
+
+@router.post("/bulk", response_model=BulkResponse)
+async def bulk_characters(
+    request_data: BulkRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """キャラクターの一括操作（作成・更新・削除・公開切替）
+
+    権限チェック用の既存行は1クエリで取得し、操作の種類ごとにまとめたSQLで1トランザクションで反映する。
+    結果は操作ごとに返す（失敗した操作は status/detail に理由を入れ、他の操作は反映する）。
+    atomic=True の場合は1件でも失敗したら何も反映しない。
+    """
+    operations = request_data.operations
+
+    now = datetime.utcnow()
+    results: List[Optional[BulkItemResult]] = [None] * len(operations)
+
+    # 既存キャラクターをまとめて取得（sheet_data は読み込まない）
+    target_ids = {op.id for op in operations if op.op != "create"}
+    existing: Dict[uuid.UUID, Any] = {}
+    if target_ids:
+        rows = await db.execute(
+            select(
+                Character.id,
+                Character.user_id,
+                Character.system,
+                Character.tags,
+                Character.is_public,
+                Character.share_token,
+            )
+            .where(Character.id.in_(target_ids))
+        )
+        existing = {row.id: row for row in rows}
+
+    creates: List[tuple[int, Character]] = []
+    updates: List[tuple[int, Optional[Dict[str, Any]]]] = []
+    publishes: List[tuple[int, Dict[str, Any]]] = []
+    unpublishes: List[int] = []
+    deletes: List[int] = []
+    seen: set[uuid.UUID] = set()
+
+    for index, op in enumerate(operations):
+        try:
+            if op.op == "create":
+                creates.append((index, build_new_character(op.data, current_user.id)))
+                continue
+
+            row = existing.get(op.id)
+            if row is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Character not found",
+                )
+            if row.user_id != current_user.id:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Access denied",
+                )
+            # 同じキャラクターへの操作は1リクエストに1つまで
+            if op.id in seen:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Duplicate operation for the same character",
+                )
+            seen.add(op.id)
+
+            if op.op == "update":
+                updates.append((index, _prepare_update(op, row, now)))
+            elif op.op == "publish":
+                if op.is_public:
+                    share_token = row.share_token or secrets.token_urlsafe(32)
+                    share_token_filter.add(share_token)
+                    publishes.append((index, {"id": op.id, "is_public": True, "share_token": share_token, "updated_at": now}))
+                else:
+                    unpublishes.append(index)
+            else:
+                deletes.append(index)
+        except HTTPException as e:
+            results[index] = BulkItemResult(
+                index=index,
+                op=op.op,
+                id=getattr(op, "id", None),
+                status=e.status_code,
+                detail=str(e.detail),
+            )
+
+    failed = sum(1 for r in results if r is not None)
+    if request_data.atomic and failed:
+        for index, op in enumerate(operations):
+            if results[index] is None:
+                results[index] = BulkItemResult(
+                    index=index,
+                    op=op.op,
+                    id=getattr(op, "id", None),
+                    status=status.HTTP_424_FAILED_DEPENDENCY,
+                    detail="Not applied because another operation failed",
+                )
+        return BulkResponse(results=results, succeeded=0, failed=failed, committed=False)
+
+    audit_meta = {"bulk": True}
+
+    # 作成（UnitOfWork が複数行INSERTにまとめる）
+    for index, character in creates:
+        db.add(character)
+        db.add(initial_version(character, current_user.id))
+        create_audit_log(db, current_user.id, character.id, ActionEnum.create, audit_meta)
+        results[index] = BulkItemResult(index=index, op="create", id=character.id, status=status.HTTP_201_CREATED)
+
+    # 更新（主キー指定の一括UPDATE）
+    update_params = [params for _, params in updates if params is not None]
+    if update_params:
+        await db.execute(update(Character), update_params)
+        sheet_ids = [params["id"] for params in update_params if "sheet_data" in params]
+        if sheet_ids:
+            # 保存したシートを正とし、ライブ状態は破棄する
+            await db.execute(delete(CharacterLiveState).where(CharacterLiveState.character_id.in_(sheet_ids)))
+        # 変更履歴（差分は置き換えたフィールドそのもの。最新バージョンは1クエリで取得）
+        latest_versions = await load_latest_versions(db, [params["id"] for params in update_params])
+        for params in update_params:
+            ops = [
+                {"op": "replace", "path": [field], "value": params[field]}
+                for field in VERSIONED_FIELDS
+                if field in params
+            ]
+            await record_version(
+                db, params["id"], current_user.id, ops=ops, latest=latest_versions.get(params["id"])
+            )
+    for index, params in updates:
+        op = operations[index]
+        if params is not None:
+            create_audit_log(db, current_user.id, op.id, ActionEnum.update, audit_meta)
+        results[index] = BulkItemResult(index=index, op="update", id=op.id, status=status.HTTP_200_OK)
+
+    # 公開・非公開
+    if publishes:
+        await db.execute(update(Character), [params for _, params in publishes])
+    for index, params in publishes:
+        create_audit_log(db, current_user.id, params["id"], ActionEnum.publish, audit_meta)
+        results[index] = BulkItemResult(
+            index=index, op="publish", id=params["id"], status=status.HTTP_200_OK, share_token=params["share_token"]
+        )
+    if unpublishes:
+        unpublish_ids = [operations[index].id for index in unpublishes]
+        await db.execute(
+            update(Character)
+            .where(Character.id.in_(unpublish_ids))
+            .values(is_public=False, share_token=None, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    for index in unpublishes:
+        op = operations[index]
+        create_audit_log(db, current_user.id, op.id, ActionEnum.unpublish, audit_meta)
+        results[index] = BulkItemResult(index=index, op="publish", id=op.id, status=status.HTTP_200_OK)
+
+    # 削除（監査ログを先に書き、まとめてDELETE）
+    if deletes:
+        delete_ids = [operations[index].id for index in deletes]
+        for character_id in delete_ids:
+            create_audit_log(db, current_user.id, character_id, ActionEnum.delete, audit_meta)
+        await db.flush()
+        await db.execute(
+            delete(Character)
+            .where(Character.id.in_(delete_ids))
+            .execution_options(synchronize_session=False)
+        )
+    for index in deletes:
+        results[index] = BulkItemResult(index=index, op="delete", id=operations[index].id, status=status.HTTP_204_NO_CONTENT)
+
+    await db.commit()
+    for character_id in seen:
+        share_response_cache.invalidate_character(character_id)
+
+    # 共有ページのスナップショット（公開中の更新・公開は書き出し、非公開・削除は消す）
+    refresh_ids = [params["id"] for _, params in publishes]
+    refresh_ids += [params["id"] for params in update_params if existing[params["id"]].is_public]
+    for character_id in refresh_ids:
+        share_snapshots.schedule_refresh(character_id)
+    for index in [*unpublishes, *deletes]:
+        row = existing[operations[index].id]
+        await share_snapshots.delete(row.id, row.share_token)
+
+    return BulkResponse(
+        results=results,
+        succeeded=len(operations) - failed,
+        failed=failed,
+        committed=True,
+    )
@@ -1,34 +1,74 @@
 import uuid
+import base64
+import json
 import secrets
+import logging
+from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import String, cast
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import String, and_, func, literal, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer, load_only
 
 from app.database import get_db
 from app.auth import get_current_user
-from app.models import User, Character, SystemEnum, ActionEnum, AuditLog
+from app.models import User, Character, CharacterLiveState, SystemEnum, ActionEnum
 from app.schemas import (
     CharacterCreate,
     CharacterUpdate,
     CharacterResponse,
     CharacterListResponse,
+    CharacterSummaryResponse,
     PublishRequest,
     PublishResponse,
     AutoRollAttributesRequest,
     AutoRollAttributesResponse,
 )
-from app.templates import generate_template
-from app.validators import validate_cthulhu_skill_points
+from app.etag import character_etag, check_if_match, if_none_match
+from app.summary import SUMMARY_SHEET_KEYS
+from app.validators import CTHULHU_SKILL_POINT_KEYS, validate_cthulhu_skill_points
+from app.services.audit import create_audit_log
+from app.services.characters import build_new_character
+from app.services.versions import initial_version, patch_ops, record_version, version_state
+from app.services.autosave import apply_character_update, autosave_coalescer
 from app.services.dice import generate_cthulhu_attributes
-from app.services.gcs import maybe_sign_read_url
+from app.services.sheet_patch import parse_patch
+from app.services.share_cache import share_response_cache
+from app.services.share_snapshots import share_snapshots
+from app.services.share_token_filter import share_token_filter
+from app.services.gcs import maybe_sign_read_url, maybe_sign_read_urls
+from app.services.live_state import (
+    LIVE_STATE_SHEET_KEYS,
+    clear_live_state,
+    live_state_overlay,
+    live_state_updated_at,
+    load_live_state,
+    load_live_states,
+    merge_live_state,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/characters", tags=["characters"])
 
+# 詳細レスポンスはブラウザキャッシュに置いてよいが、毎回 ETag で再検証させる
+_DETAIL_CACHE_CONTROL = "private, no-cache"
+
 _CTHULHU_SYSTEMS = {SystemEnum.cthulhu6, SystemEnum.cthulhu7}
 
-def _to_character_response(c: Character) -> CharacterResponse:
-    """Character → APIレスポンス（画像URLは署名付きに差し替え）"""
+def _to_character_response(
+    c: Character,
+    signed_image_url: Optional[str] = None,
+    live_state: Optional[CharacterLiveState] = None,
+) -> CharacterResponse:
+    """Character → APIレスポンス（画像URLは署名付きに差し替え。署名済みなら signed_image_url を渡す）
+
+    live_state を渡すと sheet_data.derived の現在値に重ねる。
+    """
+    if signed_image_url is None:
+        signed_image_url = maybe_sign_read_url(c.profile_image_url)
     return CharacterResponse.model_validate(
         {
             "id": c.id,
@@ -36,8 +76,8 @@ def _to_character_response(c: Character) -> CharacterResponse:
             "system": c.system,
             "name": c.name,
             "tags": c.tags,
-            "profile_image_url": maybe_sign_read_url(c.profile_image_url),
-            "sheet_data": c.sheet_data,
+            "profile_image_url": signed_image_url,
+            "sheet_data": merge_live_state(c.sheet_data, live_state),
             "is_public": c.is_public,
             "share_token": c.share_token,
             "created_at": c.created_at,
@@ -46,89 +86,243 @@ def _to_character_response(c: Character) -> CharacterResponse:
     )
 
 
-def create_audit_log(
-    db: Session,
-    user_id: uuid.UUID,
-    character_id: uuid.UUID,
-    action: ActionEnum,
-    meta_data: dict = None,
-):
-    """監査ログを作成"""
-    audit_log = AuditLog(
-        id=uuid.uuid4(),
-        user_id=user_id,
-        character_id=character_id,
-        action=action,
-        meta_data=meta_data or {},
+def _to_character_summary_response(c: Character, signed_image_url: Optional[str] = None) -> CharacterSummaryResponse:
+    """Character → 一覧用レスポンス（sheet_data は含めない）"""
+    if signed_image_url is None:
+        signed_image_url = maybe_sign_read_url(c.profile_image_url)
+    return CharacterSummaryResponse.model_validate(
+        {
+            "id": c.id,
+            "user_id": c.user_id,
+            "system": c.system,
+            "name": c.name,
+            "tags": c.tags,
+            "profile_image_url": signed_image_url,
+            "is_public": c.is_public,
+            "share_token": c.share_token,
+            "summary": c.summary or {},
+            "created_at": c.created_at,
+            "updated_at": c.updated_at,
+        }
     )
-    db.add(audit_log)
-    db.commit()
+
+
+# view=summary で読み込む列（sheet_data は読み込まない）
+_SUMMARY_COLUMNS = (
+    Character.id,
+    Character.user_id,
+    Character.system,
+    Character.system_text,
+    Character.name,
+    Character.profile_image_url,
+    Character.tags,
+    Character.is_public,
+    Character.share_token,
+    Character.summary,
+    Character.created_at,
+    Character.updated_at,
+)
+
+
+# 並び替えキー: (Characterの属性名, ソート式, 方向)
+# - system_asc は PostgreSQL enum の定義順ではなく文字列として昇順にする（system_text 列）
+# - 末尾は必ず一意な id にして、キーセットページネーションのカーソルを一意に定める
+# - 各並び順は (user_id, <ソートキー>..., id) の複合インデックスを前方/後方スキャンできる向きにしている
+_SORT_KEYS = {
+    "name_asc": [("name", Character.name, "asc"), ("updated_at", Character.updated_at, "desc"), ("id", Character.id, "asc")],
+    "name_desc": [("name", Character.name, "desc"), ("updated_at", Character.updated_at, "desc"), ("id", Character.id, "asc")],
+    "created_asc": [("created_at", Character.created_at, "asc"), ("id", Character.id, "asc")],
+    "created_desc": [("created_at", Character.created_at, "desc"), ("id", Character.id, "desc")],
+    "updated_asc": [("updated_at", Character.updated_at, "asc"), ("id", Character.id, "asc")],
+    "updated_desc": [("updated_at", Character.updated_at, "desc"), ("id", Character.id, "desc")],
+    "system_asc": [
+        ("system_text", Character.system_text, "asc"),
+        ("name", Character.name, "asc"),
+        ("updated_at", Character.updated_at, "desc"),
+        ("id", Character.id, "asc"),
+    ],
+}
+
+
+def _cursor_value(c: Character, attr: str) -> str:
+    value = getattr(c, attr)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _encode_cursor(sort: str, c: Character) -> str:
+    """最終行のソートキーから不透明なカーソル文字列を作る"""
+    payload = {"s": sort, "k": [_cursor_value(c, attr) for attr, _, _ in _SORT_KEYS[sort]]}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(sort: str, cursor: str) -> list:
+    """カーソル文字列をソートキーの値に戻す（不正な場合は400）"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        keys = _SORT_KEYS[sort]
+        if payload["s"] != sort or len(payload["k"]) != len(keys):
+            raise ValueError("cursor does not match sort")
+        values = []
+        for (attr, _, _), v in zip(keys, payload["k"]):
+            if attr in ("created_at", "updated_at"):
+                values.append(datetime.fromisoformat(v))
+            elif attr == "id":
+                values.append(uuid.UUID(v))
+            else:
+                values.append(str(v))
+        return values
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+def _keyset_condition(sort: str, values: list):
+    """(k1, k2, ...) がカーソル位置より後ろにある行の条件（昇順/降順の混在に対応）"""
+    keys = _SORT_KEYS[sort]
+    directions = {direction for _, _, direction in keys}
+    if len(directions) == 1:
+        # 向きが揃っていれば行値比較にして、インデックスの範囲スキャンに乗せる
+        row = tuple_(*[expr for _, expr, _ in keys])
+        return row > tuple_(*values) if directions == {"asc"} else row < tuple_(*values)
+    clauses = []
+    for i, (_, expr, direction) in enumerate(keys):
+        prefix = [keys[j][1] == values[j] for j in range(i)]
+        step = expr > values[i] if direction == "asc" else expr < values[i]
+        clauses.append(and_(*prefix, step))
+    return or_(*clauses)
+
+
+_SEARCH_MODES = {"name", "fulltext"}
+
+
+def _fulltext_query(text: str):
+    """検索語を search_vector と同じ2-gramに分解した tsquery にする
+
+    2文字以上はN-gramの連続（フレーズ）で部分一致、1文字は前方一致で探す。
+    """
+    normalized = "".join(text.lower().split())
+    if len(normalized) == 1:
+        return func.to_tsquery("simple", func.quote_literal(normalized, type_=String) + ":*")
+    return func.phraseto_tsquery("simple", func.character_search_ngrams(normalized))
 
 
 @router.get("", response_model=CharacterListResponse)
 async def list_characters(
-    query: Optional[str] = Query(None, description="名前で検索"),
+    query: Optional[str] = Query(None, description="検索語（search=name: 名前、search=fulltext: 職業・経歴・メモ等）"),
+    search: str = Query("name", description="検索モード（name|fulltext）。fulltextは関連度順"),
+    view: str = Query("full", description="返却形式（full: sheet_dataを含む|summary: 一覧用の概要のみ）"),
     tags: Optional[List[str]] = Query(None, description="タグでフィルタ"),
     system: Optional[SystemEnum] = Query(None, description="システムでフィルタ"),
     sort: str = Query(
         "updated_desc",
         description="並び替え（name_asc|name_desc|created_asc|created_desc|updated_asc|updated_desc|system_asc）",
     ),
-    page: int = Query(1, ge=1, description="ページ番号"),
+    page: int = Query(1, ge=1, description="ページ番号（cursor指定時は無視）"),
     limit: int = Query(20, ge=1, le=100, description="1ページあたりの件数"),
+    cursor: Optional[str] = Query(None, description="前回レスポンスの next_cursor（キーセットページネーション）"),
+    include_total: Optional[bool] = Query(
+        None,
+        description="総件数を返すか（省略時: page指定ではtrue、cursor指定ではfalse）",
+    ),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """キャラクター一覧取得・検索（所有者のみ）"""
-    offset = (page - 1) * limit
+    if sort not in _SORT_KEYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid sort option: {sort}",
+        )
+    if view not in ("full", "summary"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid view: {view}",
+        )
+    if search not in _SEARCH_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid search mode: {search}",
+        )
+    fulltext = search == "fulltext" and bool(query and query.strip())
+    if fulltext and cursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="cursor is not supported with search=fulltext",
+        )
+    if include_total is None:
+        include_total = cursor is None
 
     # 基本クエリ：所有者のキャラクターのみ
-    q = db.query(Character).filter(Character.user_id == current_user.id)
-
-    # 名前で検索
-    if query:
-        q = q.filter(Character.name.ilike(f"%{query}%"))
+    q = select(Character).where(Character.user_id == current_user.id)
+    if view == "summary":
+        q = q.options(load_only(*_SUMMARY_COLUMNS))
+
+    # 検索（名前はpg_trgmのGINインデックス、全文は search_vector のGINインデックスを使う）
+    ts_query = None
+    if fulltext:
+        ts_query = _fulltext_query(query)
+        q = q.where(Character.search_vector.op("@@")(ts_query))
+    elif query and search == "name":
+        q = q.where(Character.name.ilike(f"%{query}%"))
 
     # システムでフィルタ
     if system:
-        q = q.filter(Character.system == system)
+        q = q.where(Character.system == system)
 
     # タグでフィルタ（PostgreSQLの@>演算子を使用）
     if tags:
         for tag in tags:
-            q = q.filter(Character.tags.op('@>')(f'{{{tag}}}'))
-
-    # 並び替え
-    # - system_asc は PostgreSQL enum の定義順ではなく文字列として昇順にする
-    order_by_map = {
-        "name_asc": [Character.name.asc(), Character.updated_at.desc(), Character.id.asc()],
-        "name_desc": [Character.name.desc(), Character.updated_at.desc(), Character.id.asc()],
-        "created_asc": [Character.created_at.asc(), Character.id.asc()],
-        "created_desc": [Character.created_at.desc(), Character.id.asc()],
-        "updated_asc": [Character.updated_at.asc(), Character.id.asc()],
-        "updated_desc": [Character.updated_at.desc(), Character.id.asc()],
-        "system_asc": [cast(Character.system, String).asc(), Character.name.asc(), Character.updated_at.desc(), Character.id.asc()],
-    }
-    if sort not in order_by_map:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid sort option: {sort}",
-        )
-
-    # 総件数を取得
-    total = q.count()
+            q = q.where(Character.tags.op('@>')(f'{{{tag}}}'))
+
+    # 総件数を取得（カーソル位置の条件を付ける前に数える）
+    total = None
+    if include_total:
+        total = await db.scalar(select(func.count()).select_from(q.subquery()))
+
+    order_by = [expr.asc() if direction == "asc" else expr.desc() for _, expr, direction in _SORT_KEYS[sort]]
+    if ts_query is not None:
+        # 全文検索は関連度順（同点は指定の並び順）
+        order_by.insert(0, func.ts_rank(Character.search_vector, ts_query).desc())
+    q = q.order_by(*order_by)
+
+    # ページネーション（cursor指定時はキーセット、それ以外はオフセット）
+    # 次ページの有無を判定するため1件多く取得する
+    if cursor:
+        q = q.where(_keyset_condition(sort, _decode_cursor(sort, cursor)))
+    else:
+        q = q.offset((page - 1) * limit)
+    result = await db.execute(q.limit(limit + 1))
+    characters = result.scalars().all()
 
-    # ページネーション
-    characters = q.order_by(*order_by_map[sort]).offset(offset).limit(limit).all()
+    next_cursor = None
+    if len(characters) > limit:
+        characters = characters[:limit]
+        next_cursor = _encode_cursor(sort, characters[-1])
 
     # 画像URLは、非公開バケットでも表示できるよう署名付きURLに差し替え（失敗時は元URL）
-    items: List[CharacterResponse] = [_to_character_response(c) for c in characters]
+    # ページ分をまとめてスレッドプールで署名する
+    signed_urls = await maybe_sign_read_urls([c.profile_image_url for c in characters])
+    if view == "summary":
+        items = [_to_character_summary_response(c, url) for c, url in zip(characters, signed_urls)]
+    else:
+        live_states = await load_live_states(db, [c.id for c in characters])
+        items = [
+            _to_character_response(c, url, live_states.get(c.id))
+            for c, url in zip(characters, signed_urls)
+        ]
 
     return CharacterListResponse(
         items=items,
         total=total,
-        page=page,
+        page=None if cursor else page,
         limit=limit,
+        next_cursor=next_cursor,
     )
 
 
@@ -136,36 +330,19 @@ async def list_characters(
 async def create_character(
     character_data: CharacterCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """キャラクター新規作成"""
     try:
-        # テンプレートを生成
-        template = generate_template(character_data.system)
-        
-        # sheet_dataが空の場合、テンプレートを使用
-        sheet_data = character_data.sheet_data if character_data.sheet_data else template
-
-        # クトゥルフの場合、技能ポイント上限チェック
-        if character_data.system in _CTHULHU_SYSTEMS:
-            validate_cthulhu_skill_points(sheet_data, character_data.system)
-
-        character = Character(
-            id=uuid.uuid4(),
-            user_id=current_user.id,
-            system=character_data.system,
-            name=character_data.name,
-            tags=character_data.tags,
-            profile_image_url=character_data.profile_image_url,
-            sheet_data=sheet_data,
-            is_public=False,
-        )
+        # sheet_dataが空の場合はテンプレートを使用し、クトゥルフは技能ポイント上限チェック
+        character = build_new_character(character_data, current_user.id)
         db.add(character)
-        db.commit()
-        db.refresh(character)
-
-        # 監査ログ
+        # 履歴の最初のバージョン（キーフレーム）
+        db.add(initial_version(character, current_user.id))
+        # 監査ログ（同じトランザクションでコミット）
         create_audit_log(db, current_user.id, character.id, ActionEnum.create)
+        await db.commit()
+        await db.refresh(character)
 
         # APIの画像URL返却形式を統一（署名付きURL）
         return _to_character_response(character)
@@ -177,11 +354,16 @@ async def create_character(
 @router.get("/{character_id}", response_model=CharacterResponse)
 async def get_character(
     character_id: uuid.UUID,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    """キャラクター詳細取得（所有者または公開されている場合）"""
-    character = db.query(Character).filter(Character.id == character_id).first()
+    """キャラクター詳細取得（所有者または公開されている場合）
+
+    If-None-Match が現在の ETag と一致すれば、sheet_data を読まずに 304 を返す。
+    """
+    character = await db.get(Character, character_id, options=[defer(Character.sheet_data)])
 
     if not character:
         raise HTTPException(
@@ -197,18 +379,41 @@ async def get_character(
         )
 
     # 画像URLは、非公開バケットでも表示できるよう署名付きURLに差し替え
-    return _to_character_response(character)
+    signed_image_url = maybe_sign_read_url(character.profile_image_url)
+    live_state = await load_live_state(db, character.id)
+    etag = character_etag(character.id, character.updated_at, signed_image_url, live_state_updated_at(live_state))
+    if if_none_match(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, "Cache-Control": _DETAIL_CACHE_CONTROL},
+        )
+
+    await db.refresh(character, attribute_names=["sheet_data"])
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = _DETAIL_CACHE_CONTROL
+    return _to_character_response(character, signed_image_url, live_state)
 
 
 @router.put("/{character_id}", response_model=CharacterResponse)
 async def update_character(
     character_id: uuid.UUID,
     character_data: CharacterUpdate,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    """キャラクター更新（所有者のみ）"""
-    character = db.query(Character).filter(Character.id == character_id).first()
+    """キャラクター更新（所有者のみ）
+
+    If-Match を指定した場合は行ロックを取り、バージョンが異なれば 412 を返す。
+    自動保存のまとめ（AUTOSAVE_COALESCE_WINDOW_MS）が有効なら、If-Match なしの更新は
+    短い時間窓でまとめて1回だけコミットする（app.services.autosave 参照）。
+    """
+    if_match = request.headers.get("if-match")
+    if autosave_coalescer.enabled and if_match is None:
+        return await _update_character_coalesced(character_id, character_data, response, current_user, db)
+
+    character = await db.get(Character, character_id, with_for_update=if_match is not None)
 
     if not character:
         raise HTTPException(
@@ -222,37 +427,265 @@ async def update_character(
             detail="Access denied",
         )
 
+    live_state = await load_live_state(db, character.id)
+    check_if_match(if_match, character.id, character.updated_at, live_state_updated_at(live_state))
+
+    # クトゥルフの場合、技能ポイント上限チェック
+    if character_data.sheet_data is not None and character.system in _CTHULHU_SYSTEMS:
+        validate_cthulhu_skill_points(character_data.sheet_data, character.system)
+
     # 更新可能なフィールドを更新
-    if character_data.name is not None:
-        character.name = character_data.name
-    if character_data.tags is not None:
-        character.tags = character_data.tags
-    if character_data.profile_image_url is not None:
-        character.profile_image_url = character_data.profile_image_url
-    if character_data.sheet_data is not None:
-        # クトゥルフの場合、技能ポイント上限チェック
-        if character.system in _CTHULHU_SYSTEMS:
-            validate_cthulhu_skill_points(character_data.sheet_data, character.system)
-        character.sheet_data = character_data.sheet_data
-
-    db.commit()
-    db.refresh(character)
-
-    # 監査ログ
+    fields = character_data.model_dump(exclude_none=True)
+    previous = version_state(character)
+    live_state = await apply_character_update(db, character, fields, live_state)
+
+    # 変更履歴（行を更新してロックを取ってから採番する。差分は読み込み済みの更新前の状態と比べる）
+    if fields:
+        await db.flush()
+        await record_version(db, character.id, current_user.id, version_state(character), previous=previous)
+
+    # 監査ログ（同じトランザクションでコミット）
     create_audit_log(db, current_user.id, character.id, ActionEnum.update)
+    await db.commit()
+    share_response_cache.invalidate_character(character.id)
+    if character.is_public:
+        share_snapshots.schedule_refresh(character.id)
+    await db.refresh(character)
 
     # APIの画像URL返却形式を統一（署名付きURL）
-    return _to_character_response(character)
+    signed_image_url = maybe_sign_read_url(character.profile_image_url)
+    response.headers["ETag"] = character_etag(
+        character.id, character.updated_at, signed_image_url, live_state_updated_at(live_state)
+    )
+    return _to_character_response(character, signed_image_url, live_state)
+
+
+async def _update_character_coalesced(
+    character_id: uuid.UUID,
+    character_data: CharacterUpdate,
+    response: Response,
+    current_user: User,
+    db: AsyncSession,
+) -> CharacterResponse:
+    """自動保存のまとめ経由の更新（権限チェックと検証はリクエストごとに行う）"""
+    row = (
+        await db.execute(select(Character.user_id, Character.system).where(Character.id == character_id))
+    ).one_or_none()
+
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Character not found",
+        )
+
+    if row.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied",
+        )
+
+    if character_data.sheet_data is not None and row.system in _CTHULHU_SYSTEMS:
+        validate_cthulhu_skill_points(character_data.sheet_data, row.system)
+
+    # まとめ待ちの間DB接続を握らない
+    await db.rollback()
+
+    character, live_state = await autosave_coalescer.submit(
+        character_id, current_user.id, character_data.model_dump(exclude_none=True)
+    )
+    signed_image_url = maybe_sign_read_url(character.profile_image_url)
+    response.headers["ETag"] = character_etag(
+        character.id, character.updated_at, signed_image_url, live_state_updated_at(live_state)
+    )
+    return _to_character_response(character, signed_image_url, live_state)
+
+
+# PATCH の UPDATE ... RETURNING で返す列（レスポンスに使うものだけ。summary などは返さない）
+_PATCH_RETURNING = (
+    Character.id,
+    Character.user_id,
+    Character.system,
+    Character.name,
+    Character.tags,
+    Character.profile_image_url,
+    Character.sheet_data,
+    Character.is_public,
+    Character.share_token,
+    Character.created_at,
+    Character.updated_at,
+)
+
+
+async def _execute_patch(db: AsyncSession, stmt):
+    """パッチ関数を含む文を実行する（DB関数のエラーを 409 / 422 にする）"""
+    try:
+        return await db.execute(stmt, execution_options={"synchronize_session": False})
+    except DBAPIError as e:
+        await db.rollback()
+        sqlstate = getattr(e.orig, "sqlstate", None)
+        if sqlstate == "P0004":
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="JSON Patch test operation failed",
+            )
+        if sqlstate == "22023":
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Invalid patch: {e.orig}",
+            )
+        raise
+
+
+@router.patch("/{character_id}", response_model=CharacterResponse)
+async def patch_character(
+    character_id: uuid.UUID,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """キャラクター部分更新（所有者のみ）
+
+    JSON Merge Patch（application/merge-patch+json）または JSON Patch（application/json-patch+json）。
+    sheet_data への変更はDB側（jsonb_merge_patch / jsonb_apply_patch）で適用し、文書全体を読み込まない。
+    If-Match を指定した場合、UPDATE の条件に updated_at を含め、UPDATE 後にライブ状態の行をロックして
+    確かめる（ETag はライブ状態の更新日時も含むため）。競合時は 412 を返す。
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid JSON body",
+        )
+    patch = parse_patch(request.headers.get("content-type"), body)
+
+    # 所有者チェック（sheet_data は読み込まない）
+    row = (
+        await db.execute(select(Character.user_id, Character.system, Character.updated_at).where(Character.id == character_id))
+    ).one_or_none()
+
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Character not found",
+        )
+
+    if row.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied",
+        )
+
+    live_state = await load_live_state(db, character_id)
+    if_match = request.headers.get("if-match")
+    check_if_match(if_match, character_id, row.updated_at, live_state_updated_at(live_state))
+    conditional = bool(if_match) and if_match.strip() != "*"
+
+    if patch.is_noop:
+        # 変更が無ければ書き込まない（updated_at・変更履歴・監査ログも変えない）。test 操作だけは評価する
+        if patch.sheet_patch is not None:
+            await _execute_patch(
+                db,
+                # 評価するだけ（文書は返さない）
+                select(
+                    func.jsonb_typeof(func.jsonb_apply_patch(Character.sheet_data, literal(patch.sheet_patch, JSONB)))
+                ).where(Character.id == character_id),
+            )
+        character = await db.get(Character, character_id)
+        signed_image_url = maybe_sign_read_url(character.profile_image_url)
+        response.headers["ETag"] = character_etag(
+            character.id, character.updated_at, signed_image_url, live_state_updated_at(live_state)
+        )
+        return _to_character_response(character, signed_image_url, live_state)
+
+    values = dict(patch.fields)
+    overlay = None
+    if patch.sheet_patch is not None:
+        base = Character.sheet_data
+        if live_state is not None and patch.touches(LIVE_STATE_SHEET_KEYS):
+            # derived を変更する場合は、先にライブ状態を sheet_data に畳み込む
+            overlay = {"derived": live_state_overlay(live_state)}
+            base = func.jsonb_merge_patch(base, literal(overlay, JSONB))
+        patch_fn = func.jsonb_merge_patch if patch.kind == "merge" else func.jsonb_apply_patch
+        values["sheet_data"] = patch_fn(base, literal(patch.sheet_patch, JSONB))
+        if patch.touches(SUMMARY_SHEET_KEYS):
+            # 概要も同じ UPDATE 文で計算する（build_character_summary の SQL 版）
+            values["summary"] = func.character_summary(row.system.value, values["sheet_data"])
+    values["updated_at"] = datetime.utcnow()
+
+    stmt = update(Character).where(Character.id == character_id)
+    if conditional:
+        # チェック後に別リクエストが更新していたら0行になる
+        stmt = stmt.where(Character.updated_at == row.updated_at)
+    stmt = stmt.values(**values).returning(*_PATCH_RETURNING)
+    result = await _execute_patch(db, stmt)
+    character = result.one_or_none()
+    if character is None:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Character has been modified",
+        )
+
+    if conditional or overlay is not None:
+        # ライブ状態は別の行なので、ロックして読み直す（If-Match の判定・畳み込みに使った値から変わっていないか）
+        current_live_updated_at = await db.scalar(
+            select(CharacterLiveState.updated_at)
+            .where(CharacterLiveState.character_id == character_id)
+            .with_for_update()
+        )
+        if current_live_updated_at != live_state_updated_at(live_state):
+            await db.rollback()
+            if conditional:
+                raise HTTPException(
+                    status_code=status.HTTP_412_PRECONDITION_FAILED,
+                    detail="Character has been modified",
+                )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Live state has been modified",
+            )
+
+    # クトゥルフの場合、技能・能力値に関わる変更があった時だけ技能ポイント上限チェック
+    if character.system in _CTHULHU_SYSTEMS and patch.touches(CTHULHU_SKILL_POINT_KEYS):
+        try:
+            validate_cthulhu_skill_points(character.sheet_data, character.system)
+        except HTTPException:
+            await db.rollback()
+            raise
+
+    if overlay is not None:
+        await clear_live_state(db, character.id)
+        live_state = None
+
+    # 変更履歴（UPDATE で行ロックを取った後に採番する。差分はDBで当てたのと同じ操作）
+    await record_version(
+        db, character.id, current_user.id, version_state(character), ops=patch_ops(patch, overlay)
+    )
+
+    # 監査ログ（同じトランザクションでコミット）
+    create_audit_log(db, current_user.id, character.id, ActionEnum.update, {"patch": patch.kind})
+    await db.commit()
+    share_response_cache.invalidate_character(character.id)
+    if character.is_public:
+        share_snapshots.schedule_refresh(character.id)
+
+    signed_image_url = maybe_sign_read_url(character.profile_image_url)
+    response.headers["ETag"] = character_etag(
+        character.id, character.updated_at, signed_image_url, live_state_updated_at(live_state)
+    )
+    return _to_character_response(character, signed_image_url, live_state)
 
 
 @router.delete("/{character_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_character(
     character_id: uuid.UUID,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """キャラクター削除（所有者のみ）"""
-    character = db.query(Character).filter(Character.id == character_id).first()
+    character = await db.get(Character, character_id)
 
     if not character:
         raise HTTPException(
@@ -266,11 +699,14 @@ async def delete_character(
             detail="Access denied",
         )
 
-    # 監査ログ（削除前に作成）
+    # 監査ログ（削除と同じトランザクションでコミット）
     create_audit_log(db, current_user.id, character.id, ActionEnum.delete)
 
-    db.delete(character)
-    db.commit()
+    share_token = character.share_token
+    await db.delete(character)
+    await db.commit()
+    share_response_cache.invalidate_character(character_id)
+    await share_snapshots.delete(character_id, share_token)
 
     return None
 
@@ -280,10 +716,10 @@ async def publish_character(
     character_id: uuid.UUID,
     publish_data: PublishRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """キャラクター公開切替（所有者のみ）"""
-    character = db.query(Character).filter(Character.id == character_id).first()
+    character = await db.get(Character, character_id)
 
     if not character:
         raise HTTPException(
@@ -297,23 +733,30 @@ async def publish_character(
             detail="Access denied",
         )
 
+    previous_token = character.share_token
     character.is_public = publish_data.is_public
 
     if publish_data.is_public:
         # 公開する場合、share_tokenを生成
         if not character.share_token:
             character.share_token = secrets.token_urlsafe(32)
+        share_token_filter.add(character.share_token)
         action = ActionEnum.publish
     else:
         # 非公開にする場合、share_tokenを削除
         character.share_token = None
         action = ActionEnum.unpublish
 
-    db.commit()
-    db.refresh(character)
-
-    # 監査ログ
+    # 監査ログ（同じトランザクションでコミット）
     create_audit_log(db, current_user.id, character.id, action)
+    await db.commit()
+    share_response_cache.invalidate_character(character.id)
+    # 公開したら共有ページのスナップショットを書き出し、非公開にしたら消す
+    if character.is_public:
+        share_snapshots.schedule_refresh(character.id)
+    else:
+        await share_snapshots.delete(character.id, previous_token)
+    await db.refresh(character)
 
     return PublishResponse(
         is_public=character.is_public,
@@ -326,10 +769,10 @@ async def auto_roll_attributes(
     character_id: uuid.UUID,
     request: AutoRollAttributesRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """能力値自動生成（クトゥルフのみ対応）"""
-    character = db.query(Character).filter(Character.id == character_id).first()
+    character = await db.get(Character, character_id)
 
     if not character:
         raise HTTPException(
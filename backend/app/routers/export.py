@@ -1,20 +1,47 @@
 import json
+import os
 import uuid
+from typing import AsyncIterator, List, Optional, Tuple
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth import get_current_user
-from app.database import get_db
-from app.models import Character, SystemEnum, User
-from app.schemas import CocofoliaExportResponse, ExportDiceStyle, ExportSkillScope
+from app.database import AsyncSessionLocal, get_db
+from app.models import ActionEnum, Character, CharacterLiveState, SystemEnum, User
+from app.schemas import (
+    CharacterCreate,
+    CocofoliaExportResponse,
+    ExportDiceStyle,
+    ExportSkillScope,
+    ImportErrorItem,
+    ImportResponse,
+)
+from app.services.audit import create_audit_log
+from app.services.characters import build_new_character
+from app.services.versions import initial_version
 from app.services.export import init_exporters
 from app.services.export.base import ExportOptions
 from app.services.export.registry import get_exporter
 from app.services.gcs import maybe_sign_read_url
+from app.services.live_state import load_live_state, merge_live_state
 
 
 router = APIRouter(prefix="/api/characters", tags=["export"])
 
+# NDJSON エクスポートでDBから一度に取り出す行数
+EXPORT_YIELD_PER = int(os.getenv("EXPORT_YIELD_PER", "200"))
+# NDJSON インポートで1回にINSERT・コミットする行数
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "200"))
+# NDJSON インポートの1行の上限（バイト）
+IMPORT_MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", str(1024 * 1024)))
+# インポート結果に含めるエラーの件数
+_IMPORT_MAX_ERRORS = 100
+
+_NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
 # Ensure exporters are registered once at import time
 init_exporters()
 
@@ -31,9 +58,9 @@ async def export_cocofolia(
     dice: ExportDiceStyle = Query(ExportDiceStyle.CCB, description="ダイスコマンド形式"),
     include_icon: bool = Query(True, description="iconUrl を含めるか"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    character = db.query(Character).filter(Character.id == character_id).first()
+    character = await db.get(Character, character_id)
     if not character:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Character not found")
 
@@ -65,7 +92,7 @@ async def export_cocofolia(
     exporter = get_exporter(system)
     clipboard = exporter.generate_cocofolia_clipboard(
         character=character,
-        sheet_data=character.sheet_data or {},
+        sheet_data=merge_live_state(character.sheet_data, await load_live_state(db, character.id)),
         options=options,
         share_url=share_url,
         icon_url=icon_url,
@@ -84,3 +111,165 @@ async def export_cocofolia(
         },
     )
 
+
+def _export_record(character: Character, live_state: Optional[CharacterLiveState]) -> dict:
+    """エクスポート1行分（画像URLは署名せず保存値のまま）"""
+    return {
+        "id": str(character.id),
+        "system": character.system.value,
+        "name": character.name,
+        "tags": list(character.tags or []),
+        "profile_image_url": character.profile_image_url,
+        "sheet_data": merge_live_state(character.sheet_data, live_state),
+        "is_public": character.is_public,
+        "created_at": character.created_at.isoformat(),
+        "updated_at": character.updated_at.isoformat(),
+    }
+
+
+async def _export_ndjson(user_id: uuid.UUID) -> AsyncIterator[bytes]:
+    """サーバーサイドカーソルで EXPORT_YIELD_PER 行ずつ読み、NDJSON で返す"""
+    # レスポンスの送信中も使うので、リクエストのセッションとは別に開く
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(Character, CharacterLiveState)
+            .outerjoin(CharacterLiveState, CharacterLiveState.character_id == Character.id)
+            .where(Character.user_id == user_id)
+            .order_by(Character.created_at, Character.id)
+            .execution_options(yield_per=EXPORT_YIELD_PER)
+        )
+        async for partition in result.partitions():
+            lines = [
+                json.dumps(_export_record(character, live_state), ensure_ascii=False, separators=(",", ":"))
+                for character, live_state in partition
+            ]
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            # 読み終えた行は識別マップから外し、メモリを一定に保つ
+            db.expunge_all()
+
+
+@router.get("/export.ndjson")
+async def export_ndjson(
+    current_user: User = Depends(get_current_user),
+):
+    """自分のキャラクター全件を NDJSON でエクスポート（1行1キャラクター、ストリーミング）"""
+    return StreamingResponse(
+        _export_ndjson(current_user.id),
+        media_type=_NDJSON_MEDIA_TYPE,
+        headers={"Content-Disposition": 'attachment; filename="characters.ndjson"'},
+    )
+
+
+async def _ndjson_lines(request: Request) -> AsyncIterator[Tuple[int, bytes]]:
+    """リクエストボディを少しずつ読み、(行番号, 行) を返す"""
+    buffer = b""
+    line_no = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            line_no += 1
+            yield line_no, line
+        if len(buffer) > IMPORT_MAX_LINE_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Line {line_no + 1} is too long (max {IMPORT_MAX_LINE_BYTES} bytes)",
+            )
+    if buffer:
+        yield line_no + 1, buffer
+
+
+def _parse_import_line(line: bytes) -> CharacterCreate:
+    """NDJSON 1行 → CharacterCreate（id・公開状態などエクスポート専用の項目は無視する）"""
+    try:
+        data = json.loads(line)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid JSON",
+        )
+    if not isinstance(data, dict):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Each line must be a JSON object",
+        )
+    try:
+        return CharacterCreate.model_validate(data)
+    except ValidationError as e:
+        error = e.errors()[0]
+        location = ".".join(str(part) for part in error["loc"])
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"{location}: {error['msg']}",
+        )
+
+
+async def _insert_import_batch(db: AsyncSession, user_id: uuid.UUID, batch: List[Character]) -> None:
+    """まとめてINSERTしてコミット（UnitOfWork が複数行INSERTにまとめる）"""
+    db.add_all(batch)
+    for character in batch:
+        db.add(initial_version(character, user_id))
+        create_audit_log(db, user_id, character.id, ActionEnum.create, {"import": True})
+    await db.commit()
+    db.expunge_all()
+
+
+@router.post("/import.ndjson", response_model=ImportResponse)
+async def import_ndjson(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    NDJSON からキャラクターを一括インポート（ストリーミング）
+
+    各行は export.ndjson と同じ形式。新しいIDで非公開として作成する。
+    sheet_data が空ならテンプレートを使い、クトゥルフは技能ポイント上限をチェックする。
+    失敗した行は飛ばして結果に行番号と理由を返す。IMPORT_BATCH_SIZE 行ごとにコミットする。
+
+    途中で 413（行が長すぎる）になった場合も、それまでにコミットした分は残る。エラーの detail に
+    コミット済みの件数と、コミット済みの最後の行番号（committed_through_line）を返すので、
+    その次の行から送り直せば続きから取り込める。
+    """
+    imported = 0
+    failed = 0
+    errors: List[ImportErrorItem] = []
+    batch: List[Character] = []
+    # コミット済みの最後の行番号（この行までは取り込み済み・失敗として報告済み）
+    committed_through_line = 0
+
+    try:
+        async for line_no, line in _ndjson_lines(request):
+            if line.strip():
+                try:
+                    batch.append(build_new_character(_parse_import_line(line), current_user.id))
+                except HTTPException as e:
+                    failed += 1
+                    if len(errors) < _IMPORT_MAX_ERRORS:
+                        errors.append(ImportErrorItem(line=line_no, detail=str(e.detail)))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await _insert_import_batch(db, current_user.id, batch)
+                imported += len(batch)
+                batch = []
+                committed_through_line = line_no
+    except HTTPException as e:
+        if e.status_code != status.HTTP_413_REQUEST_ENTITY_TOO_LARGE:
+            raise
+        raise HTTPException(
+            status_code=e.status_code,
+            detail={
+                "message": e.detail,
+                "imported": imported,
+                "committed_through_line": committed_through_line,
+                "errors": [
+                    error.model_dump() for error in errors if error.line <= committed_through_line
+                ],
+            },
+        )
+
+    if batch:
+        await _insert_import_batch(db, current_user.id, batch)
+        imported += len(batch)
+
+    return ImportResponse(imported=imported, failed=failed, errors=errors)
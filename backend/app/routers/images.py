@@ -1,21 +1,26 @@
 import uuid
 import os
+from typing import Optional
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from urllib.parse import quote
 
-from google.cloud import storage
 from google.api_core.exceptions import NotFound
 
 from app.database import get_db
 from app.auth import get_current_user
 from app.models import User, Character
 from app.schemas import ImageUploadUrlRequest, ImageUploadUrlResponse, ImageUploadResponse
+from app.services.share_cache import share_response_cache
+from app.services.share_snapshots import share_snapshots
+from app.services.versions import record_version
 from app.services.gcs import (
-    normalize_google_application_credentials_env,
     extract_gcs_bucket_and_object,
+    generate_signed_upload_url,
+    get_storage_client,
     maybe_sign_read_url,
+    signed_url_cache,
 )
 
 router = APIRouter(prefix="/api/characters", tags=["images"])
@@ -23,19 +28,26 @@ router = APIRouter(prefix="/api/characters", tags=["images"])
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 ALLOWED_MIME_TYPES = {"image/png", "image/jpeg", "image/jpg"}
 
+
+def _image_url_ops(old_url: Optional[str], new_url: Optional[str]) -> list:
+    """変更履歴の差分（profile_image_url だけが変わる）"""
+    if old_url == new_url:
+        return []
+    return [{"op": "replace", "path": ["profile_image_url"], "value": new_url}]
+
 @router.post("/{character_id}/image", response_model=ImageUploadResponse)
 async def upload_character_image(
     character_id: uuid.UUID,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """画像をバックエンド経由でGCSへアップロード（所有者のみ）
 
     - ブラウザ→GCS直PUTではなく、APIが受け取ってサービスアカウント権限でアップロードする
     - そのためGCSバケット側のCORS設定は不要
     """
-    character = db.query(Character).filter(Character.id == character_id).first()
+    character = await db.get(Character, character_id)
 
     if not character:
         raise HTTPException(status_code=404, detail="Character not found")
@@ -64,8 +76,7 @@ async def upload_character_image(
     object_name = f"profile-images/{character_id}/{uuid.uuid4()}.{file_extension}"
 
     try:
-        normalize_google_application_credentials_env()
-        client = storage.Client()  # ADC / ワークロードに紐づくサービスアカウントを使用
+        client = get_storage_client()  # ADC / ワークロードに紐づくサービスアカウントを使用
         bucket = client.bucket(bucket_name)
         blob = bucket.blob(object_name)
         blob.upload_from_string(contents, content_type=file.content_type)
@@ -78,9 +89,16 @@ async def upload_character_image(
     public_url = f"https://storage.googleapis.com/{bucket_name}/{quote(object_name, safe='/')}"
 
     # キャラクター側にも反映
+    previous_url = character.profile_image_url
     character.profile_image_url = public_url
-    db.commit()
-    db.refresh(character)
+    # 変更履歴（行を更新してロックを取ってから採番する）
+    await db.flush()
+    await record_version(db, character.id, current_user.id, ops=_image_url_ops(previous_url, public_url))
+    await db.commit()
+    share_response_cache.invalidate_character(character.id)
+    if character.is_public:
+        share_snapshots.schedule_refresh(character.id)
+    await db.refresh(character)
 
     # 返却URLはフロントでそのまま表示されるため、非公開バケットでも表示できるよう署名付きURLに統一
     return ImageUploadResponse(public_url=maybe_sign_read_url(public_url))
@@ -90,7 +108,7 @@ async def upload_character_image(
 async def delete_character_image(
     character_id: uuid.UUID,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """プロフィール画像を削除（所有者のみ）
 
@@ -98,7 +116,7 @@ async def delete_character_image(
     - DBの profile_image_url を None に戻す（プレースホルダー復帰）
     - idempotent（画像が無くても成功）
     """
-    character = db.query(Character).filter(Character.id == character_id).first()
+    character = await db.get(Character, character_id)
 
     if not character:
         raise HTTPException(status_code=404, detail="Character not found")
@@ -109,16 +127,21 @@ async def delete_character_image(
     # まずDB参照を外す（UIはプレースホルダーへ）
     image_url = character.profile_image_url
     character.profile_image_url = None
-    db.commit()
+    await db.flush()
+    await record_version(db, character.id, current_user.id, ops=_image_url_ops(image_url, None))
+    await db.commit()
+    share_response_cache.invalidate_character(character_id)
+    if character.is_public:
+        share_snapshots.schedule_refresh(character_id)
 
     # URLからbucket/objectが取れる場合のみGCS削除を試みる（失敗しても404にはしない）
     if image_url:
         extracted = extract_gcs_bucket_and_object(image_url)
         if extracted:
             bucket_name, object_name = extracted
+            signed_url_cache.invalidate(bucket_name, object_name)
             try:
-                normalize_google_application_credentials_env()
-                client = storage.Client()
+                client = get_storage_client()
                 bucket = client.bucket(bucket_name)
                 blob = bucket.blob(object_name)
                 blob.delete()
@@ -137,10 +160,10 @@ async def generate_image_upload_url(
     character_id: uuid.UUID,
     request: ImageUploadUrlRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """画像アップロード用署名付きURL発行（所有者のみ）"""
-    character = db.query(Character).filter(Character.id == character_id).first()
+    character = await db.get(Character, character_id)
 
     if not character:
         raise HTTPException(
@@ -178,15 +201,10 @@ async def generate_image_upload_url(
     expires_delta = timedelta(minutes=expiration_minutes)
 
     try:
-        normalize_google_application_credentials_env()
-        client = storage.Client()
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(object_name)
-
-        upload_url = blob.generate_signed_url(
-            version="v4",
-            expiration=expires_delta,
-            method="PUT",
+        upload_url = generate_signed_upload_url(
+            bucket_name,
+            object_name,
+            expires_delta,
             content_type=request.mime_type,
         )
     except Exception as e:
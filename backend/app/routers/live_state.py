@@ -0,0 +1,142 @@
+import uuid
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.auth import get_current_user
+from app.models import User, Character, CharacterLiveState
+from app.schemas import LiveStateAdjust, LiveStateResponse, LiveStateUpdate
+from app.services.share_cache import share_response_cache
+from app.services.share_snapshots import share_snapshots
+from app.services.live_state import (
+    LIVE_STATE_FIELDS,
+    LIVE_STATE_SYSTEMS,
+    adjust_live_state,
+    load_live_state,
+    set_live_state,
+    sheet_current_values,
+)
+
+router = APIRouter(prefix="/api/characters", tags=["live_state"])
+
+
+async def _get_live_target(
+    db: AsyncSession,
+    character_id: uuid.UUID,
+    current_user: User,
+    allow_public: bool = False,
+):
+    """権限チェック用に必要な列と sheet_data.derived だけを取得"""
+    row = (
+        await db.execute(
+            select(
+                Character.user_id,
+                Character.is_public,
+                Character.system,
+                Character.sheet_data["derived"].label("derived"),
+            ).where(Character.id == character_id)
+        )
+    ).one_or_none()
+
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Character not found",
+        )
+
+    if row.user_id != current_user.id and not (allow_public and row.is_public):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied",
+        )
+
+    if row.system not in LIVE_STATE_SYSTEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Live state is only supported for Cthulhu systems",
+        )
+
+    return row
+
+
+def _to_live_state_response(
+    character_id: uuid.UUID,
+    live_state: CharacterLiveState | None,
+    base: dict,
+) -> LiveStateResponse:
+    """ライブ状態 → レスポンス（未設定の項目は sheet_data の値）"""
+    values = dict(base)
+    if live_state is not None:
+        for column in LIVE_STATE_FIELDS:
+            value = getattr(live_state, column)
+            if value is not None:
+                values[column] = value
+    return LiveStateResponse(
+        character_id=character_id,
+        updated_at=live_state.updated_at if live_state is not None else None,
+        **values,
+    )
+
+
+@router.get("/{character_id}/live-state", response_model=LiveStateResponse)
+async def get_live_state(
+    character_id: uuid.UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """現在値（HP/SAN/MP）取得（所有者または公開されている場合）"""
+    row = await _get_live_target(db, character_id, current_user, allow_public=True)
+    live_state = await load_live_state(db, character_id)
+    return _to_live_state_response(character_id, live_state, sheet_current_values(row.derived))
+
+
+@router.put("/{character_id}/live-state", response_model=LiveStateResponse)
+async def update_live_state(
+    character_id: uuid.UUID,
+    data: LiveStateUpdate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """現在値を直接指定（所有者のみ）。sheet_data は書き換えない。"""
+    row = await _get_live_target(db, character_id, current_user)
+    values = data.model_dump(exclude_none=True)
+    if values:
+        live_state = await set_live_state(db, character_id, values)
+        await db.commit()
+        share_response_cache.invalidate_character(character_id)
+        if row.is_public:
+            share_snapshots.schedule_refresh(character_id)
+    else:
+        live_state = await load_live_state(db, character_id)
+    return _to_live_state_response(character_id, live_state, sheet_current_values(row.derived))
+
+
+@router.post("/{character_id}/live-state/adjust", response_model=LiveStateResponse)
+async def adjust_live_state_values(
+    character_id: uuid.UUID,
+    data: LiveStateAdjust,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """現在値の増減（所有者のみ）
+
+    例: {"hp": -3} で HP_current を3減らす。DB上の値に対して加算するので、
+    複数タブから同時に増減しても取りこぼさない。
+    """
+    row = await _get_live_target(db, character_id, current_user)
+    base = sheet_current_values(row.derived)
+    deltas = {
+        "hp_current": data.hp,
+        "san_current": data.san,
+        "mp_current": data.mp,
+    }
+    if any(deltas.values()):
+        live_state = await adjust_live_state(db, character_id, deltas, base)
+        await db.commit()
+        share_response_cache.invalidate_character(character_id)
+        if row.is_public:
+            share_snapshots.schedule_refresh(character_id)
+    else:
+        live_state = await load_live_state(db, character_id)
+    return _to_live_state_response(character_id, live_state, base)
@@ -1,53 +1,214 @@
-import uuid
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+import os
+import time
+from typing import Dict, Optional
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.orm import defer
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.models import Character
+from app.etag import character_etag, http_date, if_modified_since, if_none_match
+from app.models import Character, CharacterLiveState
 from app.schemas import CharacterResponse
-from app.services.gcs import maybe_sign_read_url
+from app.services import metrics
+from app.services.cache_tier import ReadToken
+from app.services.gcs import maybe_sign_read_urls, read_url_remaining_seconds
+from app.services.live_state import live_state_updated_at, load_live_state
+from app.services.share_cache import SharedResponse, share_response_cache
+from app.services.share_snapshots import ShareSnapshot, build_shared_response, share_snapshots
+from app.services.share_token_filter import share_token_filter
 
 router = APIRouter(prefix="/api/share", tags=["share"])
 
+# CDN・リバースプロキシに保持させる秒数（s-maxage）。ブラウザは既定で毎回 ETag で再検証する。
+SHARE_CDN_MAX_AGE_SECONDS = int(os.getenv("SHARE_CDN_MAX_AGE_SECONDS", "300"))
+SHARE_BROWSER_MAX_AGE_SECONDS = int(os.getenv("SHARE_BROWSER_MAX_AGE_SECONDS", "0"))
+# 存在しない・非公開のトークンへの 404 を CDN に保持させる秒数
+SHARE_NOT_FOUND_MAX_AGE_SECONDS = int(os.getenv("SHARE_NOT_FOUND_MAX_AGE_SECONDS", "30"))
+
+
+def _surrogate_keys(entry: SharedResponse, token: str) -> Dict[str, str]:
+    """CDN のパージ用キー（キャラクター単位・トークン単位）"""
+    keys = [f"character-{entry.character_id}", f"share-{token}"]
+    return {"Surrogate-Key": " ".join(keys), "Cache-Tag": ",".join(keys)}
+
+
+def _cache_control(entry: SharedResponse) -> str:
+    """署名付き画像URLの残り期限を超えてキャッシュさせない"""
+    shared_max_age = SHARE_CDN_MAX_AGE_SECONDS
+    max_age = SHARE_BROWSER_MAX_AGE_SECONDS
+    if entry.image_expires_at is not None:
+        remaining = int(entry.image_expires_at - time.time())
+        shared_max_age = min(shared_max_age, remaining)
+        max_age = min(max_age, remaining)
+    if shared_max_age <= 0 and max_age <= 0:
+        return "public, no-cache"
+    return f"public, max-age={max(max_age, 0)}, s-maxage={max(shared_max_age, 0)}"
+
+
+def _not_modified(entry: SharedResponse, request: Request) -> bool:
+    if_none_match_header = request.headers.get("if-none-match")
+    if if_none_match_header:
+        return if_none_match(if_none_match_header, entry.etag)
+    # Last-Modified は署名URLの差し替えを反映しないため、署名URLを含むレスポンスは ETag でのみ判定する
+    if entry.image_expires_at is None:
+        return if_modified_since(request.headers.get("if-modified-since"), entry.last_modified)
+    return False
+
+
+def _shared_response(entry: SharedResponse, token: str, request: Request) -> Response:
+    """キャッシュ用ヘッダーを付けて返す（条件付きリクエストが一致すれば 304）"""
+    headers = {
+        "ETag": entry.etag,
+        "Last-Modified": http_date(entry.last_modified),
+        "Cache-Control": _cache_control(entry),
+        **_surrogate_keys(entry, token),
+    }
+    if _not_modified(entry, request):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def _image_expires_at(original_url: Optional[str]) -> Optional[float]:
+    remaining = read_url_remaining_seconds(original_url)
+    return None if remaining is None else time.time() + remaining
+
+
+async def _sign_image_url(original_url: Optional[str]) -> Optional[str]:
+    # バッチ版は共有キャッシュの署名付きURLも使う（インスタンスをまたいで同じURLになる）
+    return (await maybe_sign_read_urls([original_url]))[0]
+
+
+async def _cache_entry(entry: SharedResponse, token: str, read_token: ReadToken) -> None:
+    ttl_seconds = None if entry.image_expires_at is None else entry.image_expires_at - time.time()
+    await share_response_cache.put(token, entry, read_token, ttl_seconds)
+
+
+async def _from_snapshot(snapshot: ShareSnapshot) -> SharedResponse:
+    """スナップショット → レスポンス（画像URLはここで署名する）"""
+    signed_image_url = await _sign_image_url(snapshot.profile_image_url)
+    return SharedResponse(
+        character_id=snapshot.character_id,
+        body=snapshot.response_body(signed_image_url),
+        etag=character_etag(snapshot.character_id, snapshot.updated_at, signed_image_url, snapshot.live_updated_at),
+        last_modified=max(snapshot.updated_at, snapshot.live_updated_at or snapshot.updated_at),
+        image_expires_at=_image_expires_at(snapshot.profile_image_url),
+    )
+
+
+async def _snapshot_is_current(db: AsyncSession, snapshot: ShareSnapshot) -> bool:
+    """スナップショットがDBの現在の内容と同じか（sheet_data は読まない）
+
+    確認済みで、その後に変更イベントが届いていなければDBを引かない。
+    他インスタンスでの更新・公開停止の後、書き出し・削除が終わっていない（失敗した）スナップショットを返さない。
+    """
+    if share_snapshots.is_stale(snapshot.character_id):
+        return False
+    if share_snapshots.is_verified(snapshot.character_id):
+        return True
+    generation = share_snapshots.generation
+    metrics.inc("share.snapshot.verify")
+    current = (
+        await db.execute(
+            select(Character.updated_at, CharacterLiveState.updated_at.label("live_updated_at"))
+            .outerjoin(CharacterLiveState, CharacterLiveState.character_id == Character.id)
+            .where(Character.id == snapshot.character_id)
+            .where(Character.share_token == snapshot.share_token)
+            .where(Character.is_public == True)
+        )
+    ).one_or_none()
+    is_current = (
+        current is not None
+        and current.updated_at == snapshot.updated_at
+        and current.live_updated_at == snapshot.live_updated_at
+    )
+    if is_current:
+        share_snapshots.mark_verified(snapshot.character_id, generation)
+    return is_current
+
 
 @router.get("/{token}", response_model=CharacterResponse)
 async def get_shared_character(
     token: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_db),
 ):
-    """公開閲覧用キャラクター取得（認証不要）"""
-    character = (
-        db.query(Character)
-        .filter(Character.share_token == token)
-        .filter(Character.is_public == True)
-        .first()
-    )
+    """公開閲覧用キャラクター取得（認証不要）
 
-    if not character:
+    シリアライズ済みのレスポンスをトークンごとにキャッシュし、載っていればDBを読まない。
+    公開時に書き出した静的スナップショットがあり、DBの更新日時と一致すれば、それを返す（sheet_data を読まない）。
+    CDN 向けに Cache-Control（s-maxage）/ ETag / Last-Modified / Surrogate-Key を付ける。
+    条件付きリクエストが一致すれば、sheet_data を読まずに 304 を返す。
+    公開中でないことが共有トークンのフィルタで確実なトークンは、DBを読まずに 404 を返す。
+    """
+    # 公開中のトークンでないことが確実なら、キャッシュ（共有層への往復）もDBも引かずに 404
+    # （他インスタンスで公開された直後の可能性があるため CDN には保持させない）
+    if not share_token_filter.might_contain(token):
         raise HTTPException(
             status_code=404,
             detail="Character not found or not public",
+            headers={"Cache-Control": "no-store"},
         )
 
-    # 公開閲覧でも画像は表示できるよう、GCS URL は署名付きURLに差し替え
-    return CharacterResponse.model_validate(
-        {
-            "id": character.id,
-            "user_id": character.user_id,
-            "system": character.system,
-            "name": character.name,
-            "tags": character.tags,
-            "profile_image_url": maybe_sign_read_url(character.profile_image_url),
-            "sheet_data": character.sheet_data,
-            "is_public": character.is_public,
-            "share_token": character.share_token,
-            "created_at": character.created_at,
-            "updated_at": character.updated_at,
-        }
-    )
+    # 読み込み中に更新・無効化があれば、古い内容をキャッシュしない（read_token で判定）
+    entry, read_token = await share_response_cache.lookup(token)
+    if entry is not None:
+        return _shared_response(entry, token, request)
 
+    # 書き出し済みのスナップショットが最新なら sheet_data を読まない（古ければDBから作る）
+    snapshot = await share_snapshots.read(token)
+    if snapshot is not None and not await _snapshot_is_current(db, snapshot):
+        metrics.inc("share.snapshot.stale")
+        snapshot = None
+    if snapshot is not None:
+        entry = await _from_snapshot(snapshot)
+        await _cache_entry(entry, token, read_token)
+        return _shared_response(entry, token, request)
 
+    result = await db.execute(
+        select(Character)
+        .options(defer(Character.sheet_data))
+        .where(Character.share_token == token)
+        .where(Character.is_public == True)
+    )
+    character = result.scalar_one_or_none()
 
+    if not character:
+        share_token_filter.record_false_positive()
+        raise HTTPException(
+            status_code=404,
+            detail="Character not found or not public",
+            headers={"Cache-Control": f"public, max-age=0, s-maxage={SHARE_NOT_FOUND_MAX_AGE_SECONDS}"},
+        )
 
+    # 公開閲覧でも画像は表示できるよう、GCS URL は署名付きURLに差し替え
+    signed_image_url = await _sign_image_url(character.profile_image_url)
+    image_expires_at = _image_expires_at(character.profile_image_url)
+    live_state = await load_live_state(db, character.id)
+    live_updated_at = live_state_updated_at(live_state)
+    etag = character_etag(character.id, character.updated_at, signed_image_url, live_updated_at)
+    last_modified = max(character.updated_at, live_updated_at or character.updated_at)
 
+    head = SharedResponse(
+        character_id=character.id,
+        body=b"",
+        etag=etag,
+        last_modified=last_modified,
+        image_expires_at=image_expires_at,
+    )
+    if _not_modified(head, request):
+        return _shared_response(head, token, request)
 
+    await db.refresh(character, attribute_names=["sheet_data"])
+    body = build_shared_response(character, signed_image_url, live_state).model_dump_json().encode("utf-8")
+    entry = SharedResponse(
+        character_id=character.id,
+        body=body,
+        etag=etag,
+        last_modified=last_modified,
+        image_expires_at=image_expires_at,
+    )
+    await _cache_entry(entry, token, read_token)
+    # スナップショットが無い（書き出し前・失敗）公開キャラクターは書き出し直す
+    share_snapshots.schedule_refresh(character.id)
+    return _shared_response(entry, token, request)
@@ -0,0 +1,183 @@
+import uuid
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+
+from app.database import get_db
+from app.auth import get_current_user
+from app.etag import character_etag
+from app.models import User, Character, CharacterVersion, ActionEnum
+from app.schemas import (
+    CharacterResponse,
+    CharacterVersionListResponse,
+    CharacterVersionResponse,
+    CharacterVersionSummary,
+)
+from app.routers.characters import _to_character_response
+from app.summary import build_character_summary
+from app.services.audit import create_audit_log
+from app.services.gcs import maybe_sign_read_url
+from app.services.live_state import clear_live_state
+from app.services.share_cache import share_response_cache
+from app.services.share_snapshots import share_snapshots
+from app.services.versions import reconstruct_version, record_version, version_state
+
+router = APIRouter(prefix="/api/characters", tags=["versions"])
+
+
+async def _get_owned_character_id(db: AsyncSession, character_id: uuid.UUID, current_user: User) -> None:
+    """所有者チェック（sheet_data は読み込まない）"""
+    owner_id = await db.scalar(select(Character.user_id).where(Character.id == character_id))
+
+    if owner_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Character not found",
+        )
+
+    if owner_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied",
+        )
+
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        return int(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+@router.get("/{character_id}/versions", response_model=CharacterVersionListResponse)
+async def list_character_versions(
+    character_id: uuid.UUID,
+    limit: int = Query(50, ge=1, le=200, description="1ページあたりの件数"),
+    cursor: Optional[str] = Query(None, description="前回レスポンスの next_cursor"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """キャラクターのバージョン一覧（新しい順、所有者のみ。内容は含めない）"""
+    await _get_owned_character_id(db, character_id, current_user)
+
+    q = (
+        select(CharacterVersion)
+        .options(
+            load_only(
+                CharacterVersion.character_id,
+                CharacterVersion.version,
+                CharacterVersion.keyframe_version,
+                CharacterVersion.user_id,
+                CharacterVersion.created_at,
+            )
+        )
+        .where(CharacterVersion.character_id == character_id)
+    )
+    if cursor:
+        q = q.where(CharacterVersion.version < _decode_cursor(cursor))
+    q = q.order_by(CharacterVersion.version.desc()).limit(limit + 1)
+
+    versions = (await db.execute(q)).scalars().all()
+    next_cursor = None
+    if len(versions) > limit:
+        versions = versions[:limit]
+        next_cursor = str(versions[-1].version)
+
+    return CharacterVersionListResponse(
+        items=[CharacterVersionSummary.model_validate(v) for v in versions],
+        limit=limit,
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/{character_id}/versions/{version}", response_model=CharacterVersionResponse)
+async def get_character_version(
+    character_id: uuid.UUID,
+    version: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """指定バージョンの内容（キーフレームから差分を適用して復元、所有者のみ）"""
+    await _get_owned_character_id(db, character_id, current_user)
+
+    created_at = await db.scalar(
+        select(CharacterVersion.created_at).where(
+            CharacterVersion.character_id == character_id,
+            CharacterVersion.version == version,
+        )
+    )
+    state = await reconstruct_version(db, character_id, version) if created_at else None
+    if state is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Version not found",
+        )
+
+    return CharacterVersionResponse(
+        character_id=character_id,
+        version=version,
+        created_at=created_at,
+        name=state["name"],
+        tags=state["tags"],
+        profile_image_url=maybe_sign_read_url(state["profile_image_url"]),
+        sheet_data=state["sheet_data"],
+    )
+
+
+@router.post("/{character_id}/versions/{version}/restore", response_model=CharacterResponse)
+async def restore_character_version(
+    character_id: uuid.UUID,
+    version: int,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """指定バージョンの内容に戻す（所有者のみ）。戻した結果も新しいバージョンとして残る。"""
+    character = await db.get(Character, character_id, with_for_update=True)
+
+    if not character:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Character not found",
+        )
+
+    if character.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied",
+        )
+
+    state = await reconstruct_version(db, character_id, version)
+    if state is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Version not found",
+        )
+
+    previous = version_state(character)
+    character.name = state["name"]
+    character.tags = state["tags"]
+    character.profile_image_url = state["profile_image_url"]
+    character.sheet_data = state["sheet_data"]
+    character.summary = build_character_summary(character.system, state["sheet_data"])
+    # 戻したシートを正とし、ライブ状態は破棄する
+    await clear_live_state(db, character.id)
+    await db.flush()
+    await record_version(db, character.id, current_user.id, version_state(character), previous=previous)
+
+    # 監査ログ（同じトランザクションでコミット）
+    create_audit_log(db, current_user.id, character.id, ActionEnum.update, {"restored_from": version})
+    await db.commit()
+    share_response_cache.invalidate_character(character.id)
+    if character.is_public:
+        share_snapshots.schedule_refresh(character.id)
+    await db.refresh(character)
+
+    signed_image_url = maybe_sign_read_url(character.profile_image_url)
+    response.headers["ETag"] = character_etag(character.id, character.updated_at, signed_image_url)
+    return _to_character_response(character, signed_image_url)
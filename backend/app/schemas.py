@@ -1,9 +1,10 @@
+import os
 from pydantic import BaseModel, Field
 from uuid import UUID
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Annotated, Optional, List, Dict, Any, Literal, Union
 import enum
-from app.models import SystemEnum
+from app.models import SystemEnum, ActionEnum
 
 
 class UserResponse(BaseModel):
@@ -46,11 +47,101 @@ class CharacterResponse(CharacterBase):
         from_attributes = True
 
 
+class CharacterSummary(BaseModel):
+    occupation: Optional[str] = None
+    hp_max: Optional[int] = None
+    san_max: Optional[int] = None
+    mp_max: Optional[int] = None
+
+
+class CharacterSummaryResponse(BaseModel):
+    """一覧用（sheet_data を含まない）"""
+    id: UUID
+    user_id: UUID
+    system: SystemEnum
+    name: str
+    tags: List[str] = Field(default_factory=list)
+    profile_image_url: Optional[str] = None
+    is_public: bool
+    share_token: Optional[str] = None
+    summary: CharacterSummary = Field(default_factory=CharacterSummary)
+    created_at: datetime
+    updated_at: datetime
+
+
 class CharacterListResponse(BaseModel):
-    items: List[CharacterResponse]
-    total: int
-    page: int
+    items: List[Union[CharacterResponse, CharacterSummaryResponse]]
+    total: Optional[int] = None
+    page: Optional[int] = None
     limit: int
+    next_cursor: Optional[str] = None
+
+
+class AuditLogResponse(BaseModel):
+    id: UUID
+    user_id: Optional[UUID] = None
+    character_id: Optional[UUID] = None
+    action: ActionEnum
+    meta_data: Optional[Dict[str, Any]] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class AuditLogListResponse(BaseModel):
+    items: List[AuditLogResponse]
+    limit: int
+    next_cursor: Optional[str] = None
+
+
+class CharacterVersionSummary(BaseModel):
+    version: int
+    is_keyframe: bool
+    user_id: Optional[UUID] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class CharacterVersionListResponse(BaseModel):
+    items: List[CharacterVersionSummary]
+    limit: int
+    next_cursor: Optional[str] = None
+
+
+class CharacterVersionResponse(BaseModel):
+    """復元したバージョンの内容"""
+    character_id: UUID
+    version: int
+    created_at: datetime
+    name: str
+    tags: List[str] = Field(default_factory=list)
+    profile_image_url: Optional[str] = None
+    sheet_data: Dict[str, Any] = Field(default_factory=dict)
+
+
+class LiveStateAdjust(BaseModel):
+    """現在値の増減（負の値で減少）"""
+    hp: int = 0
+    san: int = 0
+    mp: int = 0
+
+
+class LiveStateUpdate(BaseModel):
+    """現在値の直接指定（省略した項目は変更しない）"""
+    hp_current: Optional[int] = None
+    san_current: Optional[int] = None
+    mp_current: Optional[int] = None
+
+
+class LiveStateResponse(BaseModel):
+    character_id: UUID
+    hp_current: Optional[int] = None
+    san_current: Optional[int] = None
+    mp_current: Optional[int] = None
+    updated_at: Optional[datetime] = None
 
 
 class PublishRequest(BaseModel):
@@ -62,6 +153,75 @@ class PublishResponse(BaseModel):
     share_token: Optional[str] = None
 
 
+class BulkCreateOperation(BaseModel):
+    op: Literal["create"]
+    data: CharacterCreate
+
+
+class BulkUpdateOperation(BaseModel):
+    op: Literal["update"]
+    id: UUID
+    data: CharacterUpdate = Field(default_factory=CharacterUpdate)
+    # タグの追加・削除（data.tags による置き換えの後に適用）
+    add_tags: List[str] = Field(default_factory=list)
+    remove_tags: List[str] = Field(default_factory=list)
+
+
+class BulkDeleteOperation(BaseModel):
+    op: Literal["delete"]
+    id: UUID
+
+
+class BulkPublishOperation(BaseModel):
+    op: Literal["publish"]
+    id: UUID
+    is_public: bool
+
+
+BulkOperation = Annotated[
+    Union[BulkCreateOperation, BulkUpdateOperation, BulkDeleteOperation, BulkPublishOperation],
+    Field(discriminator="op"),
+]
+
+
+# 1リクエストあたりの操作数の上限（解析時に検査し、超えた本文は検証し切る前に 422 にする）
+BULK_MAX_OPERATIONS = int(os.getenv("BULK_MAX_OPERATIONS", "200"))
+
+
+class BulkRequest(BaseModel):
+    operations: List[BulkOperation] = Field(..., max_length=BULK_MAX_OPERATIONS)
+    # True の場合、1件でも失敗したら何も反映しない
+    atomic: bool = False
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    op: str
+    id: Optional[UUID] = None
+    status: int
+    detail: Optional[str] = None
+    share_token: Optional[str] = None
+
+
+class BulkResponse(BaseModel):
+    results: List[BulkItemResult]
+    succeeded: int
+    failed: int
+    committed: bool
+
+
+class ImportErrorItem(BaseModel):
+    line: int
+    detail: str
+
+
+class ImportResponse(BaseModel):
+    imported: int
+    failed: int
+    # 先頭から一定件数まで
+    errors: List[ImportErrorItem] = Field(default_factory=list)
+
+
 class ImageUploadUrlRequest(BaseModel):
     mime_type: str = Field(..., pattern="^(image/png|image/jpeg|image/jpg)$")
 
@@ -0,0 +1,194 @@
+"""
+監査ログの書き込み
+
+- 既定（AUDIT_LOG_MODE=transaction）: メインの書き込みと同じトランザクションに追加する
+- AUDIT_LOG_MODE=batched: コミット後にキューへ積み、バックグラウンドで複数行INSERTにまとめて書く
+  （削除の監査ログは対象行がFKから消えるため、常にトランザクション内で書く）
+  キューに積んだ後で削除されたキャラクターの行は、ON DELETE SET NULL と同じく character_id を NULL にして書く
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.database import AsyncSessionLocal
+from app.models import ActionEnum, AuditLog, Character
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+AUDIT_LOG_MODE = os.getenv("AUDIT_LOG_MODE", "transaction")
+
+_PENDING_KEY = "pending_audit_logs"
+# キューに積む停止の印
+_STOP = object()
+
+
+async def _resolve_deleted_characters(db: AsyncSession, batch: List[dict]) -> List[dict]:
+    """
+    削除済みキャラクターを参照する行の character_id を NULL にする（1行のFK違反でバッチ全体を失わないように）
+
+    残っているキャラクターは FOR KEY SHARE でロックし、INSERT までに削除されないようにする。
+    """
+    character_ids = {row["character_id"] for row in batch if row["character_id"] is not None}
+    if not character_ids:
+        return batch
+    result = await db.execute(
+        select(Character.id).where(Character.id.in_(character_ids)).with_for_update(read=True, key_share=True)
+    )
+    existing = set(result.scalars())
+    missing = character_ids - existing
+    if not missing:
+        return batch
+    metrics.inc("audit.batch.orphaned", sum(1 for row in batch if row["character_id"] in missing))
+    return [{**row, "character_id": None} if row["character_id"] in missing else row for row in batch]
+
+
+class AuditLogBatchWriter:
+    """
+    監査ログをまとめて書き込むバックグラウンドライター
+
+    - キューは max_queue 件で上限（超えた分は破棄してメトリクス・ログに残す）
+    - batch_size 件たまるか flush_interval 秒経過でINSERT
+    - stop() で書き込み中・キューに残った分を書き切る
+    """
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval: float):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    def submit(self, rows: List[dict]) -> None:
+        """コミット済みの監査ログを積む（イベントループのスレッドから呼ぶ）"""
+        for row in rows:
+            try:
+                self._queue.put_nowait(row)
+            except asyncio.QueueFull:
+                metrics.inc("audit.batch.dropped")
+                logger.error(f"Audit log queue is full; dropped {row['action']} for character {row['character_id']}")
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    # 積まれている分は待たずに取る（wait_for は1件ごとにタスクを作るため遅い）
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+        # stop() の後に積まれた分（停止処理中のコミット）も書き切る
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append(item)
+        for i in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[i : i + self.batch_size])
+
+    async def _write(self, batch: List[dict]) -> None:
+        async with AsyncSessionLocal() as db:
+            batch = await _resolve_deleted_characters(db, batch)
+            await db.execute(insert(AuditLog), batch)
+            await db.commit()
+
+    async def _flush(self, batch: List[dict]) -> None:
+        started = time.perf_counter()
+        try:
+            await self._write(batch)
+        except Exception as e:
+            metrics.inc("audit.batch.failed", len(batch))
+            logger.error(f"Failed to write {len(batch)} audit logs: {e}", exc_info=True)
+            return
+        metrics.inc("audit.batch.rows", len(batch))
+        metrics.observe("audit.batch.flush", time.perf_counter() - started)
+
+    async def stop(self) -> None:
+        """
+        キューの末尾に停止の印を積み、そこまでを書き切るのを待つ
+
+        キャンセルはしない（書き込み中のバッチを失わないため）。
+        """
+        if self._task is None:
+            return
+        # キューが満杯でも、書き込みが進めば空きができる
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+
+audit_log_writer = AuditLogBatchWriter(
+    max_queue=int(os.getenv("AUDIT_LOG_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("AUDIT_LOG_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL_SECONDS", "1.0")),
+)
+
+
+def create_audit_log(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    character_id: uuid.UUID,
+    action: ActionEnum,
+    meta_data: dict = None,
+) -> None:
+    """監査ログを作成（呼び出し側のコミットで書き込まれる）"""
+    row = {
+        "id": uuid.uuid4(),
+        "user_id": user_id,
+        "character_id": character_id,
+        "action": action,
+        "meta_data": meta_data or {},
+        "created_at": datetime.utcnow(),
+    }
+    if AUDIT_LOG_MODE == "batched" and action != ActionEnum.delete and audit_log_writer.running:
+        # コミットが成功した場合のみライターに渡す（after_commit）
+        db.sync_session.info.setdefault(_PENDING_KEY, []).append(row)
+        return
+    db.add(AuditLog(**row))
+
+
+@event.listens_for(Session, "after_commit")
+def _submit_pending_audit_logs(session: Session) -> None:
+    rows = session.info.pop(_PENDING_KEY, None)
+    if rows:
+        audit_log_writer.submit(rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_audit_logs(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
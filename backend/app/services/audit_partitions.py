@@ -0,0 +1,186 @@
+"""
+audit_logs の月次パーティション管理
+
+- ensure_audit_log_partitions: 指定月から数か月先までのパーティションを作成（冪等）
+  作成が遅れて default パーティションに入った行は、作成した月のパーティションへ移す
+- drop_expired_audit_log_partitions: 保持期間を過ぎた月のパーティションをDROP（DELETEは使わない）
+  default パーティションに残った保持期間切れの行は DELETE する
+
+保守ジョブとして実行する:
+    python -m app.services.audit_partitions            # パーティション作成 + 保持期間切れの削除
+    python -m app.services.audit_partitions --dry-run  # 削除対象の表示のみ
+"""
+import argparse
+import logging
+import os
+import re
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "audit_logs"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+AUDIT_LOG_RETENTION_MONTHS = int(os.getenv("AUDIT_LOG_RETENTION_MONTHS", "12"))
+AUDIT_LOG_PARTITIONS_AHEAD = int(os.getenv("AUDIT_LOG_PARTITIONS_AHEAD", "3"))
+
+_PARTITION_NAME = re.compile(rf"^{PARENT_TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+
+def _month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _add_months(d: date, months: int) -> date:
+    index = d.year * 12 + (d.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def ensure_audit_log_partitions(
+    connection: Connection,
+    start: Optional[date] = None,
+    months_ahead: int = AUDIT_LOG_PARTITIONS_AHEAD,
+) -> List[str]:
+    """
+    start の月から今月+months_ahead か月までのパーティションを作成し、作成した名前を返す
+
+    start を省略した場合は、今月と default パーティションに残っている最も古い行の月の早い方から。
+    """
+    today = datetime.utcnow().date()
+    has_default = connection.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar()
+    if start is None:
+        start = today
+        if has_default:
+            oldest = connection.execute(text(f"SELECT min(created_at) FROM {DEFAULT_PARTITION}")).scalar()
+            if oldest is not None:
+                start = min(start, oldest.date())
+    month = _month_start(start)
+    last = _add_months(_month_start(today), months_ahead)
+    created = []
+    while month <= last:
+        name = partition_name(month)
+        exists = connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+        if not exists:
+            if has_default and _default_has_rows(connection, month, _add_months(month, 1)):
+                _create_partition_from_default(connection, name, month, _add_months(month, 1))
+            else:
+                _create_partition(connection, name, month, _add_months(month, 1))
+            created.append(name)
+        month = _add_months(month, 1)
+    return created
+
+
+def _create_partition(connection: Connection, name: str, start: date, end: date) -> None:
+    connection.execute(
+        text(
+            f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    )
+
+
+def _default_has_rows(connection: Connection, start: date, end: date) -> bool:
+    return connection.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end)"),
+        {"start": start, "end": end},
+    ).scalar()
+
+
+def _create_partition_from_default(connection: Connection, name: str, start: date, end: date) -> None:
+    """
+    default パーティションに入った月のパーティションを作る
+
+    default にその月の行があると CREATE TABLE ... PARTITION OF は失敗するため、
+    default を一旦外してから作成し、行を移して default を付け直す（同じトランザクション内で行う）。
+    """
+    range_filter = "created_at >= :start AND created_at < :end"
+    params = {"start": start, "end": end}
+    connection.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+    _create_partition(connection, name, start, end)
+    moved = connection.execute(
+        text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {range_filter}"), params
+    ).rowcount
+    connection.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {range_filter}"), params)
+    connection.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    logger.warning(f"Moved {moved} audit log rows from {DEFAULT_PARTITION} to {name}")
+
+
+def list_audit_log_partitions(connection: Connection) -> List[str]:
+    rows = connection.execute(
+        text(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:parent AS regclass)
+            ORDER BY c.relname
+            """
+        ),
+        {"parent": PARENT_TABLE},
+    ).scalars().all()
+    return list(rows)
+
+
+def drop_expired_audit_log_partitions(
+    connection: Connection,
+    retention_months: int = AUDIT_LOG_RETENTION_MONTHS,
+    dry_run: bool = False,
+) -> List[str]:
+    """今月から retention_months か月より前の月のパーティションを削除し、対象の名前を返す"""
+    cutoff = _add_months(_month_start(datetime.utcnow().date()), -retention_months)
+    expired = []
+    for name in list_audit_log_partitions(connection):
+        m = _PARTITION_NAME.match(name)
+        if not m:
+            # default パーティションなどは対象外
+            continue
+        month = date(int(m.group(1)), int(m.group(2)), 1)
+        if _add_months(month, 1) <= cutoff:
+            expired.append(name)
+            if not dry_run:
+                connection.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+                connection.execute(text(f"DROP TABLE {name}"))
+
+    # パーティションの作成が遅れて default に入ったままの行
+    if connection.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar():
+        if dry_run:
+            count = connection.execute(
+                text(f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE created_at < :cutoff"), {"cutoff": cutoff}
+            ).scalar()
+        else:
+            count = connection.execute(
+                text(f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at < :cutoff"), {"cutoff": cutoff}
+            ).rowcount
+        if count:
+            logger.info(f"{'Expired' if dry_run else 'Deleted'} {count} rows in {DEFAULT_PARTITION}")
+    return expired
+
+
+def main() -> None:
+    from app.database import engine
+
+    parser = argparse.ArgumentParser(description="audit_logs の月次パーティション保守")
+    parser.add_argument("--retention-months", type=int, default=AUDIT_LOG_RETENTION_MONTHS)
+    parser.add_argument("--months-ahead", type=int, default=AUDIT_LOG_PARTITIONS_AHEAD)
+    parser.add_argument("--dry-run", action="store_true", help="削除対象を表示するだけで削除しない")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with engine.begin() as connection:
+        created = ensure_audit_log_partitions(connection, months_ahead=args.months_ahead)
+        expired = drop_expired_audit_log_partitions(
+            connection, retention_months=args.retention_months, dry_run=args.dry_run
+        )
+    logger.info(f"Created partitions: {created}")
+    logger.info(f"{'Expired' if args.dry_run else 'Dropped'} partitions: {expired}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+自動保存の書き込みまとめ（コアレス）
+
+シート編集画面は自動保存のため、同じキャラクターへの PUT が1秒に何回も届く。
+AUTOSAVE_COALESCE_WINDOW_MS > 0 のとき、最初の更新からその時間内に届いた同じキャラクターへの
+更新をまとめ、最後の状態だけを1回のトランザクションでコミットする（監査ログも1行）。
+
+- 各リクエストは、自分の更新を含むコミット後の状態を受け取る（read-your-writes）
+- まとめる単位はプロセス内（インスタンスをまたいではまとめない）
+- 同じキャラクターのコミットは到着順に直列化する
+- 0（既定）で無効。If-Match 付きの更新はまとめない（呼び出し側で判定）
+"""
+import asyncio
+import logging
+import os
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models import ActionEnum, Character, CharacterLiveState
+from app.summary import build_character_summary
+from app.services import metrics
+from app.services.audit import create_audit_log
+from app.services.live_state import clear_live_state, load_live_state
+from app.services.share_cache import share_response_cache
+from app.services.share_snapshots import share_snapshots
+from app.services.versions import record_version, version_state
+
+logger = logging.getLogger(__name__)
+
+AUTOSAVE_COALESCE_WINDOW_MS = int(os.getenv("AUTOSAVE_COALESCE_WINDOW_MS", "0"))
+
+
+async def apply_character_update(
+    db: AsyncSession,
+    character: Character,
+    fields: Dict[str, Any],
+    live_state: Optional[CharacterLiveState],
+) -> Optional[CharacterLiveState]:
+    """更新可能なフィールドを反映し、反映後のライブ状態を返す（検証は呼び出し側で済ませる）"""
+    if fields.get("name") is not None:
+        character.name = fields["name"]
+    if fields.get("tags") is not None:
+        character.tags = fields["tags"]
+    if fields.get("profile_image_url") is not None:
+        character.profile_image_url = fields["profile_image_url"]
+    if fields.get("sheet_data") is not None:
+        character.sheet_data = fields["sheet_data"]
+        character.summary = build_character_summary(character.system, fields["sheet_data"])
+        # クライアントはライブ状態を重ねたシートを編集しているので、保存したシートを正とする
+        if live_state is not None:
+            await clear_live_state(db, character.id)
+            live_state = None
+    return live_state
+
+
+@dataclass
+class _PendingSave:
+    character_id: uuid.UUID
+    user_id: uuid.UUID
+    fields: Dict[str, Any] = field(default_factory=dict)
+    waiters: List[asyncio.Future] = field(default_factory=list)
+
+
+class AutosaveCoalescer:
+    """キャラクターごとに window 秒の間の更新をまとめてコミットする"""
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._pending: Dict[uuid.UUID, _PendingSave] = {}
+        # キャラクターごとの直近のコミット処理（次のバッチはこれを待ってから書く）
+        self._flushing: Dict[uuid.UUID, asyncio.Task] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0
+
+    async def submit(
+        self,
+        character_id: uuid.UUID,
+        user_id: uuid.UUID,
+        fields: Dict[str, Any],
+    ) -> Tuple[Character, Optional[CharacterLiveState]]:
+        """更新を積み、まとめたコミットの完了を待って (character, live_state) を返す"""
+        loop = asyncio.get_running_loop()
+        pending = self._pending.get(character_id)
+        if pending is None:
+            pending = _PendingSave(character_id=character_id, user_id=user_id)
+            self._pending[character_id] = pending
+            previous = self._flushing.get(character_id)
+            task = asyncio.create_task(self._flush_later(pending, previous))
+            self._flushing[character_id] = task
+            task.add_done_callback(lambda t, cid=character_id: self._forget(cid, t))
+        # 後から来た値で上書き（PUT は指定されたフィールドだけを置き換える）
+        pending.fields.update(fields)
+        waiter = loop.create_future()
+        pending.waiters.append(waiter)
+        metrics.inc("autosave.requests")
+        return await waiter
+
+    def _forget(self, character_id: uuid.UUID, task: asyncio.Task) -> None:
+        if self._flushing.get(character_id) is task:
+            del self._flushing[character_id]
+
+    async def _flush_later(self, pending: _PendingSave, previous: Optional[asyncio.Task]) -> None:
+        try:
+            await asyncio.sleep(self.window_seconds)
+        finally:
+            # ここ以降に届いた更新は次のバッチになる
+            self._pending.pop(pending.character_id, None)
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        try:
+            result = await self._commit(pending)
+        except Exception as e:
+            if not isinstance(e, HTTPException):
+                logger.error(f"Coalesced autosave failed for character {pending.character_id}: {e}")
+            for waiter in pending.waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+        for waiter in pending.waiters:
+            if not waiter.done():
+                waiter.set_result(result)
+
+    async def _commit(self, pending: _PendingSave) -> Tuple[Character, Optional[CharacterLiveState]]:
+        count = len(pending.waiters)
+        async with AsyncSessionLocal() as db:
+            character = await db.get(Character, pending.character_id, with_for_update=True)
+            if not character:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Character not found",
+                )
+            live_state = await load_live_state(db, character.id)
+            previous = version_state(character)
+            live_state = await apply_character_update(db, character, pending.fields, live_state)
+            # 変更履歴もまとめた結果の1バージョンだけ残す
+            await db.flush()
+            await record_version(db, character.id, pending.user_id, version_state(character), previous=previous)
+
+            # 監査ログ（まとめた件数を残す）
+            meta = {"coalesced": count} if count > 1 else None
+            create_audit_log(db, pending.user_id, character.id, ActionEnum.update, meta)
+            await db.commit()
+            share_response_cache.invalidate_character(character.id)
+            if character.is_public:
+                share_snapshots.schedule_refresh(character.id)
+            await db.refresh(character)
+
+        metrics.inc("autosave.commits")
+        if count > 1:
+            metrics.mark("autosave.commits_saved", count - 1)
+        return character, live_state
+
+    async def stop(self) -> None:
+        """シャットダウン時に、まとめ待ちの更新を書き切る"""
+        tasks = list(self._flushing.values())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+autosave_coalescer = AutosaveCoalescer(AUTOSAVE_COALESCE_WINDOW_MS / 1000)
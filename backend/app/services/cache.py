@@ -0,0 +1,99 @@
+"""
+プロセス内のLRU + 有効期限付きキャッシュ
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    件数上限付きLRUキャッシュ。各エントリは絶対時刻（time.time() 基準）で失効する。
+
+    max_bytes > 0 の場合は sizeof(value) の合計もその範囲に収める（古いものから追い出す）。
+    複数スレッドから共有してよい。
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        clock: Callable[[], float] = time.time,
+        max_bytes: int = 0,
+        sizeof: Callable[[Any], int] = lambda value: 0,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._sizeof = sizeof
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, size = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self._bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: float) -> None:
+        if self.max_entries <= 0 or expires_at <= self._clock():
+            return
+        size = self._sizeof(value) if self.max_bytes > 0 else 0
+        if self.max_bytes > 0 and size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes > 0 and self._bytes > self.max_bytes):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def set_ttl(self, key: Hashable, value: Any, ttl_seconds: float) -> None:
+        self.set(key, value, self._clock() + ttl_seconds)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def total_bytes(self) -> int:
+        """sizeof の合計（max_bytes 未指定なら常に0）"""
+        with self._lock:
+            return self._bytes
+
+    def remaining_seconds(self, key: Hashable) -> Optional[float]:
+        """失効までの残り秒数（無い・失効済みなら None。LRU の順序は変えない）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            remaining = entry[1] - self._clock()
+            return remaining if remaining > 0 else None
+
+    def __contains__(self, key: Hashable) -> bool:
+        """有効なエントリがあるか（LRU の順序は変えない）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[1] > self._clock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
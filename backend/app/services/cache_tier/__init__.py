@@ -0,0 +1,56 @@
+"""
+プロセス内キャッシュ + インスタンス間の共有キャッシュ（2段）
+
+Cloud Run の複数インスタンスで、共有閲覧のレスポンス・ユーザー解決・署名付きURLのキャッシュを共有する。
+共有層は CACHE_REDIS_URL で選ぶ。
+
+- ""（既定）: 共有層なし（従来どおりプロセス内のみ）
+- "redis://..." / "rediss://...": Redis / Valkey / Memorystore（単一ノード）
+- "memory://": プロセス内の疑似実装（テスト・ローカル開発用）
+
+共有層が落ちている間はプロセス内キャッシュだけで動く（リクエストは失敗させない）。
+"""
+import os
+from typing import Optional
+
+from .base import SharedStore
+from .tier import CacheTier, ReadToken, TwoLevelCache
+
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "").strip()
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "charmgr:")
+# 共有層の1回の呼び出しを打ち切る秒数（遅い共有層でリクエストを待たせない）
+CACHE_SHARED_TIMEOUT_SECONDS = float(os.getenv("CACHE_SHARED_TIMEOUT_SECONDS", "0.05"))
+# 共有層の失敗後、再び使い始めるまでの秒数
+CACHE_SHARED_RETRY_SECONDS = float(os.getenv("CACHE_SHARED_RETRY_SECONDS", "5"))
+
+
+def create_shared_store(url: str, timeout_seconds: float) -> Optional[SharedStore]:
+    """URLから共有層を作る（空なら None）"""
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        from .memory import InMemorySharedStore
+
+        return InMemorySharedStore()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        from .redis_store import RedisSharedStore
+
+        return RedisSharedStore(url, timeout_seconds)
+    raise ValueError(f"Unsupported CACHE_REDIS_URL scheme: {url.split('://', 1)[0]}")
+
+
+cache_tier = CacheTier(
+    store=create_shared_store(CACHE_REDIS_URL, CACHE_SHARED_TIMEOUT_SECONDS),
+    key_prefix=CACHE_KEY_PREFIX,
+    timeout_seconds=CACHE_SHARED_TIMEOUT_SECONDS,
+    retry_seconds=CACHE_SHARED_RETRY_SECONDS,
+)
+
+__all__ = [
+    "SharedStore",
+    "CacheTier",
+    "ReadToken",
+    "TwoLevelCache",
+    "cache_tier",
+    "create_shared_store",
+]
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+
+class SharedStore(ABC):
+    """
+    インスタンス間で共有するキャッシュの保存先（Redis プロトコル相当）
+
+    時刻はすべて保存先のサーバー時刻（ミリ秒）。無効化とその前に始まった読み込みの前後関係を
+    インスタンスの時計のずれに左右されずに判定するため。
+    """
+
+    @abstractmethod
+    async def lookup(self, key: str) -> Tuple[Optional[bytes], int]:
+        """(値, 現在時刻ms)。値が無ければ None。"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def put(
+        self,
+        key: str,
+        value: bytes,
+        ttl_ms: int,
+        group_key: Optional[str] = None,
+        members_key: Optional[str] = None,
+        read_ms: Optional[int] = None,
+        group_ttl_ms: int = 0,
+    ) -> bool:
+        """
+        保存する。group_key を指定した場合は members_key の集合にキーを登録し、
+        read_ms 以降にそのグループが無効化されていれば保存せずに False を返す。
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def invalidate_group(self, group_key: str, members_key: str, group_ttl_ms: int) -> None:
+        """無効化時刻を記録し、グループに登録されたキーを消す"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def publish(self, channel: str, message: str) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def subscribe(self, channel: str) -> AsyncIterator[str]:
+        """メッセージを順に返す（接続が切れたら例外）"""
+        raise NotImplementedError()
+
+    async def close(self) -> None:
+        pass
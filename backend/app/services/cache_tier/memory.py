@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+
+from .base import SharedStore
+
+
+class InMemorySharedStore(SharedStore):
+    """
+    プロセス内で RedisSharedStore と同じ振る舞いをする保存先（CACHE_REDIS_URL=memory://）
+
+    テスト・ローカル開発用。インスタンス間では共有されない。
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[bytes, float]] = {}
+        self._members: Dict[str, Set[str]] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+    @staticmethod
+    def _now_ms() -> int:
+        return int(time.time() * 1000)
+
+    def _get(self, key: str) -> Optional[bytes]:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= self._now_ms():
+            del self._values[key]
+            return None
+        return value
+
+    async def lookup(self, key: str) -> Tuple[Optional[bytes], int]:
+        return self._get(key), self._now_ms()
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        return [self._get(key) for key in keys]
+
+    async def put(
+        self,
+        key: str,
+        value: bytes,
+        ttl_ms: int,
+        group_key: Optional[str] = None,
+        members_key: Optional[str] = None,
+        read_ms: Optional[int] = None,
+        group_ttl_ms: int = 0,
+    ) -> bool:
+        if group_key is not None and read_ms is not None:
+            invalidated = self._get(group_key)
+            if invalidated is not None and int(invalidated) >= read_ms:
+                return False
+        self._values[key] = (value, self._now_ms() + ttl_ms)
+        if members_key is not None:
+            self._members.setdefault(members_key, set()).add(key)
+        return True
+
+    async def invalidate_group(self, group_key: str, members_key: str, group_ttl_ms: int) -> None:
+        now = self._now_ms()
+        self._values[group_key] = (str(now).encode(), now + group_ttl_ms)
+        for key in self._members.pop(members_key, set()):
+            self._values.pop(key, None)
+
+    async def publish(self, channel: str, message: str) -> None:
+        for queue in self._subscribers.get(channel, []):
+            queue.put_nowait(message)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[str]:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(channel, []).append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers[channel].remove(queue)
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+from .base import SharedStore
+
+# 値と現在時刻を1往復で取る
+_LOOKUP = """
+local v = redis.call('GET', KEYS[1])
+local t = redis.call('TIME')
+return {v or false, tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)}
+"""
+
+# 読み込み開始（ARGV[3]）以降にグループが無効化されていなければ保存する
+_PUT = """
+if tonumber(ARGV[3]) >= 0 then
+  local invalidated = tonumber(redis.call('GET', KEYS[2]) or '-1')
+  if invalidated >= tonumber(ARGV[3]) then
+    return 0
+  end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+redis.call('SADD', KEYS[3], KEYS[1])
+redis.call('PEXPIRE', KEYS[3], ARGV[4])
+return 1
+"""
+
+_INVALIDATE = """
+local t = redis.call('TIME')
+redis.call('SET', KEYS[1], tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000), 'PX', ARGV[1])
+local members = redis.call('SMEMBERS', KEYS[2])
+for _, key in ipairs(members) do
+  redis.call('DEL', key)
+end
+redis.call('DEL', KEYS[2])
+return #members
+"""
+
+
+class RedisSharedStore(SharedStore):
+    """
+    Redis / Valkey / Memorystore（単一ノード）を使う
+
+    スクリプトはグループのメンバーのキーを宣言せずに消すため、Redis Cluster では使えない。
+    """
+
+    def __init__(self, url: str, timeout_seconds: float):
+        from redis import asyncio as redis_asyncio
+
+        self._client = redis_asyncio.from_url(
+            url,
+            socket_timeout=timeout_seconds,
+            socket_connect_timeout=timeout_seconds,
+        )
+        # 購読はブロックするので、タイムアウトなしの別接続を使う
+        self._pubsub_client = redis_asyncio.from_url(url, socket_connect_timeout=timeout_seconds)
+        self._lookup = self._client.register_script(_LOOKUP)
+        self._put = self._client.register_script(_PUT)
+        self._invalidate = self._client.register_script(_INVALIDATE)
+
+    async def lookup(self, key: str) -> Tuple[Optional[bytes], int]:
+        value, now_ms = await self._lookup(keys=[key])
+        return value, int(now_ms)
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        return await self._client.mget(list(keys))
+
+    async def put(
+        self,
+        key: str,
+        value: bytes,
+        ttl_ms: int,
+        group_key: Optional[str] = None,
+        members_key: Optional[str] = None,
+        read_ms: Optional[int] = None,
+        group_ttl_ms: int = 0,
+    ) -> bool:
+        if group_key is None:
+            await self._client.set(key, value, px=ttl_ms)
+            return True
+        stored = await self._put(
+            keys=[key, group_key, members_key],
+            args=[value, ttl_ms, -1 if read_ms is None else read_ms, group_ttl_ms],
+        )
+        return bool(stored)
+
+    async def invalidate_group(self, group_key: str, members_key: str, group_ttl_ms: int) -> None:
+        await self._invalidate(keys=[group_key, members_key], args=[group_ttl_ms])
+
+    async def publish(self, channel: str, message: str) -> None:
+        await self._client.publish(channel, message)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[str]:
+        pubsub = self._pubsub_client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(channel)
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    data = message["data"]
+                    yield data.decode("utf-8") if isinstance(data, bytes) else data
+        finally:
+            await pubsub.aclose()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+        await self._pubsub_client.aclose()
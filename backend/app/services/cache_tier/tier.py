@@ -0,0 +1,375 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import struct
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from app.services import metrics
+from app.services.cache import TTLCache
+
+from .base import SharedStore
+
+logger = logging.getLogger(__name__)
+
+_UNAVAILABLE = object()
+
+# 値の先頭に失効時刻（time.time() 基準の秒）を付けて保存する
+_EXPIRES = struct.Struct(">d")
+
+
+@dataclass(frozen=True)
+class ReadToken:
+    """読み込み開始時点（put() で、その後に無効化されていないかの判定に使う）"""
+
+    local: float
+    shared_ms: Optional[int] = None
+
+
+class CacheTier:
+    """
+    共有層への接続（タイムアウト・障害時の縮退・無効化の購読）
+
+    - 共有層の呼び出しは timeout 秒で打ち切り、失敗したら retry_seconds の間は共有層を使わない
+      （その間はプロセス内キャッシュだけで動く）
+    - 無効化は pub/sub で他インスタンスに伝える。購読が切れていた間の無効化は受け取れないので、
+      共有層が復帰・再購読したら、無効化のあるキャッシュのプロセス内の分を捨てる
+    """
+
+    def __init__(
+        self,
+        store: Optional[SharedStore],
+        key_prefix: str,
+        timeout_seconds: float,
+        retry_seconds: float,
+    ):
+        self.store = store
+        self.key_prefix = key_prefix
+        self.channel = f"{key_prefix}invalidate"
+        self.timeout_seconds = timeout_seconds
+        self.retry_seconds = retry_seconds
+        self.instance_id = uuid.uuid4().hex
+        self._caches: Dict[str, "TwoLevelCache"] = {}
+        self._down_until = 0.0
+        self._degraded = False
+        self._listener: Optional[asyncio.Task] = None
+        self._background: Set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    @property
+    def available(self) -> bool:
+        return self.store is not None and time.monotonic() >= self._down_until
+
+    def register(self, cache: "TwoLevelCache") -> None:
+        self._caches[cache.namespace] = cache
+
+    def key(self, namespace: str, key: str) -> str:
+        return f"{self.key_prefix}{namespace}:{key}"
+
+    async def call(self, fn: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        """共有層を呼ぶ。使えない・失敗した場合は _UNAVAILABLE を返す（例外は投げない）。"""
+        if not self.available:
+            return _UNAVAILABLE
+        try:
+            result = await asyncio.wait_for(fn(*args, **kwargs), self.timeout_seconds)
+        except Exception as e:
+            metrics.inc("cache.shared.error")
+            if not self._degraded:
+                logger.warning(f"Shared cache unavailable, using in-process cache only: {e!r}")
+            self._degraded = True
+            self._down_until = time.monotonic() + self.retry_seconds
+            return _UNAVAILABLE
+        if self._degraded:
+            self._degraded = False
+            logger.info("Shared cache recovered")
+            self._forget_missed_invalidations()
+        return result
+
+    def spawn(self, coro: Awaitable[Any]) -> None:
+        """共有層への書き込みをバックグラウンドで行う（呼び出し側を待たせない）"""
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _forget_missed_invalidations(self) -> None:
+        for cache in self._caches.values():
+            if cache.invalidates:
+                cache.clear_local()
+
+    async def publish_invalidation(self, namespace: str, group: str) -> None:
+        message = json.dumps({"origin": self.instance_id, "ns": namespace, "group": group})
+        await self.call(self.store.publish, self.channel, message)
+
+    def _on_message(self, message: str) -> None:
+        try:
+            data = json.loads(message)
+        except ValueError:
+            return
+        if data.get("origin") == self.instance_id:
+            return
+        cache = self._caches.get(data.get("ns"))
+        if cache is not None:
+            cache.invalidate_local_group(data.get("group"))
+            metrics.inc("cache.shared.invalidation_received")
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                subscription = self.store.subscribe(self.channel)
+                # 購読し直した直後は、切れていた間の無効化を取りこぼしている可能性がある
+                self._forget_missed_invalidations()
+                async for message in subscription:
+                    self._on_message(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.inc("cache.shared.subscribe_error")
+                logger.warning(f"Shared cache invalidation subscription lost: {e!r}")
+            await asyncio.sleep(self.retry_seconds)
+
+    def start(self) -> None:
+        if self.store is None or self._listener is not None:
+            return
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        if self.store is not None:
+            await self.store.close()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "degraded": self._degraded,
+            "listening": self._listener is not None and not self._listener.done(),
+        }
+
+
+class TwoLevelCache:
+    """
+    プロセス内の LRU（TTLCache）+ 共有層の2段キャッシュ
+
+    - キーは文字列。値は encode / decode で bytes と相互変換する
+    - group_of（値 → グループ名）を指定すると、invalidate_group() で同じグループのエントリをまとめて消せる
+      （全インスタンスのプロセス内の分は pub/sub で消す）
+    - lookup() で得た ReadToken を put() に渡すと、その後に同じ group が無効化されていれば保存しない
+      （読み込み中に更新されたデータを載せないため。共有層ではサーバー時刻で判定する）
+    - 共有層が無い・使えない場合はプロセス内だけで動く
+    """
+
+    def __init__(
+        self,
+        tier: CacheTier,
+        namespace: str,
+        local: TTLCache,
+        encode: Callable[[Any], bytes],
+        decode: Callable[[bytes], Any],
+        local_ttl_seconds: Optional[float] = None,
+        group_of: Optional[Callable[[Any], str]] = None,
+        group_ttl_seconds: float = 600,
+    ):
+        self.tier = tier
+        self.namespace = namespace
+        self.local = local
+        self.encode = encode
+        self.decode = decode
+        self.local_ttl_seconds = local_ttl_seconds
+        self.group_of = group_of
+        self.group_ttl_seconds = group_ttl_seconds
+        self._key_groups: Dict[str, str] = {}
+        self._group_keys: Dict[str, Set[str]] = {}
+        self._invalidated_at: Dict[str, float] = {}
+        tier.register(self)
+
+    # --- プロセス内 ---
+
+    def get_local(self, key: str) -> Optional[Any]:
+        return self.local.get(key)
+
+    @property
+    def invalidates(self) -> bool:
+        return self.group_of is not None
+
+    def set_local(self, key: str, value: Any, expires_at: float) -> None:
+        if self.local_ttl_seconds is not None:
+            expires_at = min(expires_at, time.time() + self.local_ttl_seconds)
+        self.local.set(key, value, expires_at)
+        if self.group_of is not None:
+            group = self.group_of(value)
+            self._key_groups[key] = group
+            self._group_keys.setdefault(group, set()).add(key)
+            # 追い出し・失効したキーの逆引きを掃除
+            if len(self._key_groups) > 2 * max(self.local.max_entries, 1):
+                self._prune_groups()
+
+    def _prune_groups(self) -> None:
+        self._key_groups = {key: group for key, group in self._key_groups.items() if key in self.local}
+        self._group_keys = {}
+        for key, group in self._key_groups.items():
+            self._group_keys.setdefault(group, set()).add(key)
+
+    def remaining_seconds(self, key: str) -> Optional[float]:
+        return self.local.remaining_seconds(key)
+
+    def invalidate_local_group(self, group: str) -> None:
+        self._invalidated_at[group] = time.monotonic()
+        if len(self._invalidated_at) > 2 * max(self.local.max_entries, 1):
+            cutoff = time.monotonic() - self.group_ttl_seconds
+            self._invalidated_at = {g: t for g, t in self._invalidated_at.items() if t >= cutoff}
+        for key in self._group_keys.pop(group, set()):
+            self._key_groups.pop(key, None)
+            self.local.pop(key)
+
+    def clear_local(self) -> None:
+        # 読み込み中のものも含めて、ここより前に始まった読み込みは保存させない
+        self._invalidated_at = {"*": time.monotonic()}
+        self._key_groups.clear()
+        self._group_keys.clear()
+        self.local.clear()
+
+    # --- 共有層 ---
+
+    def _wrap(self, value: Any, expires_at: float) -> bytes:
+        return _EXPIRES.pack(expires_at) + self.encode(value)
+
+    def _unwrap(self, data: bytes) -> Tuple[Any, float]:
+        (expires_at,) = _EXPIRES.unpack_from(data)
+        return self.decode(data[_EXPIRES.size:]), expires_at
+
+    def _fill_local(self, key: str, data: bytes) -> Optional[Any]:
+        try:
+            value, expires_at = self._unwrap(data)
+        except Exception as e:
+            logger.warning(f"Discarding undecodable shared cache entry {self.namespace}:{key}: {e!r}")
+            return None
+        if expires_at <= time.time():
+            return None
+        self.set_local(key, value, expires_at)
+        return value
+
+    async def get(self, key: str) -> Optional[Any]:
+        value, _ = await self.lookup(key)
+        return value
+
+    async def lookup(self, key: str) -> Tuple[Optional[Any], ReadToken]:
+        """(値, ReadToken)。プロセス内 → 共有層の順に引く。"""
+        local_now = time.monotonic()
+        value = self.local.get(key)
+        if value is not None:
+            return value, ReadToken(local_now)
+        if not self.tier.enabled:
+            return None, ReadToken(local_now)
+        result = await self.tier.call(self.tier.store.lookup, self.tier.key(self.namespace, key))
+        if result is _UNAVAILABLE:
+            return None, ReadToken(local_now)
+        data, shared_ms = result
+        if data is not None:
+            value = self._fill_local(key, data)
+            if value is not None:
+                metrics.inc(f"cache.{self.namespace}.shared_hit")
+                return value, ReadToken(local_now, shared_ms)
+        metrics.inc(f"cache.{self.namespace}.shared_miss")
+        return None, ReadToken(local_now, shared_ms)
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        """プロセス内に無いものだけを共有層からまとめて引く"""
+        values: List[Optional[Any]] = [self.local.get(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if not missing or not self.tier.enabled:
+            return values
+        result = await self.tier.call(
+            self.tier.store.get_many, [self.tier.key(self.namespace, keys[i]) for i in missing]
+        )
+        if result is _UNAVAILABLE:
+            return values
+        for i, data in zip(missing, result):
+            if data is not None:
+                values[i] = self._fill_local(keys[i], data)
+            metrics.inc(f"cache.{self.namespace}.shared_hit" if values[i] is not None else f"cache.{self.namespace}.shared_miss")
+        return values
+
+    def _invalidated_since(self, group: Optional[str], read_token: Optional[ReadToken]) -> bool:
+        if read_token is None:
+            return False
+        started = read_token.local
+        if self._invalidated_at.get("*", float("-inf")) >= started:
+            return True
+        return group is not None and self._invalidated_at.get(group, float("-inf")) >= started
+
+    async def put(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: float,
+        read_token: Optional[ReadToken] = None,
+    ) -> bool:
+        """保存する（read_token 以降に値のグループが無効化されていれば保存せず False）"""
+        group = self.group_of(value) if self.group_of is not None else None
+        if ttl_seconds <= 0 or self._invalidated_since(group, read_token):
+            return False
+        expires_at = time.time() + ttl_seconds
+        self.set_local(key, value, expires_at)
+        if not self.tier.enabled:
+            return True
+        # read_token が共有層の時刻を持たない（読み込み時に共有層が使えなかった）場合、
+        # その後の無効化と前後関係を判定できないので共有層には書かない
+        if group is not None and read_token is not None and read_token.shared_ms is None:
+            return True
+        stored = await self.tier.call(
+            self.tier.store.put,
+            self.tier.key(self.namespace, key),
+            self._wrap(value, expires_at),
+            int(ttl_seconds * 1000),
+            group_key=self._group_key(group) if group is not None else None,
+            members_key=self._members_key(group) if group is not None else None,
+            read_ms=read_token.shared_ms if read_token is not None else None,
+            group_ttl_ms=int(self.group_ttl_seconds * 1000),
+        )
+        if stored is False:
+            # 他インスタンスで無効化済み
+            self.local.pop(key)
+            return False
+        return True
+
+    def _group_key(self, group: str) -> str:
+        return self.tier.key(self.namespace, f"invalidated:{group}")
+
+    def _members_key(self, group: str) -> str:
+        return self.tier.key(self.namespace, f"members:{group}")
+
+    def invalidate_group(self, group: str) -> None:
+        """プロセス内の分はすぐ消し、共有層と他インスタンスへの反映はバックグラウンドで行う"""
+        self.invalidate_local_group(group)
+        if self.tier.enabled:
+            self.tier.spawn(self._invalidate_shared(group))
+
+    async def _invalidate_shared(self, group: str) -> None:
+        await self.tier.call(
+            self.tier.store.invalidate_group,
+            self._group_key(group),
+            self._members_key(group),
+            int(self.group_ttl_seconds * 1000),
+        )
+        await self.tier.publish_invalidation(self.namespace, group)
+
+    @property
+    def total_bytes(self) -> int:
+        return self.local.total_bytes
+
+    def __len__(self) -> int:
+        return len(self.local)
@@ -0,0 +1,293 @@
+"""
+キャラクターの変更イベントの中継（アウトボックス + LISTEN/NOTIFY）
+
+characters / character_live_state への書き込みは、トリガーが同じトランザクションで
+character_change_events に1行追加し、コミット時に pg_notify('character_changes') する。
+各インスタンスは専用の接続で LISTEN し、通知（または CHANGE_RELAY_POLL_SECONDS ごとのポーリング）で
+前回読んだ id より後のイベントを id 順に読み、登録されたハンドラ（プロセス内キャッシュの無効化など）に渡す。
+
+- 順序: id 順に渡す。id は採番順でコミット順ではないため、先に読んだ id より小さい id が後からコミットされる
+  ことがある（欠番）。欠番は CHANGE_RELAY_GAP_TIMEOUT_SECONDS の間は読み直し、過ぎたらロールバックとみなす。
+  ハンドラは冪等で、同じキャラクターのイベントが前後しても結果が変わらないこと（無効化・追加のみ）。
+- 再接続: LISTEN し直してから前回の続きを読む（切れていた間のイベントも取りこぼさない）。
+  続きが保持期間を過ぎて消えていた場合は、ハンドラの reset（プロセス内キャッシュを捨てる）を呼ぶ。
+- 起動時は現在の最新 id から始める（プロセス内キャッシュは空なので過去のイベントは不要）。
+- イベントは CHANGE_EVENT_RETENTION_MINUTES を過ぎたら消す。
+- 同じ接続で他のチャンネルも LISTEN できる（listen()。管理コマンドからの全インスタンスへの指示など）。
+  こちらはアウトボックスを通さないので、接続が切れていた間の通知は届かない。
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy.engine import make_url
+
+from app.database import ASYNC_DATABASE_URL
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+CHANGE_RELAY_ENABLED = os.getenv("CHANGE_RELAY_ENABLED", "true").lower() in ("1", "true", "yes")
+CHANGE_RELAY_POLL_SECONDS = float(os.getenv("CHANGE_RELAY_POLL_SECONDS", "5"))
+CHANGE_RELAY_GAP_TIMEOUT_SECONDS = float(os.getenv("CHANGE_RELAY_GAP_TIMEOUT_SECONDS", "60"))
+CHANGE_RELAY_RECONNECT_SECONDS = float(os.getenv("CHANGE_RELAY_RECONNECT_SECONDS", "5"))
+CHANGE_EVENT_RETENTION_MINUTES = int(os.getenv("CHANGE_EVENT_RETENTION_MINUTES", "60"))
+
+CHANNEL = "character_changes"
+_SEQUENCE = "character_change_events_id_seq"
+_FETCH_LIMIT = 1000
+_PRUNE_INTERVAL_SECONDS = 600
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    id: int
+    character_id: uuid.UUID
+    # insert / update / delete / live
+    op: str
+    is_public: Optional[bool]
+    share_token: Optional[str]
+    previous_share_token: Optional[str]
+    created_at: datetime
+
+
+@dataclass
+class _Subscriber:
+    apply: Callable[[ChangeEvent], None]
+    reset: Optional[Callable[[], None]]
+
+
+def _relay_dsn() -> str:
+    """asyncpg に直接渡せる接続文字列（SQLAlchemy のドライバ指定を外す）"""
+    return make_url(ASYNC_DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+class ChangeEventRelay:
+    """変更イベントを読み、登録されたハンドラに渡す（インスタンスごとに1つ）"""
+
+    def __init__(
+        self,
+        enabled: bool,
+        poll_interval: float,
+        gap_timeout: float,
+        reconnect_interval: float,
+        retention_minutes: int,
+    ):
+        self.enabled = enabled
+        self.poll_interval = poll_interval
+        self.gap_timeout = gap_timeout
+        self.reconnect_interval = reconnect_interval
+        self.retention_minutes = retention_minutes
+        self._subscribers: List[_Subscriber] = []
+        # チャンネル → 通知ごとに呼ぶもの
+        self._listeners: Dict[str, Callable[[], None]] = {}
+        # これ以下の id はすべて処理済み（または欠番として諦めた）
+        self._watermark: Optional[int] = None
+        # watermark より後で処理済みの id
+        self._seen: set[int] = set()
+        # 欠番 → 最初に気づいた時刻
+        self._gaps: Dict[int, float] = {}
+        # 処理済みの最大の id
+        self._high: Optional[int] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_prune = 0.0
+
+    def subscribe(self, apply: Callable[[ChangeEvent], None], reset: Optional[Callable[[], None]] = None) -> None:
+        """apply はイベントごと、reset は取りこぼしがありうるときに呼ばれる（どちらもイベントループ上で同期的に）"""
+        self._subscribers.append(_Subscriber(apply, reset))
+
+    def listen(self, channel: str, callback: Callable[[], None]) -> None:
+        """channel への NOTIFY ごとに callback を呼ぶ（イベントループ上で同期的に。start() の前に登録する）"""
+        self._listeners[channel] = callback
+
+    # --- イベントの適用 ---
+
+    def _dispatch(self, event: ChangeEvent) -> None:
+        for subscriber in self._subscribers:
+            try:
+                subscriber.apply(event)
+            except Exception as e:
+                logger.error(f"Change event handler failed for event {event.id}: {e}", exc_info=True)
+        metrics.inc("change_events.applied")
+
+    def _reset(self) -> None:
+        metrics.inc("change_events.reset")
+        for subscriber in self._subscribers:
+            if subscriber.reset is not None:
+                try:
+                    subscriber.reset()
+                except Exception as e:
+                    logger.error(f"Change event reset handler failed: {e}", exc_info=True)
+
+    def _start_from(self, event_id: int) -> None:
+        self._watermark = event_id
+        self._high = event_id
+        self._seen.clear()
+        self._gaps.clear()
+
+    def process(self, events: List[ChangeEvent], now: Optional[float] = None) -> None:
+        """id 順のイベントを適用し、watermark を進める（欠番は猶予の間は待つ）"""
+        now = time.monotonic() if now is None else now
+        for event in events:
+            if event.id <= self._watermark or event.id in self._seen:
+                continue
+            # 間の欠番を記録（まだコミットされていないトランザクションの可能性）
+            for missing in range(self._high + 1, event.id):
+                self._gaps.setdefault(missing, now)
+            self._gaps.pop(event.id, None)
+            self._seen.add(event.id)
+            self._high = max(self._high, event.id)
+            self._dispatch(event)
+
+        # 猶予を過ぎた欠番はロールバックとみなす
+        expired = [gap for gap, since in self._gaps.items() if now - since >= self.gap_timeout]
+        for gap in expired:
+            del self._gaps[gap]
+            self._seen.add(gap)
+            metrics.inc("change_events.gap_skipped")
+
+        while self._watermark + 1 in self._seen:
+            self._watermark += 1
+            self._seen.discard(self._watermark)
+
+    # --- 接続・読み込み ---
+
+    async def _fetch(self, connection) -> List[ChangeEvent]:
+        """未処理のイベント（処理済みの最大 id より後と、待っている欠番）"""
+        rows = await connection.fetch(
+            """
+            SELECT id, character_id, op, is_public, share_token, previous_share_token, created_at
+            FROM character_change_events
+            WHERE id > $1 OR id = ANY($2::bigint[])
+            ORDER BY id
+            LIMIT $3
+            """,
+            self._high,
+            list(self._gaps),
+            _FETCH_LIMIT,
+        )
+        return [ChangeEvent(**dict(row)) for row in rows]
+
+    async def _catch_up(self, connection) -> None:
+        while True:
+            events = await self._fetch(connection)
+            self.process(events)
+            if len(events) < _FETCH_LIMIT:
+                break
+
+    async def _resume(self, connection) -> None:
+        """接続直後: 初回は最新から、再接続は続きから（消えていたら reset）"""
+        # issued: 採番済みの最大 id（テーブルが空でも、保持期間切れで消えた分を含めて分かる）
+        oldest, latest, issued = await connection.fetchrow(
+            f"""
+            SELECT min(id), max(id),
+                   (SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {_SEQUENCE})
+            FROM character_change_events
+            """
+        )
+        if self._watermark is None:
+            self._start_from(latest or issued or 0)
+            return
+        if oldest is None:
+            pruned = issued > self._watermark
+        else:
+            pruned = oldest > self._watermark + 1
+        if pruned:
+            logger.warning(
+                f"Change events after {self._watermark} were pruned before replay; resetting local caches"
+            )
+            self._reset()
+            self._start_from(latest or issued)
+
+    async def _prune(self, connection) -> None:
+        if time.monotonic() - self._last_prune < _PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = time.monotonic()
+        await connection.execute(
+            "DELETE FROM character_change_events WHERE created_at < (now() AT TIME ZONE 'utc') - make_interval(mins => $1)",
+            self.retention_minutes,
+        )
+
+    def _on_notify(self, *args) -> None:
+        metrics.inc("change_events.notified")
+        self._wake.set()
+
+    def _on_channel_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            self._listeners[channel]()
+        except Exception as e:
+            logger.error(f"Listener for channel {channel} failed: {e}", exc_info=True)
+
+    async def _run_connection(self) -> None:
+        import asyncpg
+
+        connection = await asyncpg.connect(_relay_dsn())
+        closed = asyncio.Event()
+        connection.add_termination_listener(lambda _: closed.set())
+        try:
+            # 先に LISTEN してから続きを読む（読んでいる間の通知を取りこぼさない）
+            await connection.add_listener(CHANNEL, self._on_notify)
+            for channel in self._listeners:
+                await connection.add_listener(channel, self._on_channel_notify)
+            await self._resume(connection)
+            logger.info(f"Change event relay listening from id {self._watermark}")
+            while not closed.is_set():
+                self._wake.clear()
+                await self._catch_up(connection)
+                await self._prune(connection)
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            raise ConnectionError("listen connection closed")
+        finally:
+            if not connection.is_closed():
+                await connection.close()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._run_connection()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.inc("change_events.reconnect")
+                logger.warning(f"Change event relay disconnected: {e!r}")
+            await asyncio.sleep(self.reconnect_interval)
+
+    def start(self) -> None:
+        if not self.enabled or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "watermark": self._watermark,
+            "pending_gaps": len(self._gaps),
+        }
+
+
+change_relay = ChangeEventRelay(
+    enabled=CHANGE_RELAY_ENABLED,
+    poll_interval=CHANGE_RELAY_POLL_SECONDS,
+    gap_timeout=CHANGE_RELAY_GAP_TIMEOUT_SECONDS,
+    reconnect_interval=CHANGE_RELAY_RECONNECT_SECONDS,
+    retention_minutes=CHANGE_EVENT_RETENTION_MINUTES,
+)
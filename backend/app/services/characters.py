@@ -0,0 +1,33 @@
+"""キャラクター作成の共通処理（通常の作成・一括操作・インポートで共有）"""
+import uuid
+
+from app.models import Character, SystemEnum
+from app.schemas import CharacterCreate
+from app.summary import build_character_summary
+from app.templates import generate_template
+from app.validators import validate_cthulhu_skill_points
+
+CTHULHU_SYSTEMS = {SystemEnum.cthulhu6, SystemEnum.cthulhu7}
+
+
+def build_new_character(data: CharacterCreate, user_id: uuid.UUID) -> Character:
+    """
+    作成用の Character を組み立てる（まだセッションには追加しない）
+
+    sheet_data が空ならシステムのテンプレートを使い、クトゥルフの場合は技能ポイント上限をチェックする
+    （超過時は validate_cthulhu_skill_points が HTTPException を送出）。
+    """
+    sheet_data = data.sheet_data if data.sheet_data else generate_template(data.system)
+    if data.system in CTHULHU_SYSTEMS:
+        validate_cthulhu_skill_points(sheet_data, data.system)
+    return Character(
+        id=uuid.uuid4(),
+        user_id=user_id,
+        system=data.system,
+        name=data.name,
+        tags=data.tags,
+        profile_image_url=data.profile_image_url,
+        sheet_data=sheet_data,
+        summary=build_character_summary(data.system, sheet_data),
+        is_public=False,
+    )
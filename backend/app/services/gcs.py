@@ -1,11 +1,20 @@
+import asyncio
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlparse, unquote
 
 from google.cloud import storage
 
+from app.services import metrics
+from app.services.cache import TTLCache
+from app.services.cache_tier import TwoLevelCache, cache_tier
+from app.services.gcs_signer import get_local_signer
+
 
 def normalize_google_application_credentials_env() -> None:
     """
@@ -25,6 +34,78 @@ def normalize_google_application_credentials_env() -> None:
         os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(resolved)
 
 
+@lru_cache(maxsize=1)
+def get_storage_client() -> storage.Client:
+    """プロセス共通の Storage クライアント（ADC の解決は初回のみ）"""
+    normalize_google_application_credentials_env()
+    return storage.Client()
+
+
+class SignedUrlCache:
+    """
+    署名付きGET URLのLRUキャッシュ（キー: (bucket, object)）
+
+    期限切れ間近（残り refresh_margin 未満）のエントリは使わずに再署名させる。
+    共有層（CACHE_REDIS_URL）があれば署名したURLをインスタンス間で使い回す
+    （同じ画像が同じURLになり、ブラウザ・CDNの画像キャッシュも効く）。
+    """
+
+    def __init__(self, max_entries: int, refresh_margin: timedelta):
+        self.refresh_margin = refresh_margin
+        self._cache = TwoLevelCache(
+            cache_tier,
+            "signed_url",
+            TTLCache(max_entries),
+            encode=lambda url: url.encode("utf-8"),
+            decode=lambda data: data.decode("utf-8"),
+        )
+
+    @staticmethod
+    def _key(bucket_name: str, object_name: str) -> str:
+        return f"{bucket_name}/{object_name}"
+
+    def get(self, bucket_name: str, object_name: str) -> Optional[str]:
+        return self._cache.get_local(self._key(bucket_name, object_name))
+
+    def put(self, bucket_name: str, object_name: str, url: str, expires_delta: timedelta) -> None:
+        """プロセス内に載せる（署名スレッドからも呼ばれる。共有層へは share() で書く）"""
+        usable = expires_delta - self.refresh_margin
+        self._cache.set_local(self._key(bucket_name, object_name), url, time.time() + usable.total_seconds())
+
+    async def fetch_shared(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+        """プロセス内に無いものを共有層から引く（取れたものはプロセス内にも載る）"""
+        urls = await self._cache.get_many([self._key(*key) for key in keys])
+        return {key: url for key, url in zip(keys, urls) if url is not None}
+
+    async def share(self, keys: List[Tuple[str, str]]) -> None:
+        """署名したURLを共有層に書く"""
+        for key in keys:
+            cache_key = self._key(*key)
+            url = self._cache.get_local(cache_key)
+            remaining = self._cache.remaining_seconds(cache_key)
+            if url is not None and remaining:
+                await self._cache.put(cache_key, url, remaining)
+
+    def remaining_seconds(self, bucket_name: str, object_name: str) -> Optional[float]:
+        """キャッシュ済みの署名付きURLを使い回せる残り秒数（実際の失効は refresh_margin 分さらに後）"""
+        return self._cache.remaining_seconds(self._key(bucket_name, object_name))
+
+    def invalidate(self, bucket_name: str, object_name: str) -> None:
+        self._cache.local.pop(self._key(bucket_name, object_name))
+
+    def clear(self) -> None:
+        self._cache.clear_local()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+signed_url_cache = SignedUrlCache(
+    max_entries=int(os.getenv("GCS_SIGNED_URL_CACHE_SIZE", "2048")),
+    refresh_margin=timedelta(seconds=int(os.getenv("GCS_SIGNED_URL_REFRESH_MARGIN_SECONDS", "300"))),
+)
+
+
 def extract_gcs_bucket_and_object(url: str) -> Optional[Tuple[str, str]]:
     """
     `gs://bucket/object` または `https://storage.googleapis.com/bucket/object` から
@@ -74,9 +155,14 @@ def generate_signed_get_url(
 ) -> str:
     """
     非公開GCSオブジェクトをブラウザ表示できるようにするための署名付きURL（GET）を生成する。
+
+    サービスアカウント鍵があればプロセス内で署名し、無ければライブラリ（IAM signBlob）で署名する。
     """
-    normalize_google_application_credentials_env()
-    client = storage.Client()
+    signer = get_local_signer()
+    if signer is not None:
+        return signer.sign_url(bucket_name, object_name, expires_delta, method="GET")
+
+    client = get_storage_client()
     bucket = client.bucket(bucket_name)
     blob = bucket.blob(object_name)
     return blob.generate_signed_url(
@@ -86,27 +172,162 @@ def generate_signed_get_url(
     )
 
 
+def generate_signed_upload_url(
+    bucket_name: str,
+    object_name: str,
+    expires_delta: timedelta,
+    content_type: str,
+) -> str:
+    """ブラウザから直接PUTするための署名付きURLを生成する。"""
+    signer = get_local_signer()
+    if signer is not None:
+        return signer.sign_url(
+            bucket_name,
+            object_name,
+            expires_delta,
+            method="PUT",
+            content_type=content_type,
+        )
+
+    client = get_storage_client()
+    bucket = client.bucket(bucket_name)
+    blob = bucket.blob(object_name)
+    return blob.generate_signed_url(
+        version="v4",
+        expiration=expires_delta,
+        method="PUT",
+        content_type=content_type,
+    )
+
+
+def _read_url_expiration() -> timedelta:
+    return timedelta(minutes=int(os.getenv("GCS_SIGNED_URL_EXP_MINUTES", "15")))
+
+
+def _sign_read_url_uncached(original_url: str, bucket_name: str, object_name: str, expires_delta: timedelta) -> str:
+    try:
+        started = time.perf_counter()
+        url = generate_signed_get_url(bucket_name, object_name, expires_delta)
+        metrics.observe("gcs.sign_get_url", time.perf_counter() - started)
+        signed_url_cache.put(bucket_name, object_name, url, expires_delta)
+        return url
+    except Exception:
+        # 署名生成に失敗しても、元のURL（公開設定の環境では表示できる）にフォールバック
+        return original_url
+
+
+def _lookup_read_url(original_url: Optional[str]) -> Tuple[Optional[str], Optional[Tuple[str, str]]]:
+    """
+    キャッシュを引く。戻り値は (返すURL, 署名が必要な (bucket, object))。
+    署名が不要（GCS以外・キャッシュヒット）の場合は後者が None。
+    """
+    if not original_url:
+        return original_url, None
+
+    extracted = extract_gcs_bucket_and_object(original_url)
+    if not extracted:
+        return original_url, None
+
+    # 残り時間が十分ある署名済みURLは使い回す
+    cached = signed_url_cache.get(*extracted)
+    if cached is not None:
+        metrics.inc("gcs.signed_url_cache.hit")
+        return cached, None
+    metrics.inc("gcs.signed_url_cache.miss")
+    return None, extracted
+
+
 def maybe_sign_read_url(original_url: Optional[str]) -> Optional[str]:
     """
     `original_url` がGCS URLなら、署名付きGET URLに差し替えて返す。
     失敗した場合は元のURLを返す（表示を壊さないため）。
     """
-    if not original_url:
-        return original_url
+    url, to_sign = _lookup_read_url(original_url)
+    if to_sign is None:
+        return url
+    bucket_name, object_name = to_sign
+    url = _sign_read_url_uncached(original_url, bucket_name, object_name, _read_url_expiration())
+    _share_signed_urls([to_sign])
+    return url
+
+
+def _share_signed_urls(keys: List[Tuple[str, str]]) -> None:
+    """署名したURLを共有層へバックグラウンドで書く（イベントループ外からの呼び出しでは何もしない）"""
+    if not cache_tier.enabled or not keys:
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    cache_tier.spawn(signed_url_cache.share(keys))
 
+
+def read_url_remaining_seconds(original_url: Optional[str]) -> Optional[float]:
+    """
+    `maybe_sign_read_url(original_url)` が返した署名付きURLを使い回せる残り秒数。
+    署名しないURL（GCS以外・未設定）は None、署名に失敗して元のURLを返した場合は 0。
+    レスポンスをキャッシュさせる時間の上限に使う（期限切れの画像URLを配らないため）。
+    """
+    if not original_url:
+        return None
     extracted = extract_gcs_bucket_and_object(original_url)
     if not extracted:
-        return original_url
+        return None
+    return signed_url_cache.remaining_seconds(*extracted) or 0.0
 
-    bucket_name, object_name = extracted
-    expiration_minutes = int(os.getenv("GCS_SIGNED_URL_EXP_MINUTES", "15"))
-    expires_delta = timedelta(minutes=expiration_minutes)
 
-    try:
-        return generate_signed_get_url(bucket_name, object_name, expires_delta)
-    except Exception:
-        # 署名生成に失敗しても、元のURL（公開設定の環境では表示できる）にフォールバック
-        return original_url
+_sign_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("GCS_SIGN_WORKERS", "4")),
+    thread_name_prefix="gcs-sign",
+)
+
+
+async def maybe_sign_read_urls(original_urls: List[Optional[str]]) -> List[Optional[str]]:
+    """
+    一覧ページ分のURLをまとめて署名する（`maybe_sign_read_url` のバッチ版）。
+
+    キャッシュに無いものだけを重複を除いてスレッドプールで署名し、イベントループをブロックしない。
+    """
+    results: List[Optional[str]] = []
+    pending: Dict[Tuple[str, str], str] = {}
+    for original_url in original_urls:
+        url, to_sign = _lookup_read_url(original_url)
+        results.append(url)
+        if to_sign is not None:
+            pending.setdefault(to_sign, original_url)
 
+    if pending and cache_tier.enabled:
+        # 他インスタンスが署名済みのURLを使う
+        shared = await signed_url_cache.fetch_shared(list(pending))
+        for i, original_url in enumerate(original_urls):
+            if results[i] is None and original_url:
+                key = extract_gcs_bucket_and_object(original_url)
+                if key in shared:
+                    results[i] = shared[key]
+        for key in shared:
+            del pending[key]
 
+    if pending:
+        loop = asyncio.get_running_loop()
+        expires_delta = _read_url_expiration()
+        keys = list(pending)
+        signed = await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    _sign_executor,
+                    _sign_read_url_uncached,
+                    pending[key],
+                    key[0],
+                    key[1],
+                    expires_delta,
+                )
+                for key in keys
+            ]
+        )
+        signed_by_key = dict(zip(keys, signed))
+        _share_signed_urls(keys)
+        for i, original_url in enumerate(original_urls):
+            if results[i] is None and original_url:
+                results[i] = signed_by_key[extract_gcs_bucket_and_object(original_url)]
 
+    return results
@@ -0,0 +1,110 @@
+"""
+GCS V4 署名付きURLのプロセス内生成
+
+サービスアカウント鍵（GOOGLE_APPLICATION_CREDENTIALS のJSON）を起動時に一度だけ読み込み、
+以降は ADC の解決や IAM signBlob を経由せずに RSA-SHA256 でローカル署名する。
+鍵ファイルが無い環境（Cloud Run のメタデータサーバー認証など）では None を返し、
+呼び出し側は google-cloud-storage の署名にフォールバックする。
+"""
+import binascii
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import quote, urlencode
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+
+GCS_HOST = "storage.googleapis.com"
+_ALGORITHM = "GOOG4-RSA-SHA256"
+_MAX_EXPIRATION = timedelta(days=7)
+
+
+class LocalV4Signer:
+    """サービスアカウント鍵で V4 署名付きURLを生成する"""
+
+    def __init__(self, client_email: str, private_key_pem: str):
+        self.client_email = client_email
+        self._private_key = serialization.load_pem_private_key(
+            private_key_pem.encode("utf-8"),
+            password=None,
+        )
+
+    @classmethod
+    def from_service_account_file(cls, path: str) -> "LocalV4Signer":
+        with open(path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        if info.get("type") != "service_account":
+            raise ValueError("credentials file is not a service account key")
+        return cls(info["client_email"], info["private_key"])
+
+    def sign_url(
+        self,
+        bucket_name: str,
+        object_name: str,
+        expires_delta: timedelta,
+        method: str = "GET",
+        content_type: Optional[str] = None,
+        now: Optional[datetime] = None,
+    ) -> str:
+        if expires_delta > _MAX_EXPIRATION:
+            raise ValueError("V4 signed URLs can expire at most 7 days in the future")
+
+        now = now or datetime.now(timezone.utc)
+        request_timestamp = now.strftime("%Y%m%dT%H%M%SZ")
+        datestamp = now.strftime("%Y%m%d")
+        credential_scope = f"{datestamp}/auto/storage/goog4_request"
+
+        headers = {"host": GCS_HOST}
+        if content_type:
+            headers["content-type"] = content_type
+        canonical_headers = "".join(f"{k}:{headers[k]}\n" for k in sorted(headers))
+        signed_headers = ";".join(sorted(headers))
+
+        query = {
+            "X-Goog-Algorithm": _ALGORITHM,
+            "X-Goog-Credential": f"{self.client_email}/{credential_scope}",
+            "X-Goog-Date": request_timestamp,
+            "X-Goog-Expires": str(int(expires_delta.total_seconds())),
+            "X-Goog-SignedHeaders": signed_headers,
+        }
+        canonical_query = urlencode(sorted(query.items()), quote_via=quote)
+
+        resource = f"/{bucket_name}/{quote(object_name, safe='/~')}"
+        canonical_request = "\n".join(
+            [method, resource, canonical_query, canonical_headers, signed_headers, "UNSIGNED-PAYLOAD"]
+        )
+        string_to_sign = "\n".join(
+            [
+                _ALGORITHM,
+                request_timestamp,
+                credential_scope,
+                hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+            ]
+        )
+        signature = self._private_key.sign(
+            string_to_sign.encode("utf-8"),
+            padding.PKCS1v15(),
+            hashes.SHA256(),
+        )
+        signature_hex = binascii.hexlify(signature).decode("ascii")
+        return f"https://{GCS_HOST}{resource}?{canonical_query}&X-Goog-Signature={signature_hex}"
+
+
+@lru_cache(maxsize=1)
+def get_local_signer() -> Optional[LocalV4Signer]:
+    """鍵ファイルがあればローカル署名器を返す（読み込みはプロセスで一度だけ）"""
+    from app.services.gcs import normalize_google_application_credentials_env
+
+    normalize_google_application_credentials_env()
+    path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return LocalV4Signer.from_service_account_file(path)
+    except Exception:
+        # ユーザー認証情報など、秘密鍵を持たないADCの場合はライブラリ署名に任せる
+        return None
@@ -0,0 +1,128 @@
+"""キャラクターの現在値（HP/SAN/MP）のライブ状態
+
+セッション中の HP/SAN/MP の増減は character_live_state の小さな行だけを更新し、
+sheet_data（JSONB）全体の書き換え（TOAST の再書き込み）を避ける。
+読み出し時は sheet_data.derived の *_current にライブ状態を重ねて返す。
+シート全体の保存（PUT）や derived を含むパッチでは、ライブ状態を sheet_data に畳み込んで削除する。
+"""
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import CharacterLiveState, SystemEnum
+from app.summary import _to_optional_int
+
+# ライブ状態を持てるシステム（derived.*_current があるもの）
+LIVE_STATE_SYSTEMS = {SystemEnum.cthulhu6, SystemEnum.cthulhu7}
+
+# character_live_state の列 → sheet_data.derived のキー
+LIVE_STATE_FIELDS = {
+    "hp_current": "HP_current",
+    "san_current": "SAN_current",
+    "mp_current": "MP_current",
+}
+
+# ライブ状態と重なる sheet_data のトップレベルキー
+LIVE_STATE_SHEET_KEYS = ("derived",)
+
+
+def live_state_overlay(live_state: Optional[CharacterLiveState]) -> Dict[str, Any]:
+    """ライブ状態 → sheet_data.derived に重ねる値（NULL の項目は含めない）"""
+    if live_state is None:
+        return {}
+    overlay = {}
+    for column, sheet_key in LIVE_STATE_FIELDS.items():
+        value = getattr(live_state, column)
+        if value is not None:
+            overlay[sheet_key] = value
+    return overlay
+
+
+def merge_live_state(sheet_data: Optional[Dict[str, Any]], live_state: Optional[CharacterLiveState]) -> Dict[str, Any]:
+    """sheet_data にライブ状態を重ねたコピーを返す（ライブ状態が無ければそのまま）"""
+    sheet_data = sheet_data or {}
+    overlay = live_state_overlay(live_state)
+    if not overlay:
+        return sheet_data
+    derived = sheet_data.get("derived")
+    merged_derived = dict(derived) if isinstance(derived, dict) else {}
+    merged_derived.update(overlay)
+    return {**sheet_data, "derived": merged_derived}
+
+
+def sheet_current_values(derived: Any) -> Dict[str, Optional[int]]:
+    """sheet_data.derived から現在値を取り出す（列名をキーにする）"""
+    if not isinstance(derived, Mapping):
+        derived = {}
+    return {column: _to_optional_int(derived.get(sheet_key)) for column, sheet_key in LIVE_STATE_FIELDS.items()}
+
+
+def live_state_updated_at(live_state: Optional[CharacterLiveState]) -> Optional[datetime]:
+    return live_state.updated_at if live_state is not None else None
+
+
+async def load_live_state(db: AsyncSession, character_id: uuid.UUID) -> Optional[CharacterLiveState]:
+    return await db.get(CharacterLiveState, character_id)
+
+
+async def load_live_states(db: AsyncSession, character_ids: Iterable[uuid.UUID]) -> Dict[uuid.UUID, CharacterLiveState]:
+    """複数キャラクター分のライブ状態を1クエリで取得"""
+    ids = list(character_ids)
+    if not ids:
+        return {}
+    result = await db.execute(select(CharacterLiveState).where(CharacterLiveState.character_id.in_(ids)))
+    return {row.character_id: row for row in result.scalars()}
+
+
+async def set_live_state(
+    db: AsyncSession,
+    character_id: uuid.UUID,
+    values: Mapping[str, int],
+) -> CharacterLiveState:
+    """現在値を直接指定（UPSERT）"""
+    now = datetime.utcnow()
+    stmt = pg_insert(CharacterLiveState).values(character_id=character_id, updated_at=now, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CharacterLiveState.character_id],
+        set_={**{column: stmt.excluded[column] for column in values}, "updated_at": now},
+    ).returning(CharacterLiveState)
+    result = await db.execute(stmt, execution_options={"populate_existing": True})
+    return result.scalar_one()
+
+
+async def adjust_live_state(
+    db: AsyncSession,
+    character_id: uuid.UUID,
+    deltas: Mapping[str, int],
+    base: Mapping[str, Optional[int]],
+) -> CharacterLiveState:
+    """現在値を増減（UPSERT 1文）
+
+    行が無い、または項目が NULL の場合は base（sheet_data の値）を起点にする。
+    同時に複数の増減が来ても、既存行は DB 上の値に対して加算されるので失われない。
+    """
+    now = datetime.utcnow()
+    deltas = {column: delta for column, delta in deltas.items() if delta}
+    initial = {column: (base.get(column) or 0) + delta for column, delta in deltas.items()}
+    stmt = pg_insert(CharacterLiveState).values(character_id=character_id, updated_at=now, **initial)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CharacterLiveState.character_id],
+        set_={
+            **{
+                column: func.coalesce(getattr(CharacterLiveState, column) + delta, stmt.excluded[column])
+                for column, delta in deltas.items()
+            },
+            "updated_at": now,
+        },
+    ).returning(CharacterLiveState)
+    result = await db.execute(stmt, execution_options={"populate_existing": True})
+    return result.scalar_one()
+
+
+async def clear_live_state(db: AsyncSession, character_id: uuid.UUID) -> None:
+    """ライブ状態を削除（sheet_data に畳み込んだ後に呼ぶ）"""
+    await db.execute(delete(CharacterLiveState).where(CharacterLiveState.character_id == character_id))
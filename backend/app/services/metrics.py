@@ -0,0 +1,77 @@
+"""
+プロセス内の簡易メトリクス（カウンタ・レイテンシ）
+
+Cloud Run のインスタンス単位の値。`GET /metrics`（METRICS_TOKEN の Bearer トークンが必要）でスナップショットを返す。
+"""
+import threading
+import time
+from typing import Dict, Any
+
+# 分あたりのレートは直近この分数だけ保持する
+_RATE_WINDOW_MINUTES = 5
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_timers: Dict[str, Dict[str, float]] = {}
+_rates: Dict[str, Dict[int, int]] = {}
+
+
+def inc(name: str, value: int = 1) -> None:
+    """カウンタを加算"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name: str, seconds: float) -> None:
+    """所要時間（秒）を記録"""
+    with _lock:
+        t = _timers.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+        t["count"] += 1
+        t["total"] += seconds
+        if seconds > t["max"]:
+            t["max"] = seconds
+
+
+def mark(name: str, value: int = 1) -> None:
+    """分単位のレートに加算（カウンタにも加算する）"""
+    minute = int(time.time() // 60)
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+        buckets = _rates.setdefault(name, {})
+        buckets[minute] = buckets.get(minute, 0) + value
+        for old in [m for m in buckets if m <= minute - _RATE_WINDOW_MINUTES]:
+            del buckets[old]
+
+
+def per_minute(name: str) -> float:
+    """直近の完了した分の平均（1分あたり、最大 _RATE_WINDOW_MINUTES-1 分）"""
+    minute = int(time.time() // 60)
+    with _lock:
+        buckets = _rates.get(name, {})
+        complete = [buckets.get(m, 0) for m in range(minute - _RATE_WINDOW_MINUTES + 1, minute)]
+    return sum(complete) / len(complete) if complete else 0.0
+
+
+def hit_rate(hits: str, misses: str) -> float:
+    """ヒット率（0.0〜1.0、試行なしは0.0）"""
+    with _lock:
+        h = _counters.get(hits, 0)
+        m = _counters.get(misses, 0)
+    return h / (h + m) if h + m else 0.0
+
+
+def snapshot() -> Dict[str, Any]:
+    """現在値のコピーを返す（timersは平均ミリ秒、per_minute は分あたりのレート）"""
+    with _lock:
+        timers = {
+            name: {
+                "count": int(t["count"]),
+                "avg_ms": (t["total"] / t["count"] * 1000) if t["count"] else 0.0,
+                "max_ms": t["max"] * 1000,
+            }
+            for name, t in _timers.items()
+        }
+        counters = dict(_counters)
+        names = list(_rates)
+    rates = {name: per_minute(name) for name in names}
+    return {"counters": counters, "timers": timers, "per_minute": rates}
@@ -0,0 +1,117 @@
+"""
+公開閲覧（GET /api/share/{token}）のレスポンスキャッシュ
+
+共有URLは Discord やココフォリアに貼られてアクセスが集中するため、シリアライズ済みのレスポンスを
+共有トークンをキーに保持する（プロセス内は TTL + LRU、件数とバイト数の上限付き。
+CACHE_REDIS_URL があればインスタンス間でも共有する。app.services.cache_tier 参照）。
+
+- キャラクターの更新・公開切替・画像変更・削除・ライブ状態の更新で invalidate_character() を呼ぶ
+- 読み込み中に無効化が走った場合は、古い内容を載せないよう保存しない（lookup() の ReadToken で判定）
+- 他インスタンスでの変更は変更イベント（app.services.change_events）で apply_change() に届き、
+  このプロセスの分を捨てる（中継が止まっている間は最大 TTL 秒古い内容が残りうる）
+"""
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Tuple
+
+from app.services import metrics
+from app.services.cache import TTLCache
+from app.services.cache_tier import ReadToken, TwoLevelCache, cache_tier
+from app.services.change_events import ChangeEvent
+
+SHARE_CACHE_TTL_SECONDS = int(os.getenv("SHARE_CACHE_TTL_SECONDS", "60"))
+
+
+@dataclass(frozen=True)
+class SharedResponse:
+    character_id: uuid.UUID
+    body: bytes
+    etag: str
+    last_modified: datetime
+    # 本文中の署名付き画像URLを使い回せる期限（time.time() 基準。署名URLを含まなければ None）
+    image_expires_at: Optional[float] = None
+
+
+def _encode(entry: SharedResponse) -> bytes:
+    header = json.dumps(
+        {
+            "character_id": str(entry.character_id),
+            "etag": entry.etag,
+            "last_modified": entry.last_modified.isoformat(),
+            "image_expires_at": entry.image_expires_at,
+        }
+    ).encode("utf-8")
+    return header + b"\n" + entry.body
+
+
+def _decode(data: bytes) -> SharedResponse:
+    header, _, body = data.partition(b"\n")
+    meta = json.loads(header)
+    return SharedResponse(
+        character_id=uuid.UUID(meta["character_id"]),
+        body=body,
+        etag=meta["etag"],
+        last_modified=datetime.fromisoformat(meta["last_modified"]),
+        image_expires_at=meta["image_expires_at"],
+    )
+
+
+class ShareResponseCache:
+    """共有トークン → シリアライズ済みレスポンス"""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._cache = TwoLevelCache(
+            cache_tier,
+            "share",
+            TTLCache(max_entries, max_bytes=max_bytes, sizeof=lambda entry: len(entry.body)),
+            encode=_encode,
+            decode=_decode,
+            # キャラクターID単位で無効化する（公開停止でトークンが消えても無効化できるように）
+            group_of=lambda entry: str(entry.character_id),
+        )
+
+    async def lookup(self, token: str) -> Tuple[Optional[SharedResponse], ReadToken]:
+        """(エントリ, ReadToken)。DBを読む前に呼び、ReadToken を put() に渡す。"""
+        entry, read_token = await self._cache.lookup(token)
+        metrics.inc("share.response_cache.hit" if entry is not None else "share.response_cache.miss")
+        return entry, read_token
+
+    async def put(
+        self,
+        token: str,
+        entry: SharedResponse,
+        read_token: ReadToken,
+        ttl_seconds: Optional[float] = None,
+    ) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else min(self.ttl_seconds, ttl_seconds)
+        # 読み込み後に無効化があった場合は保存しない
+        await self._cache.put(token, entry, ttl, read_token)
+
+    def invalidate_character(self, character_id: uuid.UUID) -> None:
+        self._cache.invalidate_group(str(character_id))
+        metrics.inc("share.response_cache.invalidated")
+
+    def apply_change(self, event: ChangeEvent) -> None:
+        """変更イベント: このプロセスの分だけ捨てる（共有層の無効化は変更したインスタンスが行う）"""
+        self._cache.invalidate_local_group(str(event.character_id))
+
+    def clear(self) -> None:
+        self._cache.clear_local()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._cache.total_bytes
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+share_response_cache = ShareResponseCache(
+    max_entries=int(os.getenv("SHARE_CACHE_SIZE", "1024")),
+    max_bytes=int(os.getenv("SHARE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    ttl_seconds=SHARE_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,51 @@
+"""
+公開閲覧の静的スナップショット
+
+公開時・公開中キャラクターの更新後に、共有ページの CharacterResponse を JSON として保存先に書き出し、
+GET /api/share/{token} は sheet_data を読まずにそれを返す（DBの更新日時と一致する場合のみ。確認結果は
+SHARE_SNAPSHOT_VERIFY_SECONDS の間、または変更イベントが届くまで使い回す）。
+保存先は SHARE_SNAPSHOT_BACKEND で選ぶ。
+
+- ""（既定）: 無効
+- "local": SHARE_SNAPSHOT_DIR のディレクトリ（テスト・単一インスタンス向け）
+- "gcs": SHARE_SNAPSHOT_GCS_BUCKET（未指定なら GCS_BUCKET_NAME）の SHARE_SNAPSHOT_GCS_PREFIX 以下
+"""
+import os
+from typing import Optional
+
+from .base import SnapshotStore
+from .publisher import ShareSnapshot, ShareSnapshotPublisher, build_shared_response
+
+
+def create_snapshot_store() -> Optional[SnapshotStore]:
+    """環境変数から保存先を作る（無効なら None）"""
+    backend = os.getenv("SHARE_SNAPSHOT_BACKEND", "").strip().lower()
+    if not backend:
+        return None
+    if backend == "local":
+        from .local import LocalSnapshotStore
+
+        return LocalSnapshotStore(os.getenv("SHARE_SNAPSHOT_DIR", "share-snapshots"))
+    if backend == "gcs":
+        from .gcs import GCSSnapshotStore
+
+        bucket_name = os.getenv("SHARE_SNAPSHOT_GCS_BUCKET") or os.getenv("GCS_BUCKET_NAME")
+        if not bucket_name:
+            raise ValueError("SHARE_SNAPSHOT_GCS_BUCKET or GCS_BUCKET_NAME must be set for the gcs snapshot backend")
+        return GCSSnapshotStore(bucket_name, os.getenv("SHARE_SNAPSHOT_GCS_PREFIX", "share-snapshots/"))
+    raise ValueError(f"Unknown SHARE_SNAPSHOT_BACKEND: {backend}")
+
+
+share_snapshots = ShareSnapshotPublisher(
+    create_snapshot_store(),
+    verify_ttl=float(os.getenv("SHARE_SNAPSHOT_VERIFY_SECONDS", "30")),
+)
+
+__all__ = [
+    "SnapshotStore",
+    "ShareSnapshot",
+    "ShareSnapshotPublisher",
+    "build_shared_response",
+    "create_snapshot_store",
+    "share_snapshots",
+]
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class SnapshotStore(ABC):
+    """
+    共有スナップショットの保存先（キー: 共有トークン）
+
+    メソッドは同期（ブロッキング）でよい。呼び出し側がスレッドで実行する。
+    """
+
+    @abstractmethod
+    def read(self, token: str) -> Optional[bytes]:
+        """無ければ None"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def write(self, token: str, data: bytes) -> None:
+        """上書き保存（読み手が書きかけを見ないこと）"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def delete(self, token: str) -> None:
+        """無くてもエラーにしない"""
+        raise NotImplementedError()
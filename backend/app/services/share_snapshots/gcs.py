@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from google.api_core.exceptions import NotFound
+
+from app.services.gcs import get_storage_client
+
+from .base import SnapshotStore
+
+
+class GCSSnapshotStore(SnapshotStore):
+    """GCS の `<prefix><token>.json` に保存する（オブジェクトの書き込みは原子的）"""
+
+    def __init__(self, bucket_name: str, prefix: str = "share-snapshots/"):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+
+    def _blob(self, token: str):
+        return get_storage_client().bucket(self.bucket_name).blob(f"{self.prefix}{token}.json")
+
+    def read(self, token: str) -> Optional[bytes]:
+        try:
+            return self._blob(token).download_as_bytes()
+        except NotFound:
+            return None
+
+    def write(self, token: str, data: bytes) -> None:
+        blob = self._blob(token)
+        # 内容は公開範囲だが、バケット経由で直接配らないので CDN 用のキャッシュ指定はしない
+        blob.cache_control = "no-store"
+        blob.upload_from_string(data, content_type="application/json")
+
+    def delete(self, token: str) -> None:
+        try:
+            self._blob(token).delete()
+        except NotFound:
+            pass
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from .base import SnapshotStore
+
+
+class LocalSnapshotStore(SnapshotStore):
+    """
+    ローカルディレクトリに `<token>.json` として保存する（テスト・単一インスタンス向け）
+
+    インスタンスごとに別ディレクトリになる構成では、公開停止の削除が他インスタンスに届かないので使わないこと。
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, token: str) -> Path:
+        return self.directory / f"{token}.json"
+
+    def read(self, token: str) -> Optional[bytes]:
+        try:
+            return self._path(token).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def write(self, token: str, data: bytes) -> None:
+        # 一時ファイルに書いてから置き換える（読み手が書きかけを見ないように）
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(token))
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    def delete(self, token: str) -> None:
+        self._path(token).unlink(missing_ok=True)
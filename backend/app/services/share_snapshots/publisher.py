@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal
+from app.models import Character, CharacterLiveState
+from app.schemas import CharacterResponse
+from app.services import metrics
+from app.services.cache import TTLCache
+from app.services.change_events import ChangeEvent
+from app.services.live_state import live_state_updated_at, load_live_state, merge_live_state
+from app.services.share_cache import share_response_cache
+
+from .base import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+# secrets.token_urlsafe の文字種（パス・オブジェクト名に使えないトークンはスナップショットを見ない）
+_TOKEN_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+def build_shared_response(
+    character: Character,
+    profile_image_url: Optional[str],
+    live_state: Optional[CharacterLiveState],
+) -> CharacterResponse:
+    """公開閲覧のレスポンス（ライブ状態を重ねたシート）"""
+    return CharacterResponse.model_validate(
+        {
+            "id": character.id,
+            "user_id": character.user_id,
+            "system": character.system,
+            "name": character.name,
+            "tags": character.tags,
+            "profile_image_url": profile_image_url,
+            "sheet_data": merge_live_state(character.sheet_data, live_state),
+            "is_public": character.is_public,
+            "share_token": character.share_token,
+            "created_at": character.created_at,
+            "updated_at": character.updated_at,
+        }
+    )
+
+
+@dataclass(frozen=True)
+class ShareSnapshot:
+    """
+    保存済みのスナップショット
+
+    画像URLは署名前のまま保存し、配信時に署名する（署名付きURLは短時間で失効するため）。
+    """
+
+    character_id: uuid.UUID
+    share_token: str
+    updated_at: datetime
+    live_updated_at: Optional[datetime]
+    profile_image_url: Optional[str]
+    document: Dict[str, Any]
+
+    def to_bytes(self) -> bytes:
+        return json.dumps(
+            {
+                "format": SNAPSHOT_FORMAT_VERSION,
+                "character_id": str(self.character_id),
+                "share_token": self.share_token,
+                "updated_at": self.updated_at.isoformat(),
+                "live_updated_at": self.live_updated_at.isoformat() if self.live_updated_at else None,
+                "profile_image_url": self.profile_image_url,
+                "character": self.document,
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Optional["ShareSnapshot"]:
+        """形式が違うもの（古い形式を含む）は None"""
+        raw = json.loads(data)
+        if raw.get("format") != SNAPSHOT_FORMAT_VERSION:
+            return None
+        return cls(
+            character_id=uuid.UUID(raw["character_id"]),
+            share_token=raw["share_token"],
+            updated_at=datetime.fromisoformat(raw["updated_at"]),
+            live_updated_at=datetime.fromisoformat(raw["live_updated_at"]) if raw["live_updated_at"] else None,
+            profile_image_url=raw["profile_image_url"],
+            document=raw["character"],
+        )
+
+    def response_body(self, signed_image_url: Optional[str]) -> bytes:
+        """署名付き画像URLを差し込んだ CharacterResponse の JSON"""
+        document = dict(self.document)
+        document["profile_image_url"] = signed_image_url
+        return json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class ShareSnapshotPublisher:
+    """
+    公開中キャラクターのスナップショットを保存先に書き出す・消す
+
+    - refresh はコミット後にバックグラウンドで行い、その時点のDBの内容を書く
+      （同じキャラクターへの連続した更新は1回の書き出しにまとめる）
+    - 公開停止・削除の delete は同じキャラクターの書き出しが終わるのを待ってから消す
+    - 書き出し後にまだ同じトークンで公開中かを確かめ、違えば消す（他インスタンスでの公開停止との競合対策）
+    - コミット後（schedule_refresh / delete を呼んだ時点）から書き出し・削除が成功するまでは stale とし、
+      このインスタンスではスナップショットを返さない（失敗した場合は次の更新まで stale のまま）
+    - スナップショットがDBと一致することを確かめたら verify_ttl 秒はそれを信用する（リクエストごとにDBを引かない）。
+      他インスタンスでの変更は変更イベント（apply_change）で信用を取り消す。verify_ttl はイベントを
+      取りこぼした場合の上限
+    """
+
+    def __init__(self, store: Optional[SnapshotStore], verify_ttl: float = 30.0, max_verified: int = 10000):
+        self.store = store
+        self.verify_ttl = verify_ttl
+        self._locks: Dict[uuid.UUID, asyncio.Lock] = {}
+        self._running: Dict[uuid.UUID, asyncio.Task] = {}
+        self._dirty: Set[uuid.UUID] = set()
+        # DBより古い（書き出し・削除が未完了または失敗した）スナップショットのキャラクター
+        self._stale: Set[uuid.UUID] = set()
+        # DBと一致することを確かめたキャラクター（verify_ttl で失効）
+        self._verified = TTLCache(max_verified, clock=time.monotonic)
+        # 変更のたびに進める（確認の間に変更があれば、確認結果を信用に使わない）
+        self._generation = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    def _lock(self, character_id: uuid.UUID) -> asyncio.Lock:
+        lock = self._locks.get(character_id)
+        if lock is None:
+            lock = self._locks[character_id] = asyncio.Lock()
+        return lock
+
+    def _release(self, character_id: uuid.UUID) -> None:
+        lock = self._locks.get(character_id)
+        if lock is not None and not lock.locked() and character_id not in self._running:
+            del self._locks[character_id]
+
+    def is_stale(self, character_id: uuid.UUID) -> bool:
+        return character_id in self._stale
+
+    def is_verified(self, character_id: uuid.UUID) -> bool:
+        """DBと確認済みで、その後に変更が無い（スナップショットをそのまま返してよい）"""
+        return character_id not in self._stale and self._verified.get(character_id) is not None
+
+    @property
+    def generation(self) -> int:
+        """DBとの確認を始める前に取り、mark_verified に渡す"""
+        return self._generation
+
+    def _invalidate(self, character_id: uuid.UUID) -> None:
+        self._generation += 1
+        self._verified.pop(character_id)
+
+    def _set_verified(self, character_id: uuid.UUID, generation: int) -> None:
+        if generation == self._generation:
+            self._stale.discard(character_id)
+            self._verified.set_ttl(character_id, True, self.verify_ttl)
+
+    def mark_verified(self, character_id: uuid.UUID, generation: int) -> None:
+        """スナップショットがDBと一致した（generation 以降に変更が無く、書き出し中でもなければ信用する）"""
+        if character_id not in self._running:
+            self._set_verified(character_id, generation)
+
+    def apply_change(self, event: ChangeEvent) -> None:
+        """変更イベント: 確認済みを取り消す（次の閲覧でDBと確かめ直す）"""
+        self._invalidate(event.character_id)
+
+    def clear_verified(self) -> None:
+        """変更イベントを取りこぼした可能性があるとき"""
+        self._generation += 1
+        self._verified.clear()
+
+    async def read(self, token: str) -> Optional[ShareSnapshot]:
+        """トークンのスナップショット（無い・壊れている場合は None）"""
+        if not self.enabled or not _TOKEN_PATTERN.match(token):
+            return None
+        try:
+            data = await asyncio.to_thread(self.store.read, token)
+            snapshot = ShareSnapshot.from_bytes(data) if data is not None else None
+        except Exception as e:
+            metrics.inc("share.snapshot.read_failed")
+            logger.error(f"Failed to read share snapshot: {e}")
+            return None
+        if snapshot is None or snapshot.share_token != token:
+            metrics.inc("share.snapshot.miss")
+            return None
+        metrics.inc("share.snapshot.hit")
+        return snapshot
+
+    def schedule_refresh(self, character_id: uuid.UUID) -> None:
+        """コミット後に呼ぶ（公開中のキャラクターのみ）。書き出しはバックグラウンドで行う。"""
+        if not self.enabled:
+            return
+        self._stale.add(character_id)
+        self._invalidate(character_id)
+        if character_id in self._running:
+            self._dirty.add(character_id)
+            return
+        task = asyncio.create_task(self._refresh_loop(character_id))
+        self._running[character_id] = task
+
+    async def _refresh_loop(self, character_id: uuid.UUID) -> None:
+        try:
+            while True:
+                self._dirty.discard(character_id)
+                await self.refresh(character_id)
+                if character_id not in self._dirty:
+                    break
+        finally:
+            self._running.pop(character_id, None)
+            self._release(character_id)
+
+    async def refresh(self, character_id: uuid.UUID) -> None:
+        """DBの現在の内容でスナップショットを書き出す（非公開なら何もしない）"""
+        async with self._lock(character_id):
+            generation = self._generation
+            try:
+                async with AsyncSessionLocal() as db:
+                    character = await db.get(Character, character_id)
+                    if character is None or not character.is_public or not character.share_token:
+                        return
+                    live_state = await load_live_state(db, character_id)
+                    snapshot = ShareSnapshot(
+                        character_id=character.id,
+                        share_token=character.share_token,
+                        updated_at=character.updated_at,
+                        live_updated_at=live_state_updated_at(live_state),
+                        profile_image_url=character.profile_image_url,
+                        document=build_shared_response(character, character.profile_image_url, live_state).model_dump(
+                            mode="json"
+                        ),
+                    )
+                await asyncio.to_thread(self.store.write, snapshot.share_token, snapshot.to_bytes())
+                metrics.inc("share.snapshot.written")
+                # コミットから書き出しまでの間に古いスナップショットから作られたレスポンスを捨てる
+                share_response_cache.invalidate_character(character_id)
+
+                # 書き出している間に公開停止・トークン変更があれば消す
+                async with AsyncSessionLocal() as db:
+                    current = (
+                        await db.execute(
+                            select(Character.is_public, Character.share_token).where(Character.id == character_id)
+                        )
+                    ).one_or_none()
+                if current is None or not current.is_public or current.share_token != snapshot.share_token:
+                    await asyncio.to_thread(self.store.delete, snapshot.share_token)
+                elif character_id not in self._dirty:
+                    self._set_verified(character_id, generation)
+            except Exception as e:
+                metrics.inc("share.snapshot.write_failed")
+                logger.error(f"Failed to write share snapshot for character {character_id}: {e}", exc_info=True)
+
+    async def delete(self, character_id: uuid.UUID, token: Optional[str]) -> None:
+        """公開停止・削除のコミット後に呼ぶ（書き出し中のものがあれば終わるのを待つ）"""
+        if not self.enabled or not token:
+            return
+        self._dirty.discard(character_id)
+        self._stale.add(character_id)
+        self._invalidate(character_id)
+        async with self._lock(character_id):
+            for attempt in range(2):
+                try:
+                    await asyncio.to_thread(self.store.delete, token)
+                    metrics.inc("share.snapshot.deleted")
+                    self._stale.discard(character_id)
+                    break
+                except Exception as e:
+                    if attempt:
+                        metrics.inc("share.snapshot.delete_failed")
+                        logger.error(f"Failed to delete share snapshot for character {character_id}: {e}")
+        self._release(character_id)
+
+    async def stop(self) -> None:
+        """シャットダウン時に書き出し中のものを待つ"""
+        tasks = list(self._running.values())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,268 @@
+"""
+共有トークンの否定判定フィルタ（Bloom フィルタ）
+
+GET /api/share/{token} は認証不要なので、でたらめなトークンでも一意インデックスを引きにいく。
+公開中の share_token を Bloom フィルタに載せ、「確実に存在しない」トークンはDBを読まずに 404 にする。
+
+- 起動時にDBから構築し、SHARE_TOKEN_FILTER_REBUILD_SECONDS ごとに作り直す（非公開になったトークンを落とすため。
+  公開は変更イベントで届くので、間隔は長くてよい）。構築はスレッドで行い、イベントループを止めない
+- 公開時に add() する（コミット前に呼ぶ。失敗しても偽陽性が1件増えるだけ）
+- 非公開・削除では消さない（Bloom フィルタは削除できない）。次の再構築まで偽陽性として扱われる
+- 構築前・無効時は常に「あるかもしれない」を返す（DBを引く）
+- 他インスタンスで公開されたトークンは変更イベント（app.services.change_events）で apply_change() に届く。
+  イベントを取りこぼした可能性があるとき（変更イベントの reset）は作り直す
+
+`python -m app.services.share_token_filter rebuild` は起動中の全インスタンスに再構築を指示する
+（NOTIFY share_token_filter_rebuild。変更イベントの中継の接続で受ける。中継が無効なインスタンスには届かない）。
+`python -m app.services.share_token_filter stats` はDBの公開中トークンでフィルタを作り、サイズと推定偽陽性率を表示する。
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import secrets
+import time
+from collections import deque
+from typing import Deque, Iterable, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from app.database import AsyncSessionLocal
+from app.models import Character
+from app.services import metrics
+from app.services.change_events import ChangeEvent
+
+logger = logging.getLogger(__name__)
+
+SHARE_TOKEN_FILTER_ENABLED = os.getenv("SHARE_TOKEN_FILTER_ENABLED", "true").lower() in ("1", "true", "yes")
+SHARE_TOKEN_FILTER_FP_RATE = float(os.getenv("SHARE_TOKEN_FILTER_FP_RATE", "0.001"))
+SHARE_TOKEN_FILTER_MIN_CAPACITY = int(os.getenv("SHARE_TOKEN_FILTER_MIN_CAPACITY", "10000"))
+SHARE_TOKEN_FILTER_REBUILD_SECONDS = float(os.getenv("SHARE_TOKEN_FILTER_REBUILD_SECONDS", "3600"))
+
+# 全インスタンスへの再構築の指示
+REBUILD_CHANNEL = "share_token_filter_rebuild"
+
+# 再構築のクエリ開始前に add() され、コミットがクエリより後になったトークンを取りこぼさないための猶予
+_RECENT_ADD_SECONDS = 60.0
+
+
+class BloomFilter:
+    """
+    固定サイズの Bloom フィルタ（偽陰性なし）
+
+    ハッシュは構築ごとの鍵付き blake2b からの二重ハッシュ（外部からビット位置を狙えないように）。
+    """
+
+    def __init__(self, capacity: int, fp_rate: float):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._key = secrets.token_bytes(16)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16, key=self._key).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def estimated_fp_rate(self) -> float:
+        """登録件数から見積もった偽陽性率"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._bits)
+
+
+async def load_share_tokens() -> list[str]:
+    """公開中の share_token をすべて読む（ix_characters_public_share_token の index-only scan）"""
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(Character.share_token)
+            .where(Character.is_public == True)
+            .where(Character.share_token.isnot(None))
+            .execution_options(yield_per=10000)
+        )
+        return [token async for token in result.scalars()]
+
+
+def build_filter(tokens: list[str], fp_rate: float, min_capacity: int) -> BloomFilter:
+    """件数の2倍（公開の増加分）を見込んだサイズで構築する"""
+    bloom = BloomFilter(max(len(tokens) * 2, min_capacity), fp_rate)
+    for token in tokens:
+        bloom.add(token)
+    return bloom
+
+
+class ShareTokenFilter:
+    """公開中の共有トークンのフィルタ（構築・差し替え・定期再構築）"""
+
+    def __init__(self, enabled: bool, fp_rate: float, min_capacity: int, rebuild_interval: float):
+        self.enabled = enabled
+        self.fp_rate = fp_rate
+        self.min_capacity = min_capacity
+        self.rebuild_interval = rebuild_interval
+        self._bloom: Optional[BloomFilter] = None
+        self._recent_adds: Deque[Tuple[float, str]] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._rebuild_requested = asyncio.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._bloom is not None
+
+    def might_contain(self, token: str) -> bool:
+        """False なら公開中のトークンではない（DBを引かずに 404 にしてよい）"""
+        bloom = self._bloom
+        if not self.enabled or bloom is None:
+            return True
+        if token in bloom:
+            metrics.inc("share.token_filter.passed")
+            return True
+        metrics.inc("share.token_filter.rejected")
+        return False
+
+    def record_false_positive(self) -> None:
+        """フィルタを通ったがDBに無かった（偽陽性率のメトリクス用）"""
+        if self.enabled and self._bloom is not None:
+            metrics.inc("share.token_filter.false_positive")
+
+    def add(self, token: str) -> None:
+        """公開したトークンを載せる（コミット前に呼ぶ）"""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        self._recent_adds.append((now, token))
+        while self._recent_adds and self._recent_adds[0][0] < now - _RECENT_ADD_SECONDS:
+            self._recent_adds.popleft()
+        if self._bloom is not None:
+            self._bloom.add(token)
+
+    def apply_change(self, event: ChangeEvent) -> None:
+        """変更イベント: 公開中のトークンを載せる（他インスタンスでの公開をすぐ反映する）"""
+        if event.is_public and event.share_token:
+            self.add(event.share_token)
+
+    async def rebuild(self) -> BloomFilter:
+        """DBから作り直して差し替える（構築中の add() も新しいフィルタに反映する）"""
+        async with self._lock:
+            started = time.perf_counter()
+            tokens = await load_share_tokens()
+            # 数十万件でハッシュ計算が秒単位になるので、イベントループの外で作る
+            bloom = await asyncio.to_thread(build_filter, tokens, self.fp_rate, self.min_capacity)
+            for _, token in self._recent_adds:
+                bloom.add(token)
+            self._bloom = bloom
+            metrics.observe("share.token_filter.rebuild", time.perf_counter() - started)
+            logger.info(
+                f"Share token filter rebuilt: {len(tokens)} tokens, {bloom.size_bytes} bytes, "
+                f"{bloom.num_hashes} hashes, estimated fp rate {bloom.estimated_fp_rate:.6f}"
+            )
+            return bloom
+
+    def request_rebuild(self) -> None:
+        """次の定期再構築を待たずに作り直す（変更イベントの reset・再構築の指示から呼ぶ）"""
+        if self.enabled:
+            metrics.inc("share.token_filter.rebuild_requested")
+            self._rebuild_requested.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._rebuild_requested.clear()
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"Failed to rebuild share token filter: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._rebuild_requested.wait(), self.rebuild_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """初回構築と定期再構築をバックグラウンドで始める（構築が終わるまではDBを引く）"""
+        if not self.enabled or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        bloom = self._bloom
+        if bloom is None:
+            return {"ready": False}
+        return {
+            "ready": True,
+            "tokens": bloom.count,
+            "capacity": bloom.capacity,
+            "bytes": bloom.size_bytes,
+            "hashes": bloom.num_hashes,
+            "estimated_fp_rate": bloom.estimated_fp_rate,
+        }
+
+
+share_token_filter = ShareTokenFilter(
+    enabled=SHARE_TOKEN_FILTER_ENABLED,
+    fp_rate=SHARE_TOKEN_FILTER_FP_RATE,
+    min_capacity=SHARE_TOKEN_FILTER_MIN_CAPACITY,
+    rebuild_interval=SHARE_TOKEN_FILTER_REBUILD_SECONDS,
+)
+
+
+async def notify_rebuild() -> None:
+    """起動中の全インスタンスに再構築を指示する"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(select(func.pg_notify(REBUILD_CHANNEL, "")))
+        await db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="共有トークンの Bloom フィルタ")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild", help="起動中の全インスタンスにフィルタの再構築を指示する")
+    stats_parser = subparsers.add_parser("stats", help="DBの公開中トークンでフィルタを作り、サイズを表示する")
+    stats_parser.add_argument("--fp-rate", type=float, default=SHARE_TOKEN_FILTER_FP_RATE)
+    stats_parser.add_argument("--min-capacity", type=int, default=SHARE_TOKEN_FILTER_MIN_CAPACITY)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "rebuild":
+        asyncio.run(notify_rebuild())
+        logger.info(f"Sent NOTIFY {REBUILD_CHANNEL}")
+        return
+
+    token_filter = ShareTokenFilter(
+        enabled=True,
+        fp_rate=args.fp_rate,
+        min_capacity=args.min_capacity,
+        rebuild_interval=SHARE_TOKEN_FILTER_REBUILD_SECONDS,
+    )
+    asyncio.run(token_filter.rebuild())
+    logger.info(f"Share token filter: {token_filter.stats()}")
+
+
+if __name__ == "__main__":
+    main()
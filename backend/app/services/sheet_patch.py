@@ -0,0 +1,141 @@
+"""
+PATCH /api/characters/{id} のリクエストを解釈する
+
+- JSON Merge Patch（RFC 7396, application/merge-patch+json）
+- JSON Patch（RFC 6902, application/json-patch+json）
+
+sheet_data への変更は DB 関数（jsonb_merge_patch / jsonb_apply_patch）で適用するため、
+ここではトップレベル項目の変更・sheet_data 用の引数・変更された sheet_data のキーを取り出すだけ。
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from fastapi import HTTPException, status
+
+MERGE_PATCH_MEDIA_TYPE = "application/merge-patch+json"
+JSON_PATCH_MEDIA_TYPE = "application/json-patch+json"
+
+# sheet_data 以外で変更できる項目
+_PATCHABLE_FIELDS = {"name", "tags", "profile_image_url"}
+_JSON_PATCH_OPS = {"add", "remove", "replace", "move", "copy", "test"}
+# sheet_data 全体が置き換わる場合の変更キー
+ALL_SHEET_KEYS = "*"
+
+
+@dataclass
+class SheetPatch:
+    kind: str  # "merge" | "json"
+    fields: Dict[str, Any] = field(default_factory=dict)
+    # merge: sheet_data に当てるマージパッチ / json: パスを text[] にした操作の配列
+    sheet_patch: Optional[Any] = None
+    touched_keys: Set[str] = field(default_factory=set)
+
+    def touches(self, keys) -> bool:
+        return ALL_SHEET_KEYS in self.touched_keys or bool(self.touched_keys & set(keys))
+
+    @property
+    def is_noop(self) -> bool:
+        """何も変更しない（空のパッチ・test 操作のみ）"""
+        return not self.fields and not self.touched_keys
+
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def _validate_field(name: str, value: Any) -> Any:
+    if name == "name":
+        if not isinstance(value, str):
+            raise _bad_request("name must be a string")
+    elif name == "tags":
+        if not isinstance(value, list) or not all(isinstance(t, str) for t in value):
+            raise _bad_request("tags must be a list of strings")
+    elif name == "profile_image_url":
+        if value is not None and not isinstance(value, str):
+            raise _bad_request("profile_image_url must be a string or null")
+    return value
+
+
+def parse_merge_patch(body: Any) -> SheetPatch:
+    if not isinstance(body, dict):
+        raise _bad_request("Merge patch body must be a JSON object")
+
+    patch = SheetPatch(kind="merge")
+    for key, value in body.items():
+        if key == "sheet_data":
+            if value is None:
+                raise _bad_request("sheet_data cannot be removed")
+            if not isinstance(value, dict):
+                # オブジェクト以外はドキュメント全体の置き換え
+                raise _bad_request("sheet_data must be a JSON object")
+            patch.sheet_patch = value
+            patch.touched_keys = set(value.keys())
+        elif key in _PATCHABLE_FIELDS:
+            if value is None and key != "profile_image_url":
+                raise _bad_request(f"{key} cannot be removed")
+            patch.fields[key] = _validate_field(key, value)
+        else:
+            raise _bad_request(f"Field cannot be patched: {key}")
+    return patch
+
+
+def _parse_pointer(pointer: Any) -> List[str]:
+    """JSON Pointer（"/a/b~1c"）→ ["a", "b/c"]"""
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith("/")):
+        raise _bad_request(f"Invalid JSON Pointer: {pointer!r}")
+    if pointer == "":
+        return []
+    return [p.replace("~1", "/").replace("~0", "~") for p in pointer[1:].split("/")]
+
+
+def parse_json_patch(body: Any) -> SheetPatch:
+    if not isinstance(body, list):
+        raise _bad_request("JSON Patch body must be an array of operations")
+
+    patch = SheetPatch(kind="json")
+    sheet_ops: List[Dict[str, Any]] = []
+    for op in body:
+        if not isinstance(op, dict) or op.get("op") not in _JSON_PATCH_OPS:
+            raise _bad_request(f"Invalid JSON Patch operation: {op!r}")
+        kind = op["op"]
+        path = _parse_pointer(op.get("path"))
+        if kind in ("add", "replace", "test") and "value" not in op:
+            raise _bad_request(f"'{kind}' operation requires a value")
+
+        if path and path[0] == "sheet_data":
+            sheet_op: Dict[str, Any] = {"op": kind, "path": path[1:]}
+            if kind in ("move", "copy"):
+                from_path = _parse_pointer(op.get("from"))
+                if not from_path or from_path[0] != "sheet_data":
+                    raise _bad_request("'from' must point inside /sheet_data")
+                sheet_op["from"] = from_path[1:]
+                if kind == "move":
+                    patch.touched_keys.add(from_path[1] if len(from_path) > 1 else ALL_SHEET_KEYS)
+            else:
+                sheet_op["value"] = op.get("value")
+            if kind == "remove" and len(path) == 1:
+                raise _bad_request("sheet_data cannot be removed")
+            sheet_ops.append(sheet_op)
+            if kind != "test":
+                patch.touched_keys.add(path[1] if len(path) > 1 else ALL_SHEET_KEYS)
+        elif len(path) == 1 and path[0] in _PATCHABLE_FIELDS and kind in ("add", "replace", "remove"):
+            if kind == "remove":
+                if path[0] != "profile_image_url":
+                    raise _bad_request(f"{path[0]} cannot be removed")
+                patch.fields[path[0]] = None
+            else:
+                patch.fields[path[0]] = _validate_field(path[0], op["value"])
+        else:
+            raise _bad_request(f"Unsupported operation on {op.get('path')!r}")
+
+    if sheet_ops:
+        patch.sheet_patch = sheet_ops
+    return patch
+
+
+def parse_patch(content_type: Optional[str], body: Any) -> SheetPatch:
+    """Content-Type（無ければ本文の形）でパッチ形式を判定する"""
+    media_type = (content_type or "").split(";", 1)[0].strip().lower()
+    if media_type == JSON_PATCH_MEDIA_TYPE or (media_type != MERGE_PATCH_MEDIA_TYPE and isinstance(body, list)):
+        return parse_json_patch(body)
+    return parse_merge_patch(body)
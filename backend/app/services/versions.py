@@ -0,0 +1,291 @@
+"""
+キャラクターの変更履歴（差分圧縮）
+
+書き込みのたびに、name / tags / profile_image_url / sheet_data の状態を1バージョンとして残す。
+- 通常は直前のバージョンからの差分（add / remove / replace / move / copy / merge の操作リスト、path はキーの配列）
+  差分は書き込み前の状態（呼び出し側が読み込み済みのもの）との比較か、PATCH の操作そのもので作り、
+  直前のバージョンをDBから復元しない。直前のバージョン = 書き込み前の行、が前提（履歴に残すフィールドを
+  変える書き込みは必ず record_version を呼ぶこと）
+- VERSION_KEYFRAME_INTERVAL 件ごとに全体を持つキーフレーム
+- 復元はキーフレーム + 最大 VERSION_KEYFRAME_INTERVAL - 1 件の差分の適用で済む（履歴の長さに依らない）
+
+バージョンの採番は、キャラクター行を更新（行ロック）した後に同じトランザクションで行うこと。
+"""
+import copy
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Character, CharacterVersion
+from app.services.sheet_patch import SheetPatch
+
+VERSION_KEYFRAME_INTERVAL = int(os.getenv("VERSION_KEYFRAME_INTERVAL", "20"))
+
+# 履歴に残すフィールド
+VERSIONED_FIELDS = ("name", "tags", "profile_image_url", "sheet_data")
+
+_NOT_LOADED = object()
+
+
+@dataclass
+class LatestVersion:
+    version: int
+    keyframe_version: int
+
+
+def version_state(character: Character) -> Dict[str, Any]:
+    """Character → 履歴に残す状態"""
+    return {
+        "name": character.name,
+        "tags": list(character.tags or []),
+        "profile_image_url": character.profile_image_url,
+        "sheet_data": character.sheet_data or {},
+    }
+
+
+def _same(a: Any, b: Any) -> bool:
+    # 1 == 1.0 == True を区別する
+    return type(a) is type(b) and a == b
+
+
+def diff_documents(old: Any, new: Any, path: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+    """old → new の差分（操作リスト）"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: List[Dict[str, Any]] = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": [*path, key]})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": [*path, key], "value": value})
+            else:
+                ops.extend(diff_documents(old[key], value, (*path, key)))
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        ops = []
+        common = min(len(old), len(new))
+        for index in range(common):
+            ops.extend(diff_documents(old[index], new[index], (*path, index)))
+        for index in range(common, len(new)):
+            ops.append({"op": "add", "path": [*path, index], "value": new[index]})
+        # 後ろから消す（インデックスがずれないように）
+        for index in range(len(old) - 1, common - 1, -1):
+            ops.append({"op": "remove", "path": [*path, index]})
+        return ops
+    if _same(old, new):
+        return []
+    return [{"op": "replace", "path": list(path), "value": new}]
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    """RFC 7396 JSON Merge Patch（DB の jsonb_merge_patch と同じ）"""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def _child(parent: Any, key: Any) -> Any:
+    # JSON Patch 由来の path はリストの添字も文字列
+    return parent[int(key)] if isinstance(parent, list) else parent[key]
+
+
+def _resolve(document: Any, path: Sequence[Any]) -> Any:
+    for key in path:
+        document = _child(document, key)
+    return document
+
+
+def _remove(document: Any, path: Sequence[Any]) -> None:
+    parent = _resolve(document, path[:-1])
+    del parent[int(path[-1]) if isinstance(parent, list) else path[-1]]
+
+
+def apply_ops(document: Dict[str, Any], ops: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """差分を適用（document はその場で書き換える）"""
+    for op in ops:
+        kind = op["op"]
+        path = op["path"]
+        if kind == "test":
+            continue
+        if kind in ("move", "copy"):
+            value = copy.deepcopy(_resolve(document, op["from"]))
+            if kind == "move":
+                _remove(document, op["from"])
+            kind = "add"
+        else:
+            value = op.get("value")
+        if kind == "merge":
+            value = merge_patch(_resolve(document, path), value)
+            kind = "replace"
+        if not path:
+            document = value
+            continue
+        parent = _resolve(document, path[:-1])
+        last = path[-1]
+        if kind == "remove":
+            _remove(document, path)
+        elif isinstance(parent, list):
+            if kind == "add" and last == "-":
+                parent.append(value)
+            elif kind == "add":
+                parent.insert(int(last), value)
+            else:
+                parent[int(last)] = value
+        else:
+            parent[last] = value
+    return document
+
+
+def patch_ops(patch: SheetPatch, live_state_overlay: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    PATCH の内容 → 差分（DB で当てたのと同じ操作。書き込み前の状態を読まずに済む）
+
+    live_state_overlay: パッチの前に sheet_data に畳み込んだライブ状態（{"derived": {...}}）
+    """
+    ops: List[Dict[str, Any]] = [{"op": "replace", "path": [key], "value": value} for key, value in patch.fields.items()]
+    if live_state_overlay is not None:
+        ops.append({"op": "merge", "path": ["sheet_data"], "value": live_state_overlay})
+    if patch.sheet_patch is None:
+        return ops
+    if patch.kind == "merge":
+        ops.append({"op": "merge", "path": ["sheet_data"], "value": patch.sheet_patch})
+        return ops
+    for sheet_op in patch.sheet_patch:
+        if sheet_op["op"] == "test":
+            continue
+        op = {**sheet_op, "path": ["sheet_data", *sheet_op["path"]]}
+        if "from" in sheet_op:
+            op["from"] = ["sheet_data", *sheet_op["from"]]
+        ops.append(op)
+    return ops
+
+
+async def load_latest_versions(db: AsyncSession, character_ids: Iterable[uuid.UUID]) -> Dict[uuid.UUID, LatestVersion]:
+    """キャラクターごとの最新バージョン番号（1クエリ）"""
+    ids = list(character_ids)
+    if not ids:
+        return {}
+    result = await db.execute(
+        select(CharacterVersion.character_id, CharacterVersion.version, CharacterVersion.keyframe_version)
+        .where(CharacterVersion.character_id.in_(ids))
+        .order_by(CharacterVersion.character_id, CharacterVersion.version.desc())
+        .distinct(CharacterVersion.character_id)
+    )
+    return {row.character_id: LatestVersion(row.version, row.keyframe_version) for row in result}
+
+
+async def reconstruct_version(
+    db: AsyncSession,
+    character_id: uuid.UUID,
+    version: int,
+) -> Optional[Dict[str, Any]]:
+    """指定バージョンの状態を復元（キーフレームから順に差分を適用）。無ければ None。"""
+    keyframe_version = await db.scalar(
+        select(CharacterVersion.keyframe_version).where(
+            CharacterVersion.character_id == character_id,
+            CharacterVersion.version == version,
+        )
+    )
+    if keyframe_version is None:
+        return None
+    result = await db.execute(
+        select(CharacterVersion.version, CharacterVersion.data)
+        .where(
+            CharacterVersion.character_id == character_id,
+            CharacterVersion.version >= keyframe_version,
+            CharacterVersion.version <= version,
+        )
+        .order_by(CharacterVersion.version)
+    )
+    state: Optional[Dict[str, Any]] = None
+    for row in result:
+        state = row.data if row.version == keyframe_version else apply_ops(state, row.data)
+    return state
+
+
+def initial_version(character: Character, user_id: Optional[uuid.UUID]) -> CharacterVersion:
+    """新規作成時の最初のバージョン（キーフレーム）。セッションへの追加は呼び出し側で行う。"""
+    return CharacterVersion(
+        character_id=character.id,
+        version=1,
+        keyframe_version=1,
+        data=version_state(character),
+        user_id=user_id,
+    )
+
+
+async def _current_state(db: AsyncSession, character_id: uuid.UUID) -> Dict[str, Any]:
+    row = (
+        await db.execute(
+            select(Character.name, Character.tags, Character.profile_image_url, Character.sheet_data)
+            .where(Character.id == character_id)
+        )
+    ).one()
+    return {
+        "name": row.name,
+        "tags": list(row.tags or []),
+        "profile_image_url": row.profile_image_url,
+        "sheet_data": row.sheet_data or {},
+    }
+
+
+async def record_version(
+    db: AsyncSession,
+    character_id: uuid.UUID,
+    user_id: Optional[uuid.UUID],
+    state: Optional[Dict[str, Any]] = None,
+    ops: Optional[List[Dict[str, Any]]] = None,
+    latest: Any = _NOT_LOADED,
+    previous: Optional[Dict[str, Any]] = None,
+) -> Optional[CharacterVersion]:
+    """
+    書き込み後の状態を新しいバージョンとして追加する（変更が無ければ追加しない）
+
+    Args:
+        state: 書き込み後の状態（未指定なら characters から読む）
+        ops: 直前のバージョンからの差分が分かっている場合に渡す（PATCH の操作など）
+        latest: load_latest_versions で取得済みの最新バージョン（履歴が無ければ None）
+        previous: 書き込み前の状態（version_state）。state との比較を差分にする
+    """
+    if latest is _NOT_LOADED:
+        latest = (await load_latest_versions(db, [character_id])).get(character_id)
+
+    needs_keyframe = latest is None or latest.version + 1 - latest.keyframe_version >= VERSION_KEYFRAME_INTERVAL
+    if ops is None and previous is not None:
+        if state is None:
+            state = await _current_state(db, character_id)
+        ops = diff_documents(previous, state)
+    if ops is None and not needs_keyframe:
+        # 書き込み前の状態が無い場合だけ、直前のバージョンを復元して比べる
+        if state is None:
+            state = await _current_state(db, character_id)
+        previous = await reconstruct_version(db, character_id, latest.version)
+        ops = diff_documents(previous, state)
+    if ops is not None and not ops:
+        return None
+
+    version = latest.version + 1 if latest is not None else 1
+    if needs_keyframe:
+        if state is None:
+            state = await _current_state(db, character_id)
+        row = CharacterVersion(character_id=character_id, version=version, keyframe_version=version, data=state)
+    else:
+        row = CharacterVersion(
+            character_id=character_id,
+            version=version,
+            keyframe_version=latest.keyframe_version,
+            data=ops,
+        )
+    row.user_id = user_id
+    db.add(row)
+    return row
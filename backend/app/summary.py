@@ -0,0 +1,62 @@
+"""
+一覧表示用のキャラクター概要（sheet_data から書き込み時に抽出して characters.summary に保持）
+
+PATCH では同じ内容の SQL 関数 character_summary(system, sheet_data) で UPDATE 文の中で計算する
+（alembic c9e1f3a5b7d0）。抽出ルールを変えるときは両方を揃える。
+"""
+from typing import Dict, Any, Optional
+
+from app.models import SystemEnum
+
+
+# build_character_summary が参照する sheet_data のキー
+SUMMARY_SHEET_KEYS = ("occupation", "derived", "school", "hp", "race", "attributes")
+
+
+def _to_optional_int(value: Any) -> Optional[int]:
+    try:
+        if value is None or value == "":
+            return None
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_optional_str(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def build_character_summary(system: SystemEnum, sheet_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    一覧画面で使う小さな概要を生成する
+
+    Returns:
+        {"occupation": str|None, "hp_max": int|None, "san_max": int|None, "mp_max": int|None}
+    """
+    summary: Dict[str, Any] = {"occupation": None, "hp_max": None, "san_max": None, "mp_max": None}
+    if not isinstance(sheet_data, dict):
+        return summary
+
+    if system in (SystemEnum.cthulhu6, SystemEnum.cthulhu7):
+        derived = sheet_data.get("derived") or {}
+        if not isinstance(derived, dict):
+            derived = {}
+        summary["occupation"] = _to_optional_str(sheet_data.get("occupation"))
+        summary["hp_max"] = _to_optional_int(derived.get("HP_max"))
+        summary["san_max"] = _to_optional_int(derived.get("SAN_max"))
+        summary["mp_max"] = _to_optional_int(derived.get("MP_max"))
+    elif system == SystemEnum.shinobigami:
+        summary["occupation"] = _to_optional_str(sheet_data.get("school"))
+        summary["hp_max"] = _to_optional_int(sheet_data.get("hp"))
+    elif system == SystemEnum.sw25:
+        attrs = sheet_data.get("attributes") or {}
+        if not isinstance(attrs, dict):
+            attrs = {}
+        summary["occupation"] = _to_optional_str(sheet_data.get("race"))
+        summary["hp_max"] = _to_optional_int(attrs.get("HP"))
+        summary["mp_max"] = _to_optional_int(attrs.get("MP"))
+
+    return summary
@@ -7,6 +7,19 @@ from typing import Dict, Any, List
 from app.models import SystemEnum
 
 
+# validate_cthulhu_skill_points が参照する sheet_data のキー
+CTHULHU_SKILL_POINT_KEYS = (
+    "attributes",
+    "skills",
+    "combatSkills",
+    "customSkills",
+    "jobPointsRule",
+    "job_points_rule",
+    "jobPointsManualLimit",
+    "job_points_manual_limit",
+)
+
+
 def _to_int(value: Any, default: int = 0) -> int:
     try:
         if value is None:
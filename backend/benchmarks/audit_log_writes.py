@@ -0,0 +1,117 @@
+"""
+監査ログの書き込み方式ごとのスループット（AUDIT_LOG_MODE=transaction / batched）
+
+マイグレーション済みの PostgreSQL（DATABASE_URL）に、ベンチマーク用のユーザーとキャラクターを作り、
+「キャラクターの UPDATE + 監査ログ + コミット」を並行に繰り返して 1 秒あたりの件数を測る。
+batched は stop() でキューを書き切るまでを含める。作ったデータは最後に消す。
+
+    DATABASE_URL=postgresql://... python -m benchmarks.audit_log_writes --requests 5000 --concurrency 20
+
+--pipeline-only は DB を使わず、ライターのキューとバッチ分割だけの処理量を測る。
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import delete, update
+
+from app.database import AsyncSessionLocal
+from app.models import ActionEnum, AuditLog, Character, SystemEnum, User
+from app.services import audit
+
+
+async def _setup() -> tuple:
+    user_id, character_id = uuid.uuid4(), uuid.uuid4()
+    async with AsyncSessionLocal() as db:
+        db.add(User(id=user_id, email=f"bench-{user_id}@example.com", display_name="bench"))
+        await db.flush()
+        db.add(Character(id=character_id, user_id=user_id, system=SystemEnum.cthulhu6, name="bench"))
+        await db.commit()
+    return user_id, character_id
+
+
+async def _teardown(user_id: uuid.UUID) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(AuditLog).where(AuditLog.user_id == user_id))
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.commit()
+
+
+async def _one_request(user_id: uuid.UUID, character_id: uuid.UUID) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Character).where(Character.id == character_id).values(updated_at=datetime.utcnow())
+        )
+        audit.create_audit_log(db, user_id, character_id, ActionEnum.update, {"bench": True})
+        await db.commit()
+
+
+async def _run_requests(requests: int, concurrency: int, user_id, character_id) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def worker():
+        async with semaphore:
+            await _one_request(user_id, character_id)
+
+    await asyncio.gather(*(worker() for _ in range(requests)))
+
+
+async def bench_database(requests: int, concurrency: int) -> None:
+    user_id, character_id = await _setup()
+    try:
+        for mode in ("transaction", "batched"):
+            audit.AUDIT_LOG_MODE = mode
+            writer = audit.audit_log_writer
+            if mode == "batched":
+                writer.start()
+            started = time.perf_counter()
+            await _run_requests(requests, concurrency, user_id, character_id)
+            requests_done = time.perf_counter() - started
+            if mode == "batched":
+                await writer.stop()
+            total = time.perf_counter() - started
+            print(
+                f"{mode:12s} requests/s={requests / requests_done:8.0f}  "
+                f"(including audit flush: {requests / total:8.0f}/s, {total:.2f}s)"
+            )
+    finally:
+        await _teardown(user_id)
+
+
+class _NoopWriter(audit.AuditLogBatchWriter):
+    async def _write(self, batch: List[dict]) -> None:
+        pass
+
+
+async def bench_pipeline(rows: int, batch_size: int) -> None:
+    writer = _NoopWriter(max_queue=rows, batch_size=batch_size, flush_interval=1.0)
+    writer.start()
+    row = {"id": None, "action": ActionEnum.update, "character_id": None}
+    started = time.perf_counter()
+    for _ in range(rows // 100):
+        writer.submit([row] * 100)
+        await asyncio.sleep(0)
+    await writer.stop()
+    elapsed = time.perf_counter() - started
+    print(f"pipeline     rows/s={rows / elapsed:10.0f}  (batch_size={batch_size}, {elapsed:.2f}s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--pipeline-only", action="store_true")
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    if args.pipeline_only:
+        asyncio.run(bench_pipeline(args.rows, audit.audit_log_writer.batch_size))
+    else:
+        asyncio.run(bench_database(args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
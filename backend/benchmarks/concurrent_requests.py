@@ -0,0 +1,93 @@
+"""
+同時リクエストのスループット（同期セッション / 非同期セッション）
+
+async def のハンドラから DB を読む処理を --concurrency 本ずつ同時に --requests 回実行し、1秒あたりの件数と
+レイテンシを比べる。1件は「SELECT pg_sleep(--query-ms) + キャラクター一覧の1ページ」。
+
+- sync: 同期の SessionLocal をイベントループ上でそのまま呼ぶ（非同期化の前のハンドラと同じ。1件ずつ直列になる）
+- async: AsyncSessionLocal（asyncpg）で await する（現在のハンドラと同じ）
+
+マイグレーション済みの PostgreSQL（DATABASE_URL）が必要。データは書き込まない。
+同時実行数は DB_POOL_SIZE + DB_MAX_OVERFLOW 以下にすること（超えた分はプール待ちになる）。
+
+    DATABASE_URL=postgresql://... python -m benchmarks.concurrent_requests --requests 2000 --concurrency 15
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+from sqlalchemy import func, select, text
+
+from app.database import AsyncSessionLocal, SessionLocal, async_engine, engine
+from app.models import Character
+
+
+def _statements(query_ms: float):
+    return (
+        text("SELECT pg_sleep(:seconds)").bindparams(seconds=query_ms / 1000),
+        select(Character.id, Character.name).order_by(Character.updated_at.desc()).limit(20),
+    )
+
+
+async def _sync_request(query_ms: float) -> None:
+    sleep, page = _statements(query_ms)
+    with SessionLocal() as db:
+        db.execute(sleep)
+        db.execute(page).all()
+
+
+async def _async_request(query_ms: float) -> None:
+    sleep, page = _statements(query_ms)
+    async with AsyncSessionLocal() as db:
+        await db.execute(sleep)
+        (await db.execute(page)).all()
+
+
+async def _run(request: Callable[[float], Awaitable[None]], requests: int, concurrency: int, query_ms: float) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await request(query_ms)
+            latencies.append(time.perf_counter() - started)
+
+    # 接続を作っておく（プールの確立を測らない）
+    await asyncio.gather(*(one() for _ in range(concurrency)))
+    latencies.clear()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{request.__name__[1:]:14s} requests/s={requests / elapsed:8.0f}  p50={p50:7.1f}ms  p99={p99:7.1f}ms")
+
+
+async def bench(requests: int, concurrency: int, query_ms: float) -> None:
+    async with AsyncSessionLocal() as db:
+        characters = await db.scalar(select(func.count()).select_from(Character))
+    print(f"characters={characters} concurrency={concurrency} query={query_ms}ms")
+    try:
+        await _run(_sync_request, requests, concurrency, query_ms)
+        await _run(_async_request, requests, concurrency, query_ms)
+    finally:
+        await async_engine.dispose()
+        engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=15)
+    parser.add_argument("--query-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(bench(args.requests, args.concurrency, args.query_ms))
+
+
+if __name__ == "__main__":
+    main()
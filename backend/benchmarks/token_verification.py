@@ -0,0 +1,77 @@
+"""
+認証1回あたりのトークン検証のコスト（検証済みトークンのキャッシュあり・なし）
+
+一時的に作った RSA 鍵で RS256 のトークンを発行し、JWKS の取得は行わずに鍵ストアへ直接載せて
+verify_token を繰り返す。
+
+- miss: 毎回キャッシュを空にする（RS256 の署名検証とクレームの検証）
+- hit: 同じトークンを繰り返す（SPA が期限まで同じトークンを送る場合）
+
+    python -m benchmarks.token_verification --count 5000
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+# app.auth はインポート時に設定を読む
+os.environ.setdefault("AUTH0_DOMAIN", "bench.example.com")
+os.environ.setdefault("AUTH0_AUDIENCE", "https://api.bench.example.com")
+
+from jose import jwt  # noqa: E402
+
+from app import auth  # noqa: E402
+
+KID = "bench"
+
+
+def _issue_token(key) -> str:
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    now = int(time.time())
+    claims = {
+        "sub": "auth0|bench",
+        "aud": auth.AUTH0_AUDIENCE,
+        "iss": f"https://{auth.AUTH0_DOMAIN}/",
+        "iat": now,
+        "exp": now + 3600,
+        "email": "bench@example.com",
+    }
+    return jwt.encode(claims, pem, algorithm="RS256", headers={"kid": KID})
+
+
+async def _measure(token: str, count: int, clear: bool) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        if clear:
+            auth.verified_token_cache.clear()
+        await auth.verify_token(token)
+    return (time.perf_counter() - started) / count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=5000)
+    args = parser.parse_args()
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    # JWKS を取りに行かないよう、公開鍵を直接載せる
+    auth.jwks_key_store._keys = {KID: key.public_key()}
+    auth.jwks_key_store._fetched_at = time.monotonic()
+    token = _issue_token(key)
+
+    miss = asyncio.run(_measure(token, max(1, args.count // 10), clear=True))
+    hit = asyncio.run(_measure(token, args.count, clear=False))
+    print(f"miss  {miss * 1e6:9.1f} us/request  ({1 / miss:9.0f} requests/s)")
+    print(f"hit   {hit * 1e6:9.1f} us/request  ({1 / hit:9.0f} requests/s)")
+    print(f"saved {(miss - hit) * 1e6:9.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+GCS V4 署名付きURLの生成速度（1秒あたりの署名数）
+
+一時的に作ったサービスアカウント鍵で、次を比べる（ネットワーク・GCS は使わない）。
+
+- per-call: 署名のたびに ADC を解決して Storage クライアントを作る（ローカル署名器を入れる前の経路）
+- library: google-cloud-storage の blob.generate_signed_url（鍵の読み込み済みのクレデンシャル）
+- local: app.services.gcs_signer.LocalV4Signer（プロセス内の RSA-SHA256 署名）
+- page: maybe_sign_read_urls で一覧1ページ分（--page-size 件、キャッシュなし）をスレッドプールで署名
+
+    python -m benchmarks.url_signing --count 2000 --page-size 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+BUCKET = "bench-bucket"
+EXPIRES = timedelta(minutes=15)
+
+
+def _service_account_info() -> dict:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode("ascii")
+    return {
+        "type": "service_account",
+        "project_id": "bench",
+        "private_key_id": "bench",
+        "private_key": pem,
+        "client_email": "bench@bench.iam.gserviceaccount.com",
+        "client_id": "0",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }
+
+
+def _report(name: str, count: int, elapsed: float) -> None:
+    print(f"{name:8s} signatures/s={count / elapsed:9.0f}  ({elapsed * 1000 / count:.3f} ms/signature)")
+
+
+def bench_per_call(count: int) -> None:
+    from google.cloud import storage
+
+    from app.services.gcs import normalize_google_application_credentials_env
+
+    started = time.perf_counter()
+    for i in range(count):
+        normalize_google_application_credentials_env()
+        client = storage.Client()
+        client.bucket(BUCKET).blob(f"characters/{i}.png").generate_signed_url(
+            version="v4", expiration=EXPIRES, method="GET"
+        )
+    _report("per-call", count, time.perf_counter() - started)
+
+
+def bench_library(info: dict, count: int) -> None:
+    from google.cloud import storage
+    from google.oauth2 import service_account
+
+    credentials = service_account.Credentials.from_service_account_info(info)
+    client = storage.Client(project="bench", credentials=credentials)
+    bucket = client.bucket(BUCKET)
+    started = time.perf_counter()
+    for i in range(count):
+        bucket.blob(f"characters/{i}.png").generate_signed_url(version="v4", expiration=EXPIRES, method="GET")
+    _report("library", count, time.perf_counter() - started)
+
+
+def bench_local(info: dict, count: int) -> None:
+    from app.services.gcs_signer import LocalV4Signer
+
+    signer = LocalV4Signer(info["client_email"], info["private_key"])
+    started = time.perf_counter()
+    for i in range(count):
+        signer.sign_url(BUCKET, f"characters/{i}.png", EXPIRES)
+    _report("local", count, time.perf_counter() - started)
+
+
+def bench_page(count: int, page_size: int) -> None:
+    from app.services.gcs import maybe_sign_read_urls, signed_url_cache
+
+    async def run() -> None:
+        pages = max(1, count // page_size)
+        started = time.perf_counter()
+        for page in range(pages):
+            signed_url_cache.clear()
+            urls = [
+                f"https://storage.googleapis.com/{BUCKET}/characters/{page}-{i}.png" for i in range(page_size)
+            ]
+            await maybe_sign_read_urls(urls)
+        elapsed = time.perf_counter() - started
+        _report("page", pages * page_size, elapsed)
+        print(f"         {elapsed * 1000 / pages:.2f} ms/page of {page_size}")
+
+    asyncio.run(run())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+
+    info = _service_account_info()
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(info, f)
+    # get_local_signer() が読む鍵（ローカル署名の経路を通す）
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = f.name
+    try:
+        bench_per_call(max(1, args.count // 10))
+        bench_library(info, args.count)
+        bench_local(info, args.count)
+        bench_page(args.count, args.page_size)
+    finally:
+        os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+監査ログのバッチライター（app.services.audit.AuditLogBatchWriter）のテスト
+
+DB には書かず、_write を差し替えて書き込まれたバッチを記録する。
+"""
+import asyncio
+from typing import List
+
+from app.services.audit import AuditLogBatchWriter
+
+
+class RecordingWriter(AuditLogBatchWriter):
+    def __init__(self, write_delay: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.write_delay = write_delay
+        self.written: List[List[dict]] = []
+
+    async def _write(self, batch: List[dict]) -> None:
+        if self.write_delay:
+            await asyncio.sleep(self.write_delay)
+        self.written.append(list(batch))
+
+
+def _rows(start: int, count: int) -> List[dict]:
+    return [{"id": i, "action": "update", "character_id": None} for i in range(start, start + count)]
+
+
+def _written_ids(writer: RecordingWriter) -> List[int]:
+    return [row["id"] for batch in writer.written for row in batch]
+
+
+def test_flushes_by_batch_size_and_interval():
+    async def run():
+        writer = RecordingWriter(max_queue=100, batch_size=3, flush_interval=0.05)
+        writer.start()
+        writer.submit(_rows(0, 4))
+        await asyncio.sleep(0.2)
+
+        # 3件で1回、残りの1件は flush_interval 経過で1回
+        assert [len(batch) for batch in writer.written] == [3, 1]
+        await writer.stop()
+
+    asyncio.run(run())
+
+
+def test_stop_finishes_in_flight_flush_and_drains_queue():
+    async def run():
+        writer = RecordingWriter(write_delay=0.05, max_queue=100, batch_size=2, flush_interval=0.01)
+        writer.start()
+        writer.submit(_rows(0, 2))
+        # 最初のバッチを書き込み中に、続きを積んで止める
+        await asyncio.sleep(0.01)
+        writer.submit(_rows(2, 5))
+        await writer.stop()
+
+        assert _written_ids(writer) == list(range(7))
+        assert all(len(batch) <= 2 for batch in writer.written)
+        assert not writer.running
+
+    asyncio.run(run())
+
+
+def test_stop_without_rows():
+    async def run():
+        writer = RecordingWriter(max_queue=10, batch_size=2, flush_interval=0.01)
+        writer.start()
+        await writer.stop()
+        assert writer.written == []
+        # 2回目の stop は何もしない
+        await writer.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,163 @@
+"""
+2段キャッシュ（app.services.cache_tier）のテスト
+
+共有層は InMemorySharedStore（CACHE_REDIS_URL=memory:// と同じもの）を複数の CacheTier で共有し、
+複数インスタンスを模擬する。
+"""
+import asyncio
+from typing import Any
+
+from app.services.cache import TTLCache
+from app.services.cache_tier import CacheTier, TwoLevelCache
+from app.services.cache_tier.memory import InMemorySharedStore
+
+
+def _tier(store) -> CacheTier:
+    return CacheTier(store, key_prefix="test:", timeout_seconds=0.05, retry_seconds=5)
+
+
+def _cache(tier: CacheTier) -> TwoLevelCache:
+    # 値は (グループ, 本文) のタプル
+    return TwoLevelCache(
+        tier,
+        "item",
+        TTLCache(16),
+        encode=lambda value: f"{value[0]}\n{value[1]}".encode("utf-8"),
+        decode=lambda data: tuple(data.decode("utf-8").split("\n", 1)),
+        group_of=lambda value: value[0],
+    )
+
+
+async def _settle(*tiers: CacheTier) -> None:
+    """バックグラウンドの書き込み・購読の配送を待つ"""
+    for tier in tiers:
+        if tier._background:
+            await asyncio.gather(*tier._background)
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class FailingStore(InMemorySharedStore):
+    async def lookup(self, key):
+        raise ConnectionError("down")
+
+    async def get_many(self, keys):
+        raise ConnectionError("down")
+
+    async def put(self, *args: Any, **kwargs: Any) -> bool:
+        raise ConnectionError("down")
+
+    async def invalidate_group(self, *args: Any) -> None:
+        raise ConnectionError("down")
+
+
+class SlowStore(InMemorySharedStore):
+    async def lookup(self, key):
+        await asyncio.sleep(1)
+        return await super().lookup(key)
+
+
+def test_shared_hit_across_instances():
+    async def run():
+        store = InMemorySharedStore()
+        a, b = _cache(_tier(store)), _cache(_tier(store))
+
+        _, read_token = await a.lookup("k")
+        assert await a.put("k", ("g", "v1"), 60, read_token)
+
+        value, _ = await b.lookup("k")
+        assert value == ("g", "v1")
+        # 共有層から読んだ値はプロセス内にも載る
+        assert b.get_local("k") == ("g", "v1")
+
+    asyncio.run(run())
+
+
+def test_invalidation_evicts_other_instances_via_pubsub():
+    async def run():
+        store = InMemorySharedStore()
+        tier_a, tier_b = _tier(store), _tier(store)
+        a, b = _cache(tier_a), _cache(tier_b)
+        tier_a.start()
+        tier_b.start()
+        await _settle(tier_a, tier_b)
+
+        _, read_token = await a.lookup("k")
+        await a.put("k", ("g", "v1"), 60, read_token)
+        assert (await b.lookup("k"))[0] == ("g", "v1")
+
+        a.invalidate_group("g")
+        await _settle(tier_a, tier_b)
+
+        assert a.get_local("k") is None
+        assert b.get_local("k") is None
+        assert (await b.lookup("k"))[0] is None
+
+        await tier_a.stop()
+        await tier_b.stop()
+
+    asyncio.run(run())
+
+
+def test_put_after_invalidation_is_rejected():
+    async def run():
+        store = InMemorySharedStore()
+        tier_a, tier_b = _tier(store), _tier(store)
+        a, b = _cache(tier_a), _cache(tier_b)
+
+        # b が読み込んでいる間に a で無効化された
+        _, read_token = await b.lookup("k")
+        a.invalidate_group("g")
+        await _settle(tier_a)
+
+        assert not await b.put("k", ("g", "stale"), 60, read_token)
+        assert b.get_local("k") is None
+        assert (await a.lookup("k"))[0] is None
+
+        # 同じインスタンス内の無効化でも同様
+        _, read_token = await a.lookup("k")
+        a.invalidate_group("g")
+        assert not await a.put("k", ("g", "stale"), 60, read_token)
+
+        # 無効化の後に読み始めたものは保存できる（共有層の時刻はミリ秒単位で、同じミリ秒は拒否する）
+        await _settle(tier_a)
+        await asyncio.sleep(0.005)
+        _, read_token = await b.lookup("k")
+        assert await b.put("k", ("g", "fresh"), 60, read_token)
+        assert (await a.lookup("k"))[0] == ("g", "fresh")
+
+    asyncio.run(run())
+
+
+def test_falls_back_to_local_cache_when_store_fails():
+    async def run():
+        tier = _tier(FailingStore())
+        cache = _cache(tier)
+
+        value, read_token = await cache.lookup("k")
+        assert value is None
+        assert read_token.shared_ms is None
+        assert tier.stats()["degraded"]
+        assert not tier.available
+
+        assert await cache.put("k", ("g", "v1"), 60, read_token)
+        assert (await cache.lookup("k"))[0] == ("g", "v1")
+        assert await cache.get_many(["k", "other"]) == [("g", "v1"), None]
+
+        cache.invalidate_group("g")
+        await _settle(tier)
+        assert cache.get_local("k") is None
+
+    asyncio.run(run())
+
+
+def test_slow_store_times_out():
+    async def run():
+        tier = CacheTier(SlowStore(), key_prefix="test:", timeout_seconds=0.01, retry_seconds=5)
+        cache = _cache(tier)
+
+        value, _ = await asyncio.wait_for(cache.lookup("k"), 0.5)
+        assert value is None
+        assert tier.stats()["degraded"]
+
+    asyncio.run(run())
@@ -0,0 +1,86 @@
+"""
+NDJSON インポート（app.routers.export.import_ndjson）のテスト
+
+DB には書かず、コミットされた行を記録するセッションを渡す。
+"""
+import asyncio
+import json
+import uuid
+from typing import List
+
+import pytest
+from fastapi import HTTPException
+
+from app.models import Character
+from app.routers import export
+
+
+class RecordingSession:
+    """add / commit だけを受け付け、コミットされたキャラクターを記録する"""
+
+    def __init__(self):
+        self.pending: list = []
+        self.committed: List[Character] = []
+
+    def add(self, obj) -> None:
+        self.pending.append(obj)
+
+    def add_all(self, objs) -> None:
+        self.pending.extend(objs)
+
+    async def commit(self) -> None:
+        self.committed.extend(obj for obj in self.pending if isinstance(obj, Character))
+        self.pending = []
+
+    def expunge_all(self) -> None:
+        pass
+
+
+class StreamRequest:
+    def __init__(self, chunks: List[bytes]):
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+class CurrentUser:
+    id = uuid.uuid4()
+
+
+def _line(name: str) -> bytes:
+    return json.dumps({"system": "shinobigami", "name": name, "sheet_data": {"school": "x"}}).encode("utf-8") + b"\n"
+
+
+def _import(chunks: List[bytes], db: RecordingSession):
+    return asyncio.run(export.import_ndjson(StreamRequest(chunks), CurrentUser(), db))
+
+
+def test_imports_in_batches_and_reports_failed_lines(monkeypatch):
+    monkeypatch.setattr(export, "IMPORT_BATCH_SIZE", 2)
+    db = RecordingSession()
+    result = _import([_line("a") + b"not json\n" + _line("b"), _line("c"), b"\n"], db)
+
+    assert result.imported == 3
+    assert result.failed == 1
+    assert [error.line for error in result.errors] == [2]
+    assert [character.name for character in db.committed] == ["a", "b", "c"]
+
+
+def test_too_long_line_reports_committed_progress(monkeypatch):
+    monkeypatch.setattr(export, "IMPORT_BATCH_SIZE", 2)
+    monkeypatch.setattr(export, "IMPORT_MAX_LINE_BYTES", 200)
+    db = RecordingSession()
+    chunks = [_line("a") + b"not json\n" + _line("b") + _line("c"), b"x" * 300]
+
+    with pytest.raises(HTTPException) as raised:
+        _import(chunks, db)
+
+    assert raised.value.status_code == 413
+    detail = raised.value.detail
+    # a, b はコミット済み（3行目まで）。c はコミット前に中断した
+    assert detail["imported"] == 2
+    assert detail["committed_through_line"] == 3
+    assert [error["line"] for error in detail["errors"]] == [2]
+    assert [character.name for character in db.committed] == ["a", "b"]
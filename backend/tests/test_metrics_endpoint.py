@@ -0,0 +1,34 @@
+"""
+/metrics の認証（METRICS_TOKEN）のテスト
+"""
+import asyncio
+
+import httpx
+
+from app import main
+
+
+def _get_metrics(headers=None) -> httpx.Response:
+    async def request():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/metrics", headers=headers)
+
+    return asyncio.run(request())
+
+
+def test_metrics_disabled_without_token(monkeypatch):
+    monkeypatch.setattr(main, "METRICS_TOKEN", "")
+    assert _get_metrics().status_code == 404
+    assert _get_metrics({"Authorization": "Bearer "}).status_code == 404
+
+
+def test_metrics_requires_bearer_token(monkeypatch):
+    monkeypatch.setattr(main, "METRICS_TOKEN", "s3cret")
+    assert _get_metrics().status_code == 401
+    assert _get_metrics({"Authorization": "Bearer wrong"}).status_code == 401
+    assert _get_metrics({"Authorization": "Basic s3cret"}).status_code == 401
+
+    response = _get_metrics({"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert "ratios" in response.json()
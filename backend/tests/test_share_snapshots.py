@@ -0,0 +1,62 @@
+"""
+公開閲覧のスナップショットの確認済み状態（app.services.share_snapshots.ShareSnapshotPublisher）のテスト
+
+保存先・DB は使わない（確認済みの管理だけを見る）。
+"""
+import uuid
+from datetime import datetime
+
+from app.services.change_events import ChangeEvent
+from app.services.share_snapshots import ShareSnapshotPublisher
+
+
+def _event(character_id: uuid.UUID) -> ChangeEvent:
+    return ChangeEvent(
+        id=1,
+        character_id=character_id,
+        op="live",
+        is_public=None,
+        share_token=None,
+        previous_share_token=None,
+        created_at=datetime.utcnow(),
+    )
+
+
+def test_verified_until_change_event():
+    publisher = ShareSnapshotPublisher(store=None, verify_ttl=60)
+    character_id = uuid.uuid4()
+    assert not publisher.is_verified(character_id)
+
+    publisher.mark_verified(character_id, publisher.generation)
+    assert publisher.is_verified(character_id)
+
+    # 他インスタンスでの変更
+    publisher.apply_change(_event(character_id))
+    assert not publisher.is_verified(character_id)
+
+
+def test_verification_overlapping_a_change_is_not_trusted():
+    publisher = ShareSnapshotPublisher(store=None, verify_ttl=60)
+    character_id = uuid.uuid4()
+
+    # DB と確かめている間に変更イベントが届いた
+    generation = publisher.generation
+    publisher.apply_change(_event(character_id))
+    publisher.mark_verified(character_id, generation)
+    assert not publisher.is_verified(character_id)
+
+
+def test_verification_expires():
+    publisher = ShareSnapshotPublisher(store=None, verify_ttl=0)
+    character_id = uuid.uuid4()
+    publisher.mark_verified(character_id, publisher.generation)
+    assert not publisher.is_verified(character_id)
+
+
+def test_clear_verified_on_relay_reset():
+    publisher = ShareSnapshotPublisher(store=None, verify_ttl=60)
+    ids = [uuid.uuid4(), uuid.uuid4()]
+    for character_id in ids:
+        publisher.mark_verified(character_id, publisher.generation)
+    publisher.clear_verified()
+    assert not any(publisher.is_verified(character_id) for character_id in ids)
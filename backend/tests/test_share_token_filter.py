@@ -0,0 +1,98 @@
+"""
+共有トークンのフィルタ（app.services.share_token_filter）のテスト
+
+DB は読まず、load_share_tokens を差し替える。
+"""
+import asyncio
+import uuid
+from datetime import datetime
+
+from app.services import share_token_filter as module
+from app.services.change_events import ChangeEvent, ChangeEventRelay
+from app.services.share_token_filter import REBUILD_CHANNEL, BloomFilter, ShareTokenFilter, build_filter
+
+
+def _filter(rebuild_interval: float = 3600) -> ShareTokenFilter:
+    return ShareTokenFilter(enabled=True, fp_rate=0.001, min_capacity=100, rebuild_interval=rebuild_interval)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    tokens = [f"token-{i}" for i in range(1000)]
+    bloom = build_filter(tokens, 0.001, 100)
+    assert all(token in bloom for token in tokens)
+    assert bloom.count == 1000
+    assert isinstance(bloom, BloomFilter)
+
+
+def test_request_rebuild_wakes_the_background_task(monkeypatch):
+    async def run():
+        tokens = ["a"]
+        loads = []
+
+        async def load():
+            loads.append(1)
+            return list(tokens)
+
+        monkeypatch.setattr(module, "load_share_tokens", load)
+        token_filter = _filter()
+        assert token_filter.might_contain("b")
+
+        token_filter.start()
+        for _ in range(100):
+            if token_filter.ready:
+                break
+            await asyncio.sleep(0.01)
+        assert token_filter.might_contain("a")
+        assert not token_filter.might_contain("b")
+
+        tokens.append("b")
+        token_filter.request_rebuild()
+        for _ in range(100):
+            if len(loads) == 2 and token_filter.might_contain("b"):
+                break
+            await asyncio.sleep(0.01)
+        assert len(loads) == 2
+        assert token_filter.might_contain("b")
+        await token_filter.stop()
+
+    asyncio.run(run())
+
+
+def test_publish_event_and_recent_adds_survive_rebuild(monkeypatch):
+    async def run():
+        async def load():
+            return []
+
+        monkeypatch.setattr(module, "load_share_tokens", load)
+        token_filter = _filter()
+        await token_filter.rebuild()
+
+        token_filter.apply_change(
+            ChangeEvent(
+                id=1,
+                character_id=uuid.uuid4(),
+                op="update",
+                is_public=True,
+                share_token="published",
+                previous_share_token=None,
+                created_at=datetime.utcnow(),
+            )
+        )
+        assert token_filter.might_contain("published")
+        # DB にまだ見えていなくても、直近に載せたものは作り直した後も残る
+        await token_filter.rebuild()
+        assert token_filter.might_contain("published")
+
+    asyncio.run(run())
+
+
+def test_rebuild_notify_on_relay_connection_requests_rebuild():
+    token_filter = _filter()
+    relay = ChangeEventRelay(
+        enabled=True, poll_interval=5, gap_timeout=60, reconnect_interval=5, retention_minutes=60
+    )
+    relay.listen(REBUILD_CHANNEL, token_filter.request_rebuild)
+
+    # asyncpg の add_listener に渡すコールバックと同じ引数
+    relay._on_channel_notify(None, 1234, REBUILD_CHANNEL, "")
+    assert token_filter._rebuild_requested.is_set()
@@ -0,0 +1,77 @@
+"""
+変更履歴の差分（app.services.versions）のテスト
+
+差分は書き込み前の状態との比較（diff_documents）か PATCH の操作（patch_ops）で作り、
+復元時に apply_ops で当てて書き込み後の状態に戻ること。
+"""
+import copy
+
+from app.services.sheet_patch import parse_json_patch, parse_merge_patch
+from app.services.versions import apply_ops, diff_documents, patch_ops
+
+
+def _state(**sheet) -> dict:
+    return {
+        "name": "探索者",
+        "tags": ["a"],
+        "profile_image_url": None,
+        "sheet_data": {"occupation": "医師", "skills": [{"name": "応急手当", "value": 50}], **sheet},
+    }
+
+
+def test_diff_round_trip():
+    old = _state(derived={"HP_max": 10})
+    new = copy.deepcopy(old)
+    new["name"] = "別名"
+    new["sheet_data"]["skills"].append({"name": "医学", "value": 60})
+    del new["sheet_data"]["derived"]
+
+    ops = diff_documents(old, new)
+    assert apply_ops(copy.deepcopy(old), ops) == new
+    assert diff_documents(new, copy.deepcopy(new)) == []
+
+
+def test_merge_patch_ops_replay_the_patch():
+    old = _state(derived={"HP_max": 10, "MP_max": 8})
+    patch = parse_merge_patch(
+        {"name": "別名", "sheet_data": {"occupation": None, "derived": {"HP_max": 12}, "memo": "x"}}
+    )
+
+    replayed = apply_ops(copy.deepcopy(old), patch_ops(patch))
+    assert replayed["name"] == "別名"
+    assert replayed["sheet_data"] == {
+        "skills": [{"name": "応急手当", "value": 50}],
+        "derived": {"HP_max": 12, "MP_max": 8},
+        "memo": "x",
+    }
+
+
+def test_json_patch_ops_replay_the_patch():
+    old = _state(derived={"HP_max": 10})
+    patch = parse_json_patch(
+        [
+            {"op": "test", "path": "/sheet_data/occupation", "value": "医師"},
+            {"op": "add", "path": "/sheet_data/skills/-", "value": {"name": "医学", "value": 60}},
+            {"op": "replace", "path": "/sheet_data/skills/0/value", "value": 70},
+            {"op": "copy", "from": "/sheet_data/occupation", "path": "/sheet_data/previous_occupation"},
+            {"op": "move", "from": "/sheet_data/derived", "path": "/sheet_data/stats"},
+            {"op": "remove", "path": "/profile_image_url"},
+        ]
+    )
+
+    replayed = apply_ops(copy.deepcopy(old), patch_ops(patch))
+    assert replayed["profile_image_url"] is None
+    assert replayed["sheet_data"] == {
+        "occupation": "医師",
+        "previous_occupation": "医師",
+        "skills": [{"name": "応急手当", "value": 70}, {"name": "医学", "value": 60}],
+        "stats": {"HP_max": 10},
+    }
+
+
+def test_live_state_fold_is_applied_before_the_patch():
+    old = _state(derived={"HP": 10, "HP_max": 10})
+    patch = parse_merge_patch({"sheet_data": {"derived": {"HP_max": 12}}})
+
+    replayed = apply_ops(copy.deepcopy(old), patch_ops(patch, {"derived": {"HP": 4}}))
+    assert replayed["sheet_data"]["derived"] == {"HP": 4, "HP_max": 12}
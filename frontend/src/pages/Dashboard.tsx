@@ -3,7 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import { FiChevronLeft, FiChevronRight, FiFilter, FiPlus, FiSearch, FiXCircle } from 'react-icons/fi';
 import { useAuth } from '../auth/useAuth';
 import { getCharacters } from '../services/api';
-import type { Character, CharacterSort, SystemEnum } from '../services/api';
+import type { CharacterListItem, CharacterSort, SystemEnum } from '../services/api';
 import { useToast } from '../contexts/ToastContext';
 import { handleApiError, formatErrorMessage } from '../utils/errorHandler';
 import { LoadingSpinner } from '../components/LoadingSpinner';
@@ -31,7 +31,7 @@ export const Dashboard = () => {
   const { isAuthenticated, getAccessToken } = useAuth();
   const navigate = useNavigate();
   const { showError } = useToast();
-  const [characters, setCharacters] = useState<Character[]>([]);
+  const [characters, setCharacters] = useState<CharacterListItem[]>([]);
   const [loading, setLoading] = useState(true);
   const [searchQuery, setSearchQuery] = useState('');
   const [appliedSearchQuery, setAppliedSearchQuery] = useState('');
@@ -56,6 +56,7 @@ export const Dashboard = () => {
           sort,
           page: currentPage,
           limit: 20,
+          view: 'summary',
         });
         setCharacters(response.items);
         setTotal(response.total);
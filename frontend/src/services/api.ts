@@ -34,11 +34,25 @@ export interface Character {
   updated_at: string;
 }
 
+export interface CharacterSummary {
+  occupation: string | null;
+  hp_max: number | null;
+  san_max: number | null;
+  mp_max: number | null;
+}
+
+// 一覧（view=summary）では sheet_data の代わりに summary が返る
+export type CharacterListItem = Omit<Character, 'sheet_data'> & {
+  sheet_data?: Record<string, any>;
+  summary?: CharacterSummary;
+};
+
 export interface CharacterListResponse {
-  items: Character[];
+  items: CharacterListItem[];
   total: number;
   page: number;
   limit: number;
+  next_cursor?: string | null;
 }
 
 export interface CharacterCreate {
@@ -65,6 +79,20 @@ export interface PublishResponse {
   share_token: string | null;
 }
 
+export interface LiveState {
+  character_id: string;
+  hp_current: number | null;
+  san_current: number | null;
+  mp_current: number | null;
+  updated_at: string | null;
+}
+
+export interface LiveStateAdjust {
+  hp?: number;
+  san?: number;
+  mp?: number;
+}
+
 export interface ImageUploadUrlRequest {
   mime_type: string;
 }
@@ -97,6 +125,7 @@ export const getCharacters = async (
     sort?: CharacterSort;
     page?: number;
     limit?: number;
+    view?: 'full' | 'summary';
   }
 ): Promise<CharacterListResponse> => {
   const queryParams = new URLSearchParams();
@@ -106,6 +135,7 @@ export const getCharacters = async (
   if (params?.sort) queryParams.append('sort', params.sort);
   if (params?.page) queryParams.append('page', params.page.toString());
   if (params?.limit) queryParams.append('limit', params.limit.toString());
+  if (params?.view) queryParams.append('view', params.view);
 
   const response = await axios.get<CharacterListResponse>(
     `${API_BASE_URL}/api/characters?${queryParams.toString()}`,
@@ -194,6 +224,38 @@ export const publishCharacter = async (
   return response.data;
 };
 
+export const getLiveState = async (
+  accessToken: string,
+  characterId: string
+): Promise<LiveState> => {
+  const response = await axios.get<LiveState>(
+    `${API_BASE_URL}/api/characters/${characterId}/live-state`,
+    {
+      headers: {
+        Authorization: `Bearer ${accessToken}`,
+      },
+    }
+  );
+  return response.data;
+};
+
+export const adjustLiveState = async (
+  accessToken: string,
+  characterId: string,
+  deltas: LiveStateAdjust
+): Promise<LiveState> => {
+  const response = await axios.post<LiveState>(
+    `${API_BASE_URL}/api/characters/${characterId}/live-state/adjust`,
+    deltas,
+    {
+      headers: {
+        Authorization: `Bearer ${accessToken}`,
+      },
+    }
+  );
+  return response.data;
+};
+
 export const getSharedCharacter = async (token: string): Promise<Character> => {
   const response = await axios.get<Character>(
     `${API_BASE_URL}/api/share/${token}`